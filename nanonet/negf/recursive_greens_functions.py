@@ -86,9 +86,12 @@ def _recursive_gf(energy, mat_l_list, mat_d_list, mat_u_list, s_in=0, s_out=0, d
     # ----------------- in case they are not matrices -------------------
     # -------------------------------------------------------------------
 
+    # complex data type of the same precision as the input matrices
+    dtype = np.result_type(*(mat_d_list + [np.complex64]))
+
     for jj, item in enumerate(mat_d_list):
         mat_d_list[jj] = item
-        mat_d_list[jj] = mat_d_list[jj] - np.diag(energy * np.ones(mat_d_list[jj].shape[0]) + 1j*damp)
+        mat_d_list[jj] = mat_d_list[jj] - np.diag(energy * np.ones(mat_d_list[jj].shape[0]) + 1j*damp).astype(dtype)
 
     # computes matrix sizes
     num_of_matrices = len(mat_d_list)  # Number of diagonal blocks.
@@ -100,11 +103,11 @@ def _recursive_gf(energy, mat_l_list, mat_d_list, mat_u_list, s_in=0, s_out=0, d
 
     # allocate empty lists of certain lengths
     gr_left = [None for _ in range(num_of_matrices)]
-    gr_left[0] = mat_left_div(-mat_d_list[0], np.eye(mat_shapes[0][0]))  # Initialising the retarded left connected.
+    gr_left[0] = mat_left_div(-mat_d_list[0], np.eye(mat_shapes[0][0], dtype=dtype))  # Initialising the retarded left connected.
 
     for q in range(num_of_matrices - 1):  # Recursive algorithm (B2)
         gr_left[q + 1] = mat_left_div((-mat_d_list[q + 1] - mat_l_list[q].dot(gr_left[q]).dot(mat_u_list[q])),
-                                      np.eye(mat_shapes[q + 1][0]))      # The left connected recursion.
+                                      np.eye(mat_shapes[q + 1][0], dtype=dtype))      # The left connected recursion.
     # -------------------------------------------------------------------
 
     grl = [None for _ in range(num_of_matrices-1)]
@@ -179,7 +182,7 @@ def _recursive_gf(energy, mat_l_list, mat_d_list, mat_u_list, s_in=0, s_out=0, d
     # -------------------------------------------------------------------
 
     for jj, item in enumerate(mat_d_list):
-        mat_d_list[jj] = mat_d_list[jj] + np.diag(energy * np.ones(mat_d_list[jj].shape[0]) + 1j*damp)
+        mat_d_list[jj] = mat_d_list[jj] + np.diag(energy * np.ones(mat_d_list[jj].shape[0]) + 1j*damp).astype(dtype)
 
     # -------------------------------------------------------------------
     # ---- choose a proper output depending on the list of arguments ----
@@ -2,11 +2,11 @@ import logging
 import numpy as np
 from scipy.linalg import block_diag
 import matplotlib.pyplot as plt
-from nanonet.tb.hamiltonian import Hamiltonian
+from nanonet.tb.hamiltonian import Hamiltonian, group_bonds, block_indices
 import nanonet.tb as tb
 import nanonet.negf as negf
 from nanonet.tb.aux_functions import fd
-from nanonet.tb.diatomic_matrix_element import me
+from nanonet.tb.structure_designer import build_neighbour_table
 from nanonet.negf.recursive_greens_functions import recursive_gf
 from nanonet.negf.hamiltonian_chain import HamiltonianChain
 from ase.visualize import view
@@ -94,96 +94,8 @@ class TwoTerminalDevice(object):
 
         self._h_0 = [self._left_lead.h_0, self._device.h_matrix, self._right_lead.h_0]
 
-        self._h_l = np.zeros((self._left_lead.basis_size, self._device.basis_size), dtype=complex)
-        self._h_r = np.zeros((self._device.basis_size, self._right_lead.basis_size), dtype=complex)
-
-        # if self.compute_overlap:
-        #     self.ov_matrix = np.zeros((self.basis_size, self.basis_size), dtype=complex)
-        #     self.ov_matrix_bc_add = np.zeros((self.basis_size, self.basis_size), dtype=complex)
-
-        # loop over all nodes
-        for j1 in range(self._left_lead.num_of_nodes):
-            # find neighbours for each node
-            list_of_neighbours = self._device.get_neighbours(self._left_lead._coords[j1])[1:]
-            print(list_of_neighbours)
-
-            for j2 in list_of_neighbours:
-                # nearest neighbours interaction
-                for l1 in range(self._left_lead.orbitals_dict[list(self._left_lead.atom_list.keys())[j1]].num_of_orbitals):
-                    for l2 in range(self._device.orbitals_dict[list(self._device.atom_list.keys())[j2]].num_of_orbitals):
-                        ind1 = self._left_lead.qn2ind([('atoms', j1), ('l', l1)], )
-                        ind2 = self._device.qn2ind([('atoms', j2), ('l', l2)], )
-
-                        atom_kind1 = self._left_lead._ind2atom(j1)
-                        atom_kind2 = self._device._ind2atom(j2)
-
-                        coords1 = np.array(list(self._left_lead.atom_list.values())[j1], dtype=float) - \
-                                  np.array(list(self._device.atom_list.values())[j2], dtype=float)
-
-                        norm = np.linalg.norm(coords1)
-
-                        if self._device.int_radial_dependence is None:
-                            which_neighbour = ""
-                        else:
-                            which_neighbour = self._device.int_radial_dependence(norm)
-
-                        if self._device.radial_dependence is None:
-                            factor = 1.0
-                        else:
-                            factor = self._device.radial_dependence(norm)
-
-                        # compute directional cosines
-                        if self._device.compute_angular:
-                            coords1 /= norm
-                        else:
-                            coords1 = np.array([1.0, 0.0, 0.0])
-
-                        self._h_l[ind1, ind2] = me(atom_kind1, l1, atom_kind2, l2, coords1, which_neighbour, overlap=False) * factor
-
-        # loop over all nodes
-        for j1 in range(self._right_lead.num_of_nodes):
-            # find neighbours for each node
-            list_of_neighbours = self._device.get_neighbours(self._right_lead._coords[j1])[1:]
-            print(list_of_neighbours)
-
-            for j2 in list_of_neighbours:
-                # nearest neighbours interaction
-                for l1 in range(self._right_lead.orbitals_dict[
-                                    list(self._right_lead.atom_list.keys())[j1]].num_of_orbitals):
-                    for l2 in range(self._device.orbitals_dict[
-                                        list(self._device.atom_list.keys())[j2]].num_of_orbitals):
-                        ind1 = self._right_lead.qn2ind([('atoms', j1), ('l', l1)], )
-                        ind2 = self._device.qn2ind([('atoms', j2), ('l', l2)], )
-
-                        atom_kind1 = self._right_lead._ind2atom(j1)
-                        atom_kind2 = self._device._ind2atom(j2)
-
-                        coords1 = np.array(list(self._right_lead.atom_list.values())[j1], dtype=float) - \
-                                  np.array(list(self._device.atom_list.values())[j2], dtype=float)
-
-                        norm = np.linalg.norm(coords1)
-
-                        if self._device.int_radial_dependence is None:
-                            which_neighbour = ""
-                        else:
-                            which_neighbour = self._device.int_radial_dependence(norm)
-
-                        if self._device.radial_dependence is None:
-                            factor = 1.0
-                        else:
-                            factor = self._device.radial_dependence(norm)
-
-                        # compute directional cosines
-                        if self._device.compute_angular:
-                            coords1 /= norm
-                        else:
-                            coords1 = np.array([1.0, 0.0, 0.0])
-
-                        self._h_r[ind2, ind1] = me(atom_kind1, l1, atom_kind2, l2, coords1,
-                                                   which_neighbour, overlap=False) * factor
-
-                        # if self.compute_overlap:
-                        #     self.ov_matrix[ind1, ind2] = self._get_me(j1, j2, l1, l2, overlap=True)
+        self._h_l = self._compute_coupling(self._left_lead)
+        self._h_r = self._compute_coupling(self._right_lead).T
 
         self._h_l = [self._h_l, self._h_r]
         self._h_r = [self._h_l[0].conj().T, self._h_r.conj().T]
@@ -191,6 +103,34 @@ class TwoTerminalDevice(object):
         # self._h_r = [self._h_r, self._h_l.conj().T]
         # self._h_l = [self._h_r[0].conj().T, self._h_l]
 
+    def _compute_coupling(self, lead):
+        """Computes the matrix of couplings between atoms of a lead and atoms of the device.
+
+        Parameters
+        ----------
+        lead : Lead
+            lead Hamiltonian
+
+        Returns
+        -------
+        numpy.ndarray
+            coupling matrix of the size lead.basis_size x device.basis_size
+        """
+
+        h_c = np.zeros((lead.basis_size, self._device.basis_size), dtype=self._device.dtype)
+
+        table = build_neighbour_table(lead._kd_tree, self._device._nn_distance, other_tree=self._device._kd_tree)
+
+        groups = group_bonds(lead.species_ids[table.i], self._device.species_ids[table.j])
+
+        for (id1, id2), bonds in groups.items():
+            kind1, kind2 = lead._kinds[id1], self._device._kinds[id2]
+            rows, cols = block_indices(lead._offsets[table.i[bonds]], self._device._offsets[table.j[bonds]],
+                                       kind1.num_of_orbitals, kind2.num_of_orbitals)
+            h_c[rows, cols] = self._device._get_me_block(kind1, kind2, table.vectors[bonds])
+
+        return h_c
+
     def sgf(self, energy, ef1, ef2, tempr, sgf_l, sgf_r):
         """ """
 
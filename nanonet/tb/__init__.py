@@ -10,6 +10,7 @@ from .hamiltonian import Hamiltonian
 from .hamiltonian_sparse import HamiltonianSp
 from .aux_functions import get_k_coords, yaml_parser
 from .hamiltonian_initializer import set_tb_params, initializer
+from .k_mesh import monkhorst_pack, irreducible_k_mesh, unfold_k_mesh, find_point_group
 
 from .reduced_mode_space import reduce_mode_space, bs_vs_e, bs
 import logging
@@ -4,53 +4,91 @@ The interfaces are aimed to be schemas for further classes implementations.
 Following these schemas will ensure compatibility of the code with the entire project.
 """
 from abc import ABCMeta, abstractmethod
+import logging
 from future.utils import with_metaclass
 import numpy as np
 
 
+# number of neighbours requested by the fixed-size kd-tree queries in earlier versions
+LEGACY_NUM_NEIGHBOURS = 25
+
+
 class AbstractStructureDesigner(with_metaclass(ABCMeta, object)):
     """The class is an abstraction for the list of atomic coordinates."""
 
+    # the warning about dense neighbourhoods is issued once for each structure
+    _dense_neighbourhood_reported = False
+
     def __init__(self):
 
         self._nn_distance = None
         self._kd_tree = None
 
     def _get_neighbours(self, query):
-        """
+        """Finds all sites within the distance `nn_distance` from a point (or from each of a set of points).
+        The number of returned neighbours adapts to the number of sites within the cutoff distance.
 
         Parameters
         ----------
-        query :
-            
+        query : list or numpy.ndarray or int or str
+            coordinates of a point or an array of points, index or label of an atom
 
         Returns
         -------
-
+        tuple
+            distances and indices of sites sorted by the distance (sites at equal distances are sorted by the index)
+            in the format of scipy.spatial.cKDTree.query(), missing neighbours are indicated by infinite distances
         """
 
-        if isinstance(query, list) or isinstance(query, np.ndarray):
-            ans = self._kd_tree.query(query,
-                                      k=25,
-                                      distance_upper_bound=self._nn_distance)
-        elif isinstance(query, int):
+        if isinstance(query, (int, np.integer)):
 
             query = list(self.atom_list.items())[query][1]
 
             if self._kd_tree.data.shape[1] > 3:
                 query = np.append(query, 0)
 
-            ans = self._kd_tree.query(query,
-                                      k=25,
-                                      distance_upper_bound=self._nn_distance)
         elif isinstance(query, str):
-            ans = self._kd_tree.query(self.atom_list[query],
-                                      k=25,
-                                      distance_upper_bound=self._nn_distance)
-        else:
+            query = self.atom_list[query]
+        elif not (isinstance(query, list) or isinstance(query, np.ndarray)):
             raise TypeError('Wrong input type for query')
 
-        return ans
+        # the indices are taken from a single ball-point query, the distances are computed directly
+        query = np.asarray(query, dtype=float)
+        points = query.reshape(-1, self._kd_tree.m)
+        neighbours = self._kd_tree.query_ball_point(points, self._nn_distance)
+        lengths = np.fromiter((len(item) for item in neighbours), dtype=int, count=len(neighbours))
+
+        i = np.repeat(np.arange(len(points)), lengths)
+        j = np.fromiter((item for items in neighbours for item in items), dtype=int, count=np.sum(lengths))
+        distances = np.linalg.norm(self._kd_tree.data[j] - points[i], axis=1)
+
+        # the distance upper bound of cKDTree.query() is strict
+        mask = distances < self._nn_distance
+        order = np.lexsort((j[mask], distances[mask], i[mask]))
+        i, j, distances = i[mask][order], j[mask][order], distances[mask][order]
+
+        counts = np.bincount(i, minlength=len(points))
+        num_of_neighbours = np.max(counts, initial=0)
+
+        if num_of_neighbours > LEGACY_NUM_NEIGHBOURS and not self._dense_neighbourhood_reported:
+            self._dense_neighbourhood_reported = True
+            logging.warning("{} sites are found within the distance {}, the fixed-size queries with k={} "
+                            "used in earlier versions would have truncated the list of "
+                            "neighbours".format(num_of_neighbours, self._nn_distance, LEGACY_NUM_NEIGHBOURS))
+
+        # rank of each neighbour in the list of neighbours of its point
+        ranks = np.arange(len(i)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        shape = (len(points), max(int(num_of_neighbours), 1))
+        ans_distances = np.full(shape, np.inf)
+        ans_indices = np.full(shape, self._kd_tree.n)
+        ans_distances[i, ranks] = distances
+        ans_indices[i, ranks] = j
+
+        if query.ndim == 1:
+            return ans_distances[0], ans_indices[0]
+        else:
+            return ans_distances, ans_indices
 
     @abstractmethod
     def get_neighbours(self, query):
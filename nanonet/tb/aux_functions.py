@@ -108,6 +108,80 @@ def accum(accmap, input, func=None, size=None, fill_value=0, dtype=None):
     return out
 
 
+def strip_digits(labels):
+    """Removes digits from atomic labels, e.g. 'Si12' -> 'Si'.
+    The operation is vectorized over the array of labels.
+
+    Parameters
+    ----------
+    labels : list or numpy.ndarray
+        atomic labels
+
+    Returns
+    -------
+    numpy.ndarray
+        array of labels without digits
+
+    Examples
+    --------
+    >>> print(strip_digits(['Si12', 'H', 'H3']))
+    ['Si' 'H' 'H']
+    """
+
+    labels = np.ascontiguousarray(labels, dtype=str)
+
+    if labels.size == 0 or labels.dtype.itemsize == 0:
+        return labels
+
+    # normally, digits are at the end of labels
+    labels = np.ascontiguousarray(np.char.rstrip(labels, '0123456789'))
+
+    # unicode strings are arrays of 32-bit code points, remaining digits are moved to the end
+    # and replaced by null characters
+    codes = labels.view(np.uint32).reshape(labels.size, -1)
+    digits = (codes >= ord('0')) & (codes <= ord('9'))
+
+    if not np.any(digits):
+        return labels
+
+    order = np.argsort(digits, axis=1, kind='stable')
+    codes = np.where(np.take_along_axis(digits, order, axis=1), 0, np.take_along_axis(codes, order, axis=1))
+
+    return np.ascontiguousarray(codes, dtype=np.uint32).view(labels.dtype).reshape(labels.shape)
+
+
+def enumerate_labels(labels):
+    """Makes atomic labels unique by numbering atoms of each chemical element
+    in the order of their appearance, e.g. ['Si', 'H', 'Si'] -> ['Si1', 'H1', 'Si2'].
+    Digits already present in labels are ignored.
+
+    Parameters
+    ----------
+    labels : list or numpy.ndarray
+        atomic labels
+
+    Returns
+    -------
+    list
+        list of unique labels
+    """
+
+    species = strip_digits(labels)
+
+    if species.size == 0:
+        return []
+
+    _, ids = np.unique(species, return_inverse=True)
+    ids = ids.ravel()
+    order = np.argsort(ids, kind='stable')
+    first = np.searchsorted(ids[order], ids[order])
+
+    numbers = np.empty(len(ids), dtype=int)
+    numbers[order] = np.arange(len(ids)) - first + 1
+
+    return np.char.add(species, numbers.astype(str)).tolist()
+
+
 def xyz2np(xyz):
     """Transforms xyz-file formatted string to lists of atomic labels and coordinates
 
@@ -125,30 +199,71 @@ def xyz2np(xyz):
 
     xyz = xyz.splitlines()
     num_of_atoms = int(xyz[0])
-    ans = np.zeros((num_of_atoms, 3))
-    j = 0
-    atoms = []
-    unique_labels = dict()
 
-    for line in xyz[2:]:
-        if len(line.strip()) > 0:
-            temp = line.split()
-            label = ''.join([i for i in temp[0] if not i.isdigit()])
+    # the columns are parsed in bulk, all columns after the coordinates are ignored
+    lines = [line for line in xyz[2:] if len(line.strip()) > 0]
+    coords = np.loadtxt(lines, usecols=(1, 2, 3), dtype=float, ndmin=2, comments=None).reshape(-1, 3)
+    labels = np.loadtxt(lines, usecols=0, dtype=str, ndmin=1, comments=None)
 
-            try:
-                unique_labels[label] += 1
-                temp[0] = label + str(unique_labels[label])
-            except KeyError:
-                temp[0] = label + '1'
-                unique_labels[label] = 1
+    if len(lines) != num_of_atoms:
+        raise ValueError("The number of atoms in the xyz data ({}) differs from "
+                         "the one in the header ({})".format(len(lines), num_of_atoms))
+
+    return enumerate_labels(labels), coords
+
+
+def save_structure(filename, labels, coords):
+    """Saves atomic labels and coordinates in a binary file.
+    If the file extension is .npz, the arrays `labels` and `coords` are stored in a numpy archive;
+    otherwise a .npy file containing a structured array with the fields `label` and `coords` is created,
+    which can be memory-mapped when loaded.
+
+    Parameters
+    ----------
+    filename : str
+        name of the file
+    labels : list or numpy.ndarray
+        atomic labels
+    coords : numpy.ndarray
+        atomic coordinates, array of the shape (num_of_atoms, 3)
+    """
+
+    labels = np.asarray(labels, dtype=str)
+    coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+
+    if filename.endswith('.npz'):
+        np.savez(filename, labels=labels, coords=coords)
+    else:
+        structure = np.empty(len(labels), dtype=[('label', labels.dtype), ('coords', float, (3,))])
+        structure['label'] = labels
+        structure['coords'] = coords
+        np.save(filename, structure)
+
+
+def load_structure(filename, mmap_mode='r'):
+    """Loads atomic labels and coordinates from a binary file created by the function save_structure().
+
+    Parameters
+    ----------
+    filename : str
+        name of the .npz or .npy file
+    mmap_mode : str
+        memory-mapping mode used for .npy files, see numpy.load (Default value = 'r')
 
-            atoms.append(temp[0])
-            ans[j, 0] = float(temp[1])
-            ans[j, 1] = float(temp[2])
-            ans[j, 2] = float(temp[3])
-            j += 1
+    Returns
+    -------
+    list, numpy.ndarray
+        list of labels and array of coordinates
+    """
+
+    if filename.endswith('.npz'):
+        with np.load(filename) as data:
+            labels, coords = data['labels'], data['coords']
+    else:
+        structure = np.load(filename, mmap_mode=mmap_mode)
+        labels, coords = structure['label'], structure['coords']
 
-    return atoms, ans
+    return enumerate_labels(labels), np.asarray(coords, dtype=float).reshape(-1, 3)
 
 
 def count_species(list_of_labels):
@@ -164,18 +279,16 @@ def count_species(list_of_labels):
     -------
 
     """
-    counter = {}
 
-    for item in list_of_labels:
+    species = strip_digits(list_of_labels)
 
-        key = ''.join([i for i in item if not i.isdigit()])
+    if species.size == 0:
+        return {}
 
-        try:
-            counter[key] += 1
-        except KeyError:
-            counter[key] = 1
+    keys, first, counts = np.unique(species, return_index=True, return_counts=True)
 
-    return counter
+    # the keys are ordered by their first appearance in the list
+    return {str(keys[j]): int(counts[j]) for j in np.argsort(first)}
 
 
 def get_k_coords(special_points, num_of_points, label):
@@ -255,6 +368,28 @@ def dict2xyz(input_data):
     return output
 
 
+def dict2np(input_data):
+    """Extracts atomic labels and coordinates from the dictionary describing an atomic structure,
+    see dict2xyz().
+
+    Parameters
+    ----------
+    input_data : dict
+        dictionary with the keys 'num_atoms', 'title' and 'atoms'
+
+    Returns
+    -------
+    list, numpy.ndarray
+        list of labels and array of coordinates
+    """
+
+    atoms = input_data['atoms'][:input_data['num_atoms']]
+    labels = [list(item.keys())[0] for item in atoms]
+    coords = np.array([list(item.values())[0] for item in atoms], dtype=float).reshape(-1, 3)
+
+    return labels, coords
+
+
 def yaml_parser(input_data):
     """
 
@@ -8,13 +8,137 @@ Computations are based mostly on analytical equations derived in
 from __future__ import print_function
 from __future__ import absolute_import
 from __future__ import division
-import sys
+import re
 import math
+import numpy as np
 from nanonet.tb.constants import *
 import warnings
 from nanonet.tb import tb_params
 
 
+# tables of tight-binding parameters compiled into arrays, see compile_tb_params()
+_COMPILED_TB_PARAMS = {}
+
+
+def _parse_label(label):
+    """Parses a label of a tight-binding parameter, e.g. '1sp_sigma'.
+
+    Parameters
+    ----------
+    label : str
+        label of the parameter
+
+    Returns
+    -------
+    tuple
+        (n1, n2, l_min, l_max, m) or None if the label can not be parsed;
+        n1 and n2 are zero if the principal quantum numbers are not specified
+    """
+
+    match = re.match(r'^(\d*)([spd])(\d*)([spd])_(sigma|pi|delta)$', label)
+
+    if match is None:
+        return None
+
+    n1, l_min, n2, l_max, m = match.groups()
+    orbital_qn = {value: key for key, value in ORBITAL_QN.items()}
+    m_qn = {value: key for key, value in M_QN.items()}
+
+    return int(n1 or 0), int(n2 or 0), orbital_qn[l_min], orbital_qn[l_max], m_qn[m]
+
+
+def compile_tb_params():
+    """Converts the tables of tight-binding parameters defined in the module tb_params into arrays.
+    For each bond type and each kind of tables (PARAMS_ or OV_), the parameters are stored in an array
+    indexed by (neighbour order, n1, n2, l_min, l_max, m), so that a parameter is found by a single array index.
+    The function is invoked when tables are set by set_tb_params() and when a Hamiltonian object is created.
+    """
+
+    tables = {}
+
+    for name, value in vars(tb_params).items():
+        for flag in ('PARAMS_', 'OV_'):
+            if name.startswith(flag) and isinstance(value, dict):
+                bond, order = re.match(r'^(.*?)(\d*)$', name[len(flag):]).groups()
+                tables.setdefault((flag, bond), {})[int(order or 0)] = value
+
+    _COMPILED_TB_PARAMS.clear()
+
+    for key, orders in tables.items():
+
+        entries = [(order, _parse_label(label), value)
+                   for order, table in orders.items() for label, value in table.items()]
+        entries = [item for item in entries if item[1] is not None]
+
+        n_size = max([max(item[1][:2]) for item in entries] + [0]) + 1
+        num_orders = max(orders) + 1
+
+        # the last slot is zero and corresponds to the neighbours beyond the last order
+        params = np.zeros((num_orders + 1, n_size, n_size, len(ORBITAL_QN), len(ORBITAL_QN), len(M_QN)))
+        present = np.zeros(num_orders + 1, dtype=bool)
+        present[list(orders)] = True
+
+        for order, index, value in entries:
+            params[(order,) + index] = value
+
+        _COMPILED_TB_PARAMS[key] = (params, present)
+
+
+def tb_params_block(bond, n1, n2, l_min, l_max, which_neighbour, overlap=False):
+    """Looks up compiled tables of tight-binding parameters for all values of m at once
+    and for an array of neighbour orders.
+
+    Parameters
+    ----------
+    bond : str
+        a bond type, e.g. 'H_SI'
+    n1 : int
+        principal quantum number of the orbital with l = l_min (zero if not specified)
+    n2 : int
+        principal quantum number of the orbital with l = l_max (zero if not specified)
+    l_min : int
+        min(l1, l2), where l1 and l2 are orbital quantum numbers of atoms
+    l_max : int
+        max(l1, l2), where l1 and l2 are orbital quantum numbers of atoms
+    which_neighbour : int or numpy.ndarray
+        Order of a nearest neighbour for each bond; 0, an empty string or None refer to the table
+        without the order suffix, 100 stands for the atoms beyond the last nearest neighbour
+    overlap : bool
+        A flag indicating that the overlap parameters have to be returned (Default value = False)
+
+    Returns
+    -------
+    numpy.ndarray
+        array of the shape (l_min + 1, len(which_neighbour))
+    """
+
+    flag = 'OV_' if overlap else 'PARAMS_'
+
+    if which_neighbour is None or isinstance(which_neighbour, str):
+        which_neighbour = int(which_neighbour or 0)
+
+    which_neighbour = np.atleast_1d(np.asarray(which_neighbour, dtype=int))
+
+    if (flag, bond) not in _COMPILED_TB_PARAMS:
+        # the atoms beyond the last nearest neighbour are not coupled even if there is no table for the bond
+        if np.all(which_neighbour == 100):
+            return np.zeros((l_min + 1, len(which_neighbour)))
+        raise AttributeError("The table {} is not defined in the module tb_params".format(flag + bond))
+
+    params, present = _COMPILED_TB_PARAMS[(flag, bond)]
+    orders = np.where(which_neighbour == 100, len(present) - 1, np.minimum(which_neighbour, len(present) - 1))
+
+    missing = (which_neighbour != 100) & ~present[orders]
+    if np.any(missing):
+        raise AttributeError("The table {} is not defined in the module "
+                             "tb_params".format(flag + bond + str(which_neighbour[missing][0] or '')))
+
+    if n1 >= params.shape[1] or n2 >= params.shape[2]:
+        return np.zeros((l_min + 1, len(which_neighbour)))
+
+    return params[orders, n1, n2, l_min, l_max, :l_min + 1].T
+
+
 def me_diatomic(bond, n, l_min, l_max, m, which_neighbour, overlap=False):
     """The function looks up into the table of parameters making a query parametrized by:
 
@@ -44,23 +168,194 @@ def me_diatomic(bond, n, l_min, l_max, m, which_neighbour, overlap=False):
 
     """
 
-    label = n[0] + ORBITAL_QN[l_min] + n[1] + ORBITAL_QN[l_max] + '_' + M_QN[m]
+    n1, n2 = [int(item) if item else 0 for item in n]
 
+    return tb_params_block(bond, n1, n2, l_min, l_max, which_neighbour, overlap=overlap)[m, 0]
 
-    if overlap:
-        flag = 'OV_'
-    else:
-        flag = 'PARAMS_'
 
-    try:
-        if which_neighbour == 0:
-            return getattr(sys.modules[tb_params.__name__], flag + bond)[label]
-        elif which_neighbour == 100:
-            return 0
-        else:
-            return getattr(sys.modules[tb_params.__name__], flag + bond + str(which_neighbour))[label]
-    except KeyError:
-        return 0
+# the largest orbital quantum number for which the rotation matrices are tabulated
+L_MAX = 2
+
+# factorials of all integers entering the rotation matrices for l <= L_MAX
+FACTORIALS = np.array([math.factorial(j) for j in range(2 * L_MAX + 2)], dtype=float)
+
+
+def _wigner_d_coefficients(l_max=L_MAX):
+    """Precomputes coefficients of the rotation matrices d^l_{m1, m2}(beta)
+    [A.V. Podolskiy and P. Vogl, Phys. Rev. B. 69, 233101 (2004)] written as homogeneous polynomials
+    of the degree 2l in cos(beta/2) and sin(beta/2).
+
+    Parameters
+    ----------
+    l_max : int
+        the largest orbital quantum number (Default value = L_MAX)
+
+    Returns
+    -------
+    numpy.ndarray
+        coefficients of the monomials cos(beta/2)^(2l - k) * sin(beta/2)^k,
+        array of the shape (l_max + 1, 2 * l_max + 1, 2 * l_max + 1, 2 * l_max + 1)
+        indexed by (l, m1 + l_max, m2 + l_max, k)
+    """
+
+    coefs = np.zeros((l_max + 1, 2 * l_max + 1, 2 * l_max + 1, 2 * l_max + 1))
+
+    for l in range(l_max + 1):
+        for m1 in range(-l, l + 1):
+            for m2 in range(-l, l + 1):
+                norm = math.sqrt(FACTORIALS[l + m2] * FACTORIALS[l - m2] * FACTORIALS[l + m1] * FACTORIALS[l - m1])
+                for t in range(2 * l + 2):
+                    if l + m2 - t >= 0 and l - m1 - t >= 0 and t + m1 - m2 >= 0:
+                        coefs[l, m1 + l_max, m2 + l_max, m1 - m2 + 2 * t] += \
+                            ((-1) ** t) * norm / (FACTORIALS[l + m2 - t] * FACTORIALS[l - m1 - t] *
+                                                  FACTORIALS[t] * FACTORIALS[t + m1 - m2])
+
+    return coefs
+
+
+_D_COEFS = _wigner_d_coefficients()
+
+
+def _st_coefficients():
+    """Precomputes coefficients of the combinations (-1)^m * d^l_{|m1|, m} +- d^l_{|m1|, -m} entering the functions
+    s_me() and t_me() as polynomials in cos(beta/2) and sin(beta/2), see _wigner_d_coefficients().
+    The combination for m = 0 is divided by sqrt(2), see rotation_tensors().
+
+    Returns
+    -------
+    numpy.ndarray
+        array of the shape (L_MAX + 1, 2, L_MAX + 1, L_MAX + 1, 2 * L_MAX + 1) indexed by (l, sign, |m1|, m, k)
+    """
+
+    m1 = np.arange(L_MAX + 1)[:, np.newaxis]
+    m = np.arange(L_MAX + 1)[np.newaxis, :]
+
+    plus = ((-1.0) ** m)[..., np.newaxis] * _D_COEFS[:, m1 + L_MAX, m + L_MAX, :]
+    minus = _D_COEFS[:, m1 + L_MAX, L_MAX - m, :]
+
+    ans = np.stack([plus + minus, plus - minus], axis=1)
+    ans[:, :, :, 0, :] /= math.sqrt(2)
+
+    return ans
+
+
+_ST_COEFS = _st_coefficients()
+
+
+def wigner_d(N):
+    """Computes rotation matrices d^l_{m1, m2} for all l <= L_MAX at once
+    according to A.V. Podolskiy and P. Vogl, Phys. Rev. B. 69, 233101 (2004).
+
+    Parameters
+    ----------
+    N : float or numpy.ndarray
+        directional cosines relative to z-axis
+
+    Returns
+    -------
+    numpy.ndarray
+        array of the shape N.shape + (L_MAX + 1, 2 * L_MAX + 1, 2 * L_MAX + 1) indexed by (l, m1 + L_MAX, m2 + L_MAX);
+        the elements with |m1| > l or |m2| > l are zero
+
+    Examples
+    --------
+    >>> d = wigner_d(np.array([1.0, -1.0]))
+    >>> print(d[:, 1, L_MAX + 1, L_MAX + 1])
+    [1. 0.]
+    """
+
+    N = np.clip(np.asarray(N, dtype=float), -1.0, 1.0)
+    shape = N.shape
+    N = N.ravel()
+
+    # the half-angle form has no singularities at N = +-1
+    cos_half = np.sqrt(0.5 * (1 + N))
+    sin_half = np.sqrt(0.5 * (1 - N))
+
+    size = 2 * L_MAX + 1
+    ans = np.zeros((len(N), L_MAX + 1, size, size))
+
+    for l in range(L_MAX + 1):
+        k = np.arange(2 * l + 1)
+        monomials = cos_half[:, np.newaxis] ** (2 * l - k) * sin_half[:, np.newaxis] ** k
+        ans[:, l] = np.dot(monomials, _D_COEFS[l, :, :, :2 * l + 1].reshape(-1, 2 * l + 1).T).reshape(-1, size, size)
+
+    return ans.reshape(shape + ans.shape[1:])
+
+
+def rotation_coefficients(gamma):
+    """Computes the coefficients a_m(gamma) and b_m(gamma) for all |m| <= L_MAX at once,
+    see the functions a_coef() and b_coef().
+
+    Parameters
+    ----------
+    gamma : float or numpy.ndarray
+        azimuthal angles
+
+    Returns
+    -------
+    tuple
+        arrays a and b of the shape gamma.shape + (2 * L_MAX + 1,) indexed by m + L_MAX
+    """
+
+    m = np.arange(-L_MAX, L_MAX + 1)
+    gamma = np.asarray(gamma, dtype=float)[..., np.newaxis]
+    sign = (-1.0) ** np.abs(m)
+    cos = np.cos(np.abs(m) * gamma)
+    sin = np.sin(np.abs(m) * gamma)
+
+    a = np.where(m == 0, 1.0 / math.sqrt(2), sign * np.where(m > 0, cos, -sin))
+    b = sign * np.where(m >= 0, sin, 0) + sign * np.where(m <= 0, cos, 0)
+
+    return a, b
+
+
+def rotation_tensors(coords):
+    """Computes the rotation factors of the Slater-Koster two-center integrals
+    for all orbitals with l <= L_MAX and for a batch of bonds at once.
+    For two orbitals (l1, m1) and (l2, m2), the factor multiplying the tabular parameter
+    with the symmetry m (sigma, pi, delta) reads
+    s[l1, m1 + L_MAX, m] * s[l2, m2 + L_MAX, m] + t[l1, m1 + L_MAX, m] * t[l2, m2 + L_MAX, m].
+    For m > 0, s and t are given by the functions s_me() and t_me(); for m = 0, s contains the factor
+    sqrt(2) * a_coef(m1) * d_me(l, |m1|, 0) and t is zero.
+
+    Parameters
+    ----------
+    coords : numpy.ndarray
+        directional cosines of radius vectors, array of the shape (num_of_bonds, 3)
+
+    Returns
+    -------
+    tuple
+        arrays s and t of the shape (L_MAX + 1, 2 * L_MAX + 1, L_MAX + 1, num_of_bonds)
+        indexed by (l, m1 + L_MAX, m, bond)
+    """
+
+    coords = np.atleast_2d(np.asarray(coords, dtype=float))
+    num_of_bonds = coords.shape[0]
+
+    a, b = rotation_coefficients(np.arctan2(coords[:, 0], coords[:, 1]))
+    a = a.T[:, np.newaxis, :]
+    b = b.T[:, np.newaxis, :]
+    b[L_MAX] = 0
+
+    n = np.clip(coords[:, 2], -1.0, 1.0)
+    cos_half = np.sqrt(0.5 * (1 + n))
+    sin_half = np.sqrt(0.5 * (1 - n))
+    m1 = np.abs(np.arange(-L_MAX, L_MAX + 1))
+
+    s = np.empty((L_MAX + 1, 2 * L_MAX + 1, L_MAX + 1, num_of_bonds))
+    t = np.empty((L_MAX + 1, 2 * L_MAX + 1, L_MAX + 1, num_of_bonds))
+
+    for l in range(L_MAX + 1):
+        k = np.arange(2 * l + 1)[:, np.newaxis]
+        monomials = cos_half ** (2 * l - k) * sin_half ** k
+        coefs = _ST_COEFS[l, :, :, :, :2 * l + 1]
+        st = np.dot(coefs.reshape(-1, 2 * l + 1), monomials).reshape(coefs.shape[:-1] + (num_of_bonds,))
+        s[l] = a * st[0, m1]
+        t[l] = b * st[1, m1]
+
+    return s, t
 
 
 def d_me(N, l, m1, m2):
@@ -69,7 +364,7 @@ def d_me(N, l, m1, m2):
 
     Parameters
     ----------
-    N :
+    N : float or numpy.ndarray
         directional cosine relative to z-axis
     l :
         orbital quantum number
@@ -85,28 +380,10 @@ def d_me(N, l, m1, m2):
 
     """
 
-    if N == -1:
-       N += sys.float_info.epsilon
-
+    if l > L_MAX:
+        raise ValueError("Rotation matrices are tabulated for l <= {}".format(L_MAX))
 
-    prefactor = ((0.5 * (1 + N)) ** l) * (((1 - N) / (1 + N)) ** (m1 * 0.5 - m2 * 0.5)) * \
-            math.sqrt(math.factorial(l + m2) * math.factorial(l - m2) *
-                      math.factorial(l + m1) * math.factorial(l - m1))
-
-    ans = 0
-
-    for t in range(2 * l + 2):
-        if l + m2 - t >= 0 and l - m1 - t >= 0 and t + m1 - m2 >= 0:
-            if N == -1.0 and t == 0:
-                ans += ((-1) ** t) / \
-                       (math.factorial(l + m2 - t) * math.factorial(l - m1 - t) *
-                        math.factorial(t) * math.factorial(t + m1 - m2))
-            else:
-                ans += ((-1) ** t) * (((1 - N) / (1 + N)) ** t) / \
-                       (math.factorial(l + m2 - t) * math.factorial(l - m1 - t) *
-                        math.factorial(t) * math.factorial(t + m1 - m2))
-
-    return ans * prefactor
+    return wigner_d(N)[..., l, m1 + L_MAX, m2 + L_MAX]
 
 
 def tau(m):
@@ -146,7 +423,7 @@ def a_coef(m, gamma):
         return 1.0 / math.sqrt(2)
     else:
         return ((-1) ** abs(m)) * \
-               (tau(m) * math.cos(abs(m) * gamma) - tau(-m) * math.sin(abs(m) * gamma))
+               (tau(m) * np.cos(abs(m) * gamma) - tau(-m) * np.sin(abs(m) * gamma))
 
 
 def b_coef(m, gamma):
@@ -165,7 +442,7 @@ def b_coef(m, gamma):
     """
 
     return ((-1) ** abs(m)) * \
-           (tau(m) * math.sin(abs(m) * gamma) + tau(-m) * math.cos(abs(m) * gamma))
+           (tau(m) * np.sin(abs(m) * gamma) + tau(-m) * np.cos(abs(m) * gamma))
 
 
 def s_me(N, l, m1, m2, gamma):
@@ -303,6 +580,98 @@ def me(atom1, ll1, atom2, ll2, coords, which_neighbour=0, overlap=False):
         return 0
 
 
+def me_block(atom1, atom2, coords, which_neighbour=0, overlap=False, with_overlap=False):
+    """Computes blocks of the non-diagonal matrix elements of the tight-binding Hamiltonian
+    coupling all orbitals of the first site with all orbitals of the second site
+    for a batch of bonds connecting sites of the same kinds.
+    Direction cosines, rotation matrices and tabular parameters are evaluated
+    once per batch for all bonds at once.
+
+    Parameters
+    ----------
+    atom1 : tb.Orbitals
+        basis set associated with the first site
+    atom2 : tb.Orbitals
+        basis set associated with the second site
+    coords : numpy.ndarray
+        directional cosines of radius vectors pointing from one site to another,
+        array of the shape (num_of_bonds, 3)
+    which_neighbour : int or numpy.ndarray
+        Order of a nearest neighbour (first-, second-, third- etc) for each bond (Default value = 0)
+    overlap : bool
+            A flag indicating that the overlap matrix elements have to be computed
+    with_overlap : bool
+            If True, the blocks of the Hamiltonian and overlap matrices are computed together
+            sharing the rotation factors (Default value = False)
+
+    Returns
+    -------
+    numpy.ndarray or tuple
+        array of the shape (num_of_bonds, atom1.num_of_orbitals, atom2.num_of_orbitals);
+        if `with_overlap` is True, the tuple of such arrays for the Hamiltonian and overlap matrices
+    """
+
+    coords = np.atleast_2d(np.asarray(coords, dtype=float))
+    num_of_bonds = coords.shape[0]
+    which_neighbour = np.broadcast_to(which_neighbour, (num_of_bonds,))
+
+    if with_overlap:
+        flags = [False, True]
+    else:
+        flags = [overlap]
+
+    ans = [np.zeros((num_of_bonds, atom1.num_of_orbitals, atom2.num_of_orbitals)) for _ in flags]
+
+    # determine type of bonds
+    atoms = sorted([item.upper() for item in [atom1.title, atom2.title]])
+    atoms = atoms[0] + '_' + atoms[1]
+
+    # rotation factors for all orbitals
+    s, t = rotation_tensors(coords)
+
+    for ll1, orbital1 in enumerate(atom1.orbitals):
+        for ll2, orbital2 in enumerate(atom2.orbitals):
+
+            n1, l1, m1, s1 = orbital1['n'], orbital1['l'], orbital1['m'], orbital1['s']
+            n2, l2, m2, s2 = orbital2['n'], orbital2['l'], orbital2['m'], orbital2['s']
+
+            if s1 != s2:
+                continue
+
+            if l1 > l2:
+                code = [n2, n1]
+            elif l1 == l2:
+                code = [min(n1, n2), max(n1, n2)]
+            else:
+                code = [n1, n2]
+
+            l_min = min(l1, l2)
+            l_max = max(l1, l2)
+
+            # tabular parameters for each bond
+            params = np.array([tb_params_block(atoms, code[0], code[1], l_min, l_max, which_neighbour, overlap=flag)
+                               for flag in flags])
+
+            if not np.any(params):
+                continue
+
+            # angular factors multiplying the tabular parameters for each m
+            prefactor = (-1) ** ((l1 - l2 + abs(l1 - l2)) * 0.5)
+            factors = s[l1, m1 + L_MAX, :l_min + 1] * s[l2, m2 + L_MAX, :l_min + 1] + \
+                t[l1, m1 + L_MAX, :l_min + 1] * t[l2, m2 + L_MAX, :l_min + 1]
+
+            for j in range(len(flags)):
+                ans[j][:, ll1, ll2] = prefactor * np.sum(factors * params[j], axis=0)
+
+    if with_overlap:
+        return ans[0], ans[1]
+    else:
+        return ans[0]
+
+
+compile_tb_params()
+
+
 if __name__ == "__main__":
 
     x0 = np.array([0, 0, 0], dtype=float)
@@ -4,23 +4,393 @@ The module contains a library of classes facilitating computations of Hamiltonia
 from __future__ import print_function, division
 from __future__ import absolute_import
 from collections import OrderedDict
-from functools import reduce
+from functools import reduce, partial
 import logging
 import inspect
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from operator import mul
 import numpy as np
 import scipy
+import scipy.linalg
+import scipy.sparse
+from scipy.optimize import linear_sum_assignment
 from nanonet.tb.abstract_interfaces import AbstractBasis
-from nanonet.tb.structure_designer import StructDesignerXYZ, CyclicTopology
-from nanonet.tb.diatomic_matrix_element import me
+from nanonet.tb.structure_designer import StructDesignerXYZ, CyclicTopology, NeighbourTable, \
+    build_periodic_neighbour_table
+from nanonet.tb.diatomic_matrix_element import me, me_block, compile_tb_params
 from nanonet.tb.orbitals import Orbitals
-from nanonet.tb.aux_functions import dict2xyz
+from nanonet.tb.aux_functions import dict2np
+from nanonet.tb.hamiltonian_cache import HamiltonianCache, tb_params_tables, function_source
 from nanonet.tb.block_tridiagonalization import find_nonzero_lines, split_into_subblocks_optimized, cut_in_blocks, split_into_subblocks
 import nanonet.verbosity as verbosity
 
 
 unique_distances = set()
 
+# spin-orbit coupling matrix elements between p-orbitals in units of so_coupling / 3,
+# keys are tuples (title1, spin1, title2, spin2)
+SO_P_ORBITALS = {('px', 0, 'py', 0): -1j,
+                 ('py', 0, 'px', 0): 1j,
+                 ('px', 1, 'py', 1): 1j,
+                 ('py', 1, 'px', 1): -1j,
+                 ('px', 0, 'pz', 1): 1,
+                 ('py', 0, 'pz', 1): -1j,
+                 ('pz', 0, 'px', 1): -1,
+                 ('pz', 0, 'py', 1): 1j,
+                 ('pz', 1, 'px', 0): 1,
+                 ('pz', 1, 'py', 0): 1j,
+                 ('px', 1, 'pz', 0): -1,
+                 ('py', 1, 'pz', 0): -1j}
+
+# data types of matrices supported by the class Hamiltonian
+DTYPES = (np.dtype(np.float64), np.dtype(np.complex64), np.dtype(np.complex128))
+
+# the largest basis size for which the matrices for all wave vectors are diagonalized
+# as a single stack of matrices rather than one by one
+STACKED_EIGH_MAX_SIZE = 128
+
+# the Hamiltonian object used by the worker processes of diagonalize_periodic_bc_batch()
+_WORKER_HAMILTONIAN = None
+
+
+def match_bands(vects_prev, vects):
+    """Matches eigenvectors computed for two adjacent wave vectors by maximizing their overlaps.
+
+    Parameters
+    ----------
+    vects_prev : numpy.ndarray
+        eigenvectors for the previous wave vector, array of the shape (basis_size, num_of_bands)
+    vects : numpy.ndarray
+        eigenvectors for the current wave vector, array of the shape (basis_size, num_of_states)
+        with num_of_states >= num_of_bands
+
+    Returns
+    -------
+    numpy.ndarray
+        indices of the states continuing the bands, i.e. the band j goes over into the state ind[j]
+    """
+
+    overlaps = np.abs(np.dot(np.conj(vects_prev).T, vects)) ** 2
+    _, ind = linear_sum_assignment(-overlaps)
+
+    return ind
+
+
+def _init_worker(hamiltonian):
+    """Initializes a worker process with a Hamiltonian object.
+
+    Parameters
+    ----------
+    hamiltonian : Hamiltonian
+        Hamiltonian object with precomputed lattice blocks
+    """
+
+    global _WORKER_HAMILTONIAN
+    _WORKER_HAMILTONIAN = hamiltonian
+
+
+def _diagonalize_in_worker(k_vector, **kwargs):
+    """Diagonalizes the Hamiltonian of the worker process for the wave vector `k_vector`.
+
+    Parameters
+    ----------
+    k_vector : list
+        wave vector
+    **kwargs :
+        options of diagonalize_periodic_bc()
+
+    Returns
+    -------
+    tuple
+        eigenvalues and eigenvectors
+    """
+
+    return _WORKER_HAMILTONIAN.diagonalize_periodic_bc(k_vector, **kwargs)
+
+
+def complex_dtype(dtype):
+    """Returns the complex data type of the same precision as a given data type.
+
+    Parameters
+    ----------
+    dtype : type
+        Data type
+
+    Returns
+    -------
+    numpy.dtype
+        Complex data type
+
+    Examples
+    --------
+    >>> complex_dtype(np.float64) == np.complex128
+    True
+    >>> complex_dtype(np.complex64) == np.complex64
+    True
+    """
+
+    return np.result_type(dtype, np.complex64)
+
+
+class TripletAssembler(object):
+    """Collects matrix elements as (row, column, value) triplets stored in preallocated arrays
+    and builds a dense or sparse matrix from them in one step. Duplicate entries are summed up.
+
+    Parameters
+    ----------
+    shape : tuple
+        Shape of the matrix
+    capacity : int
+        Expected number of matrix elements used to preallocate arrays (Default value = 0)
+    dtype : type
+        Data type of matrix elements (Default value = complex)
+
+    Examples
+    --------
+    >>> from nanonet.tb.hamiltonian import TripletAssembler
+    >>> triplets = TripletAssembler((2, 2), capacity=3, dtype=float)
+    >>> triplets.add([0, 1], [0, 1], [1.0, 2.0])
+    >>> triplets.add(0, 0, 1.0)
+    >>> triplets.todense()
+    array([[2., 0.],
+           [0., 2.]])
+    """
+
+    def __init__(self, shape, capacity=0, dtype=complex):
+
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self._rows = np.empty(capacity, dtype=int)
+        self._cols = np.empty(capacity, dtype=int)
+        self._values = np.empty(capacity, dtype=dtype)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def rows(self):
+        """Row indices"""
+        return self._rows[:self._size]
+
+    @property
+    def cols(self):
+        """Column indices"""
+        return self._cols[:self._size]
+
+    @property
+    def values(self):
+        """Values of matrix elements"""
+        return self._values[:self._size]
+
+    def add(self, rows, cols, values):
+        """Appends matrix elements.
+
+        Parameters
+        ----------
+        rows : int or array-like
+            Row indices
+        cols : int or array-like
+            Column indices
+        values : scalar or array-like
+            Values of matrix elements; scalars are broadcast to all indices
+        """
+
+        rows = np.ravel(rows)
+        cols = np.ravel(cols)
+        values = np.broadcast_to(values, np.shape(rows) if np.ndim(values) == 0 else np.shape(values)).ravel()
+
+        end = self._size + len(rows)
+
+        if end > len(self._rows):
+            capacity = max(end, 2 * len(self._rows))
+            self._rows = np.resize(self._rows, capacity)
+            self._cols = np.resize(self._cols, capacity)
+            self._values = np.resize(self._values, capacity)
+
+        self._rows[self._size:end] = rows
+        self._cols[self._size:end] = cols
+        self._values[self._size:end] = values
+        self._size = end
+
+    def todense(self):
+        """Builds a dense matrix
+
+        Returns
+        -------
+        numpy.ndarray
+            Dense matrix
+        """
+
+        ans = np.zeros(self.shape, dtype=self.dtype)
+        np.add.at(ans, (self.rows, self.cols), self.values)
+
+        return ans
+
+    def tocsr(self):
+        """Builds a sparse matrix in the CSR format
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            Sparse matrix
+        """
+
+        ans = scipy.sparse.coo_matrix((self.values, (self.rows, self.cols)), shape=self.shape).tocsr()
+        ans.eliminate_zeros()
+
+        return ans
+
+
+def group_bonds(kinds1, kinds2):
+    """Splits a list of bonds into groups of bonds connecting atoms of the same kinds.
+
+    Parameters
+    ----------
+    kinds1 : numpy.ndarray
+        integer species indices of the first atom of each bond
+    kinds2 : numpy.ndarray
+        integer species indices of the second atom of each bond
+
+    Returns
+    -------
+    OrderedDict
+        dictionary with pairs of species indices as keys and arrays of bond indices as values
+
+    Examples
+    --------
+    >>> groups = group_bonds(np.array([0, 1, 0, 0]), np.array([1, 1, 1, 0]))
+    >>> for key, bonds in groups.items():
+    ...     print(key, bonds)
+    (0, 0) [3]
+    (0, 1) [0 2]
+    (1, 1) [1]
+    """
+
+    groups = OrderedDict()
+
+    pairs = np.stack((np.asarray(kinds1, dtype=int).ravel(), np.asarray(kinds2, dtype=int).ravel()), axis=1)
+
+    if len(pairs) == 0:
+        return groups
+
+    keys, inverse = np.unique(pairs, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    order = np.argsort(inverse, kind='stable')
+    bounds = np.searchsorted(inverse[order], np.arange(len(keys) + 1))
+
+    for j, key in enumerate(keys):
+        groups[(int(key[0]), int(key[1]))] = order[bounds[j]:bounds[j + 1]]
+
+    return groups
+
+
+def vectorize_radial_dep(func):
+    """Makes a radial dependence function applicable to arrays of distances.
+    If the function already accepts an array of distances and returns an array of the same shape,
+    it is returned unchanged; otherwise it is lifted through numpy.vectorize.
+
+    Parameters
+    ----------
+    func : callable
+        function of a distance
+
+    Returns
+    -------
+    callable
+        function of an array of distances
+
+    Examples
+    --------
+    >>> import math
+    >>> f = vectorize_radial_dep(lambda x: math.exp(-x))
+    >>> print(np.round(f(np.array([0.0, 1.0])), 4))
+    [1.     0.3679]
+    >>> g = vectorize_radial_dep(np.exp)
+    >>> g is np.exp
+    True
+    """
+
+    probe = np.array([1.0, 2.5])
+
+    try:
+        ans = np.asarray(func(probe), dtype=float)
+        if ans.shape == probe.shape and np.allclose(ans, [func(item) for item in probe]):
+            return func
+    except (TypeError, ValueError):
+        pass
+
+    return np.vectorize(func, otypes=[float])
+
+
+def _has_conjugated_bonds(atoms1, atoms2, vectors, tol=1e-6):
+    """Checks whether for each bond (j1, j2, r) the list of bonds contains the bond (j2, j1, -r).
+
+    Parameters
+    ----------
+    atoms1 : numpy.ndarray
+        indices of the first atom of each bond
+    atoms2 : numpy.ndarray
+        indices of the second atom of each bond
+    vectors : numpy.ndarray
+        radius vectors of bonds
+    tol : float
+        tolerance used to compare radius vectors (Default value = 1e-6)
+
+    Returns
+    -------
+    bool
+        True if the bonds come in conjugated pairs
+    """
+
+    vectors = np.rint(vectors / tol).astype(np.int64)
+    bonds = np.column_stack((atoms1, atoms2, vectors))
+    mirrored = np.column_stack((atoms2, atoms1, -vectors))
+
+    bonds = bonds[np.lexsort(bonds.T[::-1])]
+    mirrored = mirrored[np.lexsort(mirrored.T[::-1])]
+
+    return np.array_equal(bonds, mirrored)
+
+
+def block_indices(offsets1, offsets2, num1, num2):
+    """Computes matrix indices of the blocks of matrix elements
+    coupling all orbitals of one atom with all orbitals of another atom.
+
+    Parameters
+    ----------
+    offsets1 : numpy.ndarray
+        matrix indices of the first orbital of the first atom of each bond
+    offsets2 : numpy.ndarray
+        matrix indices of the first orbital of the second atom of each bond
+    num1 : int
+        number of orbitals of the first atom
+    num2 : int
+        number of orbitals of the second atom
+
+    Returns
+    -------
+    rows : numpy.ndarray
+        row indices, array of the shape (num_of_bonds, num1, num2)
+    cols : numpy.ndarray
+        column indices, array of the shape (num_of_bonds, num1, num2)
+    """
+
+    rows = np.asarray(offsets1)[:, np.newaxis, np.newaxis] + np.arange(num1)[np.newaxis, :, np.newaxis]
+    cols = np.asarray(offsets2)[:, np.newaxis, np.newaxis] + np.arange(num2)[np.newaxis, np.newaxis, :]
+    rows, cols = np.broadcast_arrays(rows, cols)
+
+    return rows, cols
+
+
+class OrbitalsDict(dict):
+    """Dictionary of basis sets which ignores digits in atom labels used as keys."""
+
+    def __getitem__(self, key):
+        key = ''.join([i for i in key if not i.isdigit()])
+        return super(OrbitalsDict, self).__getitem__(key)
+
 
 class BasisTB(AbstractBasis, StructDesignerXYZ):
     """The class contains information about sets of quantum numbers and
@@ -52,299 +422,1486 @@ class BasisTB(AbstractBasis, StructDesignerXYZ):
     1
     >>> print(basis.qn2ind({'atoms': 1, 'l': 0}))
     2
+    >>> print(basis.qn2ind({'atoms': [0, 0, 1], 'l': [0, 1, 0]}))
+    [0 1 2]
+    >>> print(dict(basis.ind2qn(2)))
+    {'atoms': 1, 'l': 0}
     >>> print(type(basis.orbitals_dict['A']))
     <class 'nanonet.tb.orbitals.Orbitals'>
     """
 
-    def __init__(self, **kwargs):
+    def __init__(self, **kwargs):
+
+        # parent class StructDesignerXYZ stores atom list initialized from xyz-file
+        super(BasisTB, self).__init__(**kwargs)
+
+        # each entry of the dictionary stores a label of the atom species as a key and
+        # corresponding Atom object as a value. Each atom object contains infomation about number,
+        # energy and symmetry of the orbitals
+        self._orbitals_dict = OrbitalsDict(Orbitals.atoms_factory(list(self.num_of_species.keys())))
+
+        # `quantum_number_lims` counts number of species and corresponding number
+        # of orbitals for each; each atom kind is enumerated
+        self.quantum_numbers_lims = []
+        for item in list(self.num_of_species.keys()):
+            self.quantum_numbers_lims.append(OrderedDict([('atoms', self.num_of_species[item]),
+                                                          ('l', self.orbitals_dict[item].num_of_orbitals)]))
+
+        # basis sets and quantum numbers for each species
+        self._kinds = [self._orbitals_dict[item] for item in self.species]
+        self._quantum_numbers = [item.get_quantum_numbers() for item in self._kinds]
+
+        # number of orbitals for each atom
+        self._num_of_orbitals = np.array([item.num_of_orbitals for item in self._kinds],
+                                         dtype=int)[self.species_ids]
+
+        # count total number of basis functions
+        self.basis_size = int(np.sum(self._num_of_orbitals))
+
+        # compute offset index for each atom
+        self._offsets = np.concatenate(([0], np.cumsum(self._num_of_orbitals)[:-1])).astype(int)
+
+        # make a log
+        logging.info("Basis set \n Num of species {} \n".format(self.num_of_species))
+        for key, label in self._orbitals_dict.items():
+            logging.info("\n {} {} ".format(key, label.generate_info()))
+        logging.info("---------------------------------\n")
+
+    def qn2ind(self, qn):
+        """Computes a matrix index of an matrix element from the index of atom and the index of atomic orbital.
+        Both indices may be integer arrays, in which case an array of matrix indices is returned.
+
+        Parameters
+        ----------
+        qn : dict
+            A dictionary with two keys `atoms` and `l`, where the fist one is the atom index and
+            the later is the orbital index.
+
+        Returns
+        -------
+        type int
+            Index of the TB matrix
+        """
+
+        qn = dict(qn)
+
+        if list(qn.keys()) == ['atoms', 'l']:  # check if the input is a proper set of quantum numbers
+            return self._offsets[qn['atoms']] + qn['l']
+        else:
+            raise IndexError("Wrong set of quantum numbers")
+
+    def ind2qn(self, ind):
+        """Computes the index of atom and the index of atomic orbital from a matrix index.
+        The input may be an integer array, in which case arrays of quantum numbers are returned.
+
+        Parameters
+        ----------
+        ind : int or numpy.ndarray
+            Index of the TB matrix
+
+        Returns
+        -------
+        type OrderedDict
+            A dictionary with two keys `atoms` and `l`, where the fist one is the atom index and
+            the later is the orbital index.
+        """
+
+        atoms = np.searchsorted(self._offsets, ind, side='right') - 1
+        l = ind - self._offsets[atoms]
+
+        if np.ndim(ind) == 0:
+            atoms = int(atoms)
+            l = int(l)
+
+        return OrderedDict([('atoms', atoms), ('l', l)])
+
+    @property
+    def orbitals_dict(self):
+        """Returns the dictionary data structure of orbitals. In the dictionary"""
+
+        return self._orbitals_dict
+
+    @property
+    def num_of_orbitals(self):
+        """Returns the array of numbers of orbitals for each atom"""
+
+        return self._num_of_orbitals
+
+    @property
+    def offsets(self):
+        """Returns the array of matrix indices of the first orbital for each atom"""
+
+        return self._offsets
+
+    @property
+    def quantum_numbers(self):
+        """Returns the list of structured arrays of quantum numbers for each species"""
+
+        return self._quantum_numbers
+
+
+class Hamiltonian(BasisTB):
+    """Class defines a Hamiltonian matrix as well as a set of member-functions
+    allowing to build, diagonalize and visualize the matrix.
+
+    Examples
+    --------
+    >>> from nanonet.verbosity import set_verbosity
+    >>> import nanonet.tb as tb
+    >>> set_verbosity(0)
+    >>> tb.Orbitals('A').add_orbital(title='s', energy=-1)
+    >>> tb.Orbitals('B').add_orbital(title='s', energy=-2)
+    >>> xyz_file = '''2
+    ... Two atoms
+    ... A1 0 0 0
+    ... B1 0 0 1.5'''
+    >>> tb.set_tb_params(PARAMS_A_B={'ss_sigma': 0.1})
+    >>> h = tb.Hamiltonian(xyz=xyz_file, nn_distance=2.0).initialize()
+    >>> h.h_matrix
+    array([[-1. ,  0.1],
+           [ 0.1, -2. ]])
+    >>> tb.Hamiltonian(xyz=xyz_file, nn_distance=2.0, dtype=complex).initialize().h_matrix
+    array([[-1. +0.j,  0.1+0.j],
+           [ 0.1+0.j, -2. +0.j]])
+    """
+
+    def __init__(self, **kwargs):
+        """
+
+        Parameters
+        ----------
+        xyz : str or object
+            The filename of a xyz-file or a .npz/.npy file, xyz data as a string, a dictionary, or an object
+            exposing the methods get_chemical_symbols() and get_positions(), e.g. ase.Atoms
+        labels : list
+            Atomic labels; together with `coords`, it is an alternative to `xyz` avoiding text formatting
+        coords : numpy.ndarray
+            Atomic coordinates, array of the shape (num_of_atoms, 3)
+        nn_distance : float, list
+            Nearest neighbour distance of distances
+            if the tight-binding method is beyond the first-nearest neighbour approximation (Default value = 2.39)
+        radial_dep : func
+             Radial dependence function (Default value = None)
+        half_assembly : bool
+             If True, matrix elements are computed only for one atom of each pair of bonded atoms,
+             the conjugate-transpose blocks are filled automatically (Default value = True)
+        check_half_assembly : bool
+             If True, the matrices obtained with `half_assembly` are compared with
+             the full evaluation; this is a debugging option (Default value = False)
+        cache_dir : str
+             Path to the directory where the assembled matrices are cached. The cache entries are
+             identified by the structure, nearest-neighbour distances, radial dependence function,
+             basis sets and tables of tight-binding parameters. If None, the matrices are not cached
+             (Default value = None)
+        dtype : type
+             Data type of matrices: numpy.float64, numpy.complex64 or numpy.complex128.
+             If None, real matrices are used for models without the spin-orbit coupling and
+             complex matrices otherwise; the matrices with the periodic boundary conditions are
+             promoted to the complex type of the same precision for non-zero wave vectors (Default value = None)
+        """
+
+        nn_distance = kwargs.get('nn_distance', 2.39)
+        self._nn_distances = list(nn_distance) if isinstance(nn_distance, list) else nn_distance
+        self.int_radial_dependence = None
+        nn_distance = self._set_nn_distances(nn_distance)
+        self.compute_overlap = kwargs.get('comp_overlap', False)
+        self.compute_angular = kwargs.get('comp_angular_dep', True)
+        self.half_assembly = kwargs.get('half_assembly', True)
+        self.check_half_assembly = kwargs.get('check_half_assembly', False)
+
+        logging.info('The verbosity level is {}'.format(verbosity.VERBOSITY))
+        logging.info('The radius of the neighbourhood is {} Ang'.format(nn_distance))
+        logging.info("\n---------------------------------\n")
+
+        kwargs['nn_distance'] = nn_distance
+
+        # the tables of tight-binding parameters may have been changed since the last compilation
+        compile_tb_params()
+
+        # structures given by dictionaries are passed as arrays skipping the xyz format
+        if isinstance(kwargs.get('xyz', None), dict):
+            kwargs['labels'], kwargs['coords'] = dict2np(kwargs.pop('xyz'))
+
+        super(Hamiltonian, self).__init__(**kwargs)
+
+        self._coords = None  # coordinates of sites
+        self.h_matrix = None  # Hamiltonian for an isolated system
+        self.ov_matrix = None  # overlap matrix for an isolated system
+        self.h_matrix_left_lead = None
+        self.h_matrix_right_lead = None
+        self.k_vector = 0  # default value of the wave vector
+        self.ct = None
+        self._primitive_cell = None
+        self._lattice_sums = None  # lattice blocks rearranged for Bloch sums
+        self._bloch_buffers = {}  # buffers reused for all wave vectors
+        self._subblocks = None  # the last computed partition into block-tridiagonal subblocks
+
+        cache_dir = kwargs.get('cache_dir', None)
+
+        if cache_dir is None:
+            self._cache = None
+        else:
+            self._cache = HamiltonianCache(cache_dir)
+        self.radial_dependence = None
+        self.so_coupling = kwargs.get('so_coupling', 0.0)
+        self.dtype = self._set_dtype(kwargs.get('dtype', None))
+
+        radial_dep = kwargs.get('radial_dep', None)
+
+        if radial_dep is None:
+            logging.info('Radial dependence function: None')
+            logging.info("\n---------------------------------\n")
+        else:
+            logging.info('Radial dependence function:\n\n{}'.format(inspect.getsource(radial_dep)))
+            logging.info("\n---------------------------------\n")
+
+        self.radial_dependence = radial_dep
+
+        # the function applied to arrays of distances
+        self._radial_dependence = None if radial_dep is None else vectorize_radial_dep(radial_dep)
+
+    def initialize(self):
+        """Compute matrix elements of the Hamiltonian.
+
+        Returns
+        -------
+        type Hamiltonian
+            Returns the instance of the class Hamiltonian
+        """
+
+        self._coords = np.repeat(self.atom_coords, self._num_of_orbitals, axis=0)
+
+        self.h_matrix, self.ov_matrix = self._assemble_h_matrix(overlap=self.compute_overlap)
+
+        # the tight-binding parameters may have been changed since the lattice blocks were computed
+        self._lattice_blocks = None
+        self._lattice_sums = None
+
+        logging.info("Unique distances: \n    {}".format("\n    ".join(unique_distances)))
+        logging.info("---------------------------------\n")
+
+        return self
+
+    def _set_dtype(self, dtype):
+        """Checks the data type of matrices or chooses it automatically.
+
+        Parameters
+        ----------
+        dtype : type
+            Data type of matrices or None
+
+        Returns
+        -------
+        numpy.dtype
+            Data type of matrices
+        """
+
+        if dtype is None:
+            # the spin-orbit coupling is the only source of complex matrix elements
+            # in the absence of the periodic boundary conditions
+            dtype = np.float64 if self.so_coupling == 0 else np.complex128
+
+        dtype = np.dtype(dtype)
+
+        if dtype not in DTYPES:
+            raise ValueError("Data type of matrices should be one of {}".format(", ".join(map(str, DTYPES))))
+
+        if self.so_coupling != 0 and not np.issubdtype(dtype, np.complexfloating):
+            raise ValueError("The spin-orbit coupling requires a complex data type of matrices")
+
+        return dtype
+
+    def _bloch_dtype(self):
+        """Returns the data type of matrices with the periodic boundary conditions
+        for the current wave vector; the matrices are real only at the Gamma point.
+
+        Returns
+        -------
+        numpy.dtype
+            Data type
+        """
+
+        if self.k_vector is None or np.any(np.asarray(self.k_vector) != 0):
+            return complex_dtype(self.dtype)
+        else:
+            return self.dtype
+
+    def _bloch_phases(self, vectors):
+        """Computes Bloch phase factors exp(ikr) for the current wave vector.
+
+        Parameters
+        ----------
+        vectors : numpy.ndarray
+            radius vectors, array of the shape (N, 3)
+
+        Returns
+        -------
+        numpy.ndarray
+            phase factors of the data type returned by _bloch_dtype()
+        """
+
+        dtype = self._bloch_dtype()
+        phases = np.exp(1j * np.dot(vectors, self.k_vector))
+
+        if not np.issubdtype(dtype, np.complexfloating):
+            phases = phases.real
+
+        return phases.astype(dtype, copy=False)
+
+    def _cache_key(self, *items):
+        """Computes the hash key of a cache entry. The key depends on the structure,
+        the nearest-neighbour distances, the radial dependence, the basis sets and the tables
+        of tight-binding parameters, as well as on additional items identifying the entry.
+
+        Parameters
+        ----------
+        *items :
+            additional items identifying the entry
+
+        Returns
+        -------
+        str
+            hash key or None if the cache is not used or the key can not be computed
+        """
+
+        if self._cache is None:
+            return None
+
+        radial_dep = function_source(self.radial_dependence)
+
+        if radial_dep is None:
+            logging.info('The source code of the radial dependence function is not available, '
+                         'the Hamiltonian is not cached')
+            return None
+
+        return HamiltonianCache.make_key(self.__class__.__name__,
+                                         list(self.atom_list.keys()),
+                                         self.atom_coords,
+                                         self._nn_distances,
+                                         self.so_coupling,
+                                         str(self.dtype),
+                                         self.compute_overlap,
+                                         self.compute_angular,
+                                         radial_dep,
+                                         [(kind.title, kind.orbitals) for kind in self._kinds],
+                                         tb_params_tables(),
+                                         *items)
+
+    def _load_from_cache(self, key, names):
+        """Loads matrices from the cache.
+
+        Parameters
+        ----------
+        key : str
+            hash key of the cache entry
+        names : list
+            names of matrices
+
+        Returns
+        -------
+        list
+            list of matrices or None if any of them is not in the cache
+        """
+
+        if key is None:
+            return None
+
+        matrices = [self._cache.load(key, name) for name in names]
+
+        if any(item is None for item in matrices):
+            return None
+
+        logging.info('Matrices {} are loaded from the cache {}'.format(', '.join(names), self._cache.cache_dir))
+
+        return matrices
+
+    def _save_to_cache(self, key, matrices):
+        """Stores matrices in the cache.
+
+        Parameters
+        ----------
+        key : str
+            hash key of the cache entry
+        matrices : dict
+            dictionary with the names of matrices as keys and matrices as values;
+            the items with values None are skipped
+        """
+
+        if key is None:
+            return
+
+        for name, matrix in matrices.items():
+            if matrix is not None:
+                self._cache.save(key, name, matrix)
+
+    def _assemble_h_matrix(self, overlap=False):
+        """Computes the Hamiltonian matrix and, optionally, the overlap matrix
+        for the isolated system. If the cache is used, the matrices are loaded from it when possible.
+
+        Parameters
+        ----------
+        overlap : bool
+            A flag indicating that the overlap matrix has to be computed (Default value = False)
+
+        Returns
+        -------
+        tuple
+            Hamiltonian and overlap matrices; the later is None if `overlap` is False
+        """
+
+        key = self._cache_key('h_matrix', overlap)
+        matrices = self._load_from_cache(key, ['h_matrix', 'ov_matrix'][:1 + overlap])
+
+        if matrices is not None:
+            return matrices[0], matrices[1] if overlap else None
+
+        matrices = self._assemble_h_matrix_triplets(overlap=overlap, half=self.half_assembly)
+
+        if self.half_assembly and self.check_half_assembly:
+            self._check_half_assembly(matrices, self._assemble_h_matrix_triplets(overlap=overlap, half=False))
+
+        self._save_to_cache(key, {'h_matrix': matrices[0], 'ov_matrix': matrices[1]})
+
+        return matrices
+
+    def _assemble_h_matrix_triplets(self, overlap=False, half=False):
+        """Collects on-site and inter-site matrix elements as triplets and builds matrices from them.
+
+        Parameters
+        ----------
+        overlap : bool
+            A flag indicating that the overlap matrix has to be computed (Default value = False)
+        half : bool
+            If True, only the half of the inter-site matrix elements is computed,
+            the other half is obtained by mirroring (Default value = False)
+
+        Returns
+        -------
+        tuple
+            Hamiltonian and overlap matrices; the later is None if `overlap` is False
+        """
+
+        # matrix elements are collected as triplets and the matrices are built in one step
+        capacity = self._count_matrix_elements()
+        h_triplets = TripletAssembler((self.basis_size, self.basis_size), capacity=capacity, dtype=self.dtype)
+        ov_triplets = None
+
+        if overlap:
+            ov_triplets = TripletAssembler((self.basis_size, self.basis_size), capacity=capacity, dtype=self.dtype)
+
+        # on site interactions
+        self._compute_h_matrix_onsite(h_triplets, ov_triplets)
+
+        # nearest neighbours interaction
+        self._compute_h_matrix_nn(h_triplets, ov_triplets, half=half)
+
+        if overlap:
+            return self._build_matrix(h_triplets), self._build_matrix(ov_triplets)
+        else:
+            return self._build_matrix(h_triplets), None
+
+    @staticmethod
+    def _check_half_assembly(matrices, full_matrices):
+        """Compares matrices obtained by mirroring of matrix elements
+        with the ones obtained from the full evaluation.
+
+        Parameters
+        ----------
+        matrices : iterable
+            matrices obtained with the half assembly
+        full_matrices : iterable
+            matrices obtained with the full evaluation
+        """
+
+        for mat, full_mat in zip(matrices, full_matrices):
+            if mat is None:
+                continue
+
+            diff = abs(mat - full_mat).max() if mat.shape[0] > 0 else 0
+
+            if diff > 1e-10:
+                raise ValueError("Mirrored matrix elements differ from the full evaluation by {}".format(diff))
+
+    def _bond_blocks(self, atoms1, atoms2, vectors, overlap=False):
+        """Computes blocks of matrix elements for a list of bonds.
+        The blocks are computed for groups of bonds connecting atoms of the same kinds.
+
+        Parameters
+        ----------
+        atoms1 : numpy.ndarray
+            indices of the first atom of each bond
+        atoms2 : numpy.ndarray
+            indices of the second atom of each bond
+        vectors : numpy.ndarray
+            radius vectors of bonds
+        overlap : bool
+            A flag indicating that the blocks of the overlap matrix has to be computed as well (Default value = False)
+
+        Returns
+        -------
+        generator
+            yields tuples (bonds, rows, cols, h_blocks, ov_blocks), where `bonds` are indices of the bonds in the group,
+            `rows` and `cols` are matrix indices of the blocks, and `ov_blocks` is None if `overlap` is False
+        """
+
+        groups = group_bonds(self.species_ids[atoms1], self.species_ids[atoms2])
+
+        for (id1, id2), bonds in groups.items():
+            kind1, kind2 = self._kinds[id1], self._kinds[id2]
+            rows, cols = block_indices(self._offsets[atoms1[bonds]], self._offsets[atoms2[bonds]],
+                                       kind1.num_of_orbitals, kind2.num_of_orbitals)
+
+            if overlap:
+                h_blocks, ov_blocks = self._get_me_block(kind1, kind2, vectors[bonds], with_overlap=True)
+            else:
+                h_blocks, ov_blocks = self._get_me_block(kind1, kind2, vectors[bonds]), None
+
+            yield bonds, rows, cols, h_blocks, ov_blocks
+
+    def _count_matrix_elements(self):
+        """Estimates the number of non-zero matrix elements of the Hamiltonian
+        used to preallocate arrays of triplets.
+
+        Returns
+        -------
+        int
+            Number of matrix elements
+        """
+
+        table = self.get_neighbour_table()
+        num_of_orbitals = self._num_of_orbitals
+
+        if self.so_coupling != 0:
+            num_onsite = np.sum(num_of_orbitals ** 2)
+        else:
+            num_onsite = np.sum(num_of_orbitals)
+
+        return int(num_onsite + np.sum(num_of_orbitals[table.i] * num_of_orbitals[table.j]))
+
+    def _compute_h_matrix_onsite(self, h_triplets, ov_triplets=None):
+        """Compute on-site matrix elements.
+
+        Parameters
+        ----------
+        h_triplets : TripletAssembler
+            Triplets of the Hamiltonian matrix
+        ov_triplets : TripletAssembler
+            Triplets of the overlap matrix; if None, the overlap matrix is not computed (Default value = None)
+        """
+
+        # the on-site block is computed once for each species and written for all atoms of the species at once
+        for id1, kind in enumerate(self._kinds):
+
+            atoms = np.flatnonzero(self.species_ids == id1)
+            block = self._onsite_block(kind)
+            mask = block != 0
+
+            rows, cols = block_indices(self._offsets[atoms], self._offsets[atoms],
+                                       kind.num_of_orbitals, kind.num_of_orbitals)
+            h_triplets.add(rows[:, mask], cols[:, mask], np.broadcast_to(block[mask], (len(atoms), np.sum(mask))))
+
+        if ov_triplets is not None:
+            ind = np.arange(self.basis_size)
+            ov_triplets.add(ind, ind, 1.0)
+
+    def _onsite_block(self, atom):
+        """Computes the block of on-site matrix elements for an atom species
+        including the spin-orbit coupling.
+
+        Parameters
+        ----------
+        atom : Orbitals
+            Basis set of the atom
+
+        Returns
+        -------
+        numpy.ndarray
+            Matrix of the size atom.num_of_orbitals x atom.num_of_orbitals
+        """
+
+        block = np.diag(np.array([orbital['energy'] for orbital in atom.orbitals], dtype=self.dtype))
+
+        if self.so_coupling != 0:
+            for l1 in range(atom.num_of_orbitals):
+                for l2 in range(atom.num_of_orbitals):
+                    if l1 != l2:
+                        block[l1, l2] = self._comp_so(atom, l1, l2)
+
+        return block
+
+    def _compute_h_matrix_nn(self, h_triplets, ov_triplets=None, half=False):
+        """Compute matrix elements describing interactions between nearest neighbours.
+        The matrix elements are computed in blocks for all bonds connecting atoms of the same kinds.
+
+        Parameters
+        ----------
+        h_triplets : TripletAssembler
+            Triplets of the Hamiltonian matrix
+        ov_triplets : TripletAssembler
+            Triplets of the overlap matrix; if None, the overlap matrix is not computed (Default value = None)
+        half : bool
+            If True, the matrix elements are computed only for the bonds with j1 < j2,
+            the blocks for j2 > j1 are their conjugate transposes (Default value = False)
+        """
+
+        table = self.get_neighbour_table()
+
+        # the neighbour table contains both directions of each bond
+        if half:
+            bonds = np.flatnonzero(table.i < table.j)
+        else:
+            bonds = np.arange(len(table))
+
+        atoms1, atoms2, vectors = table.i[bonds], table.j[bonds], table.vectors[bonds]
+
+        for _, rows, cols, h_blocks, ov_blocks in self._bond_blocks(atoms1, atoms2, vectors,
+                                                                    overlap=ov_triplets is not None):
+            h_triplets.add(rows, cols, h_blocks)
+            if half:
+                h_triplets.add(cols, rows, np.conj(h_blocks))
+
+            if ov_triplets is not None:
+                ov_triplets.add(rows, cols, ov_blocks)
+                if half:
+                    ov_triplets.add(cols, rows, np.conj(ov_blocks))
+
+    def _build_matrix(self, triplets):
+        """Builds a matrix from triplets.
+
+        Parameters
+        ----------
+        triplets : TripletAssembler
+            Triplets of matrix elements
+
+        Returns
+        -------
+        numpy.ndarray
+            Dense matrix
+        """
+
+        return triplets.todense()
+
+    def set_periodic_bc(self, primitive_cell):
+        """Set periodic boundary conditions.
+        The couplings with the neighbouring cells are found by a neighbour search taking into account
+        the periodicity of the structure (see get_periodic_neighbour_table()); the object of the class
+        CyclicTopology describing periodic images explicitly is available as the attribute `ct`.
+
+        Parameters
+        ----------
+        primitive_cell : list
+            list of vectors defining a primitive cell
+        """
+
+        self.ct = None
+
+        # the object of the class CyclicTopology is created when it is used for the first time,
+        # it is not needed if the matrices are loaded from the cache
+        if list(primitive_cell):
+            self._primitive_cell = np.array(primitive_cell, dtype=float)
+        else:
+            self._primitive_cell = None
+
+    @property
+    def ct(self):
+        """Returns the object of the class CyclicTopology describing periodic boundary conditions"""
+
+        if self._ct is None and self._primitive_cell is not None:
+            self._ct = CyclicTopology(self._primitive_cell.tolist(),
+                                      list(self.atom_list.keys()),
+                                      list(self.atom_list.values()),
+                                      self._nn_distance)
+
+        return self._ct
+
+    @ct.setter
+    def ct(self, value):
+
+        self._ct = value
+        self._primitive_cell = None
+        self._periodic_table = None
+        self._lattice_blocks = None
+
+    def get_periodic_neighbour_table(self):
+        """Returns the table of bonds between atoms of the unit cell and the periodic images of atoms
+        in the neighbouring cells supplemented by the orders of the nearest neighbours.
+        The bonds are found by a neighbour search taking into account the periodicity of the structure,
+        the lattice translation of the second atom of each bond is stored in the attribute `translations`
+        in units of the primitive cell vectors. The table is computed once and reused afterwards.
+
+        Returns
+        -------
+        NeighbourTable
+            table of bonds, or None if periodic boundary conditions are not set
+        """
+
+        cell = self._cell_vectors()
+
+        if cell is None:
+            return None
+
+        if self._periodic_table is None:
+            table = build_periodic_neighbour_table(self.atom_coords, cell, self._nn_distance)
+            periodic = np.any(table.translations != 0, axis=1)
+
+            self._periodic_table = NeighbourTable(table.i[periodic], table.j[periodic],
+                                                  table.vectors[periodic], table.distances[periodic],
+                                                  order=self._which_neighbour(table.distances[periodic]))
+            self._periodic_table.translations = table.translations[periodic]
+
+        return self._periodic_table
+
+    def get_lattice_blocks(self):
+        """Returns the Hamiltonian (and overlap) matrices in the real-space representation of lattice blocks,
+        i.e. the matrices H(R) coupling the orbitals of the unit cell (rows) with the orbitals of
+        the cell translated by the lattice vector R (columns). The blocks are computed once and reused afterwards.
+
+        The matrix for the wave vector k is given by the Bloch sum
+        H(k) = D(k) [sum_R H(R) exp(-ik R)] D(k)^+, where D(k) = diag(exp(ik r_j)) and r_j are the positions
+        of orbitals; the factors D(k) correspond to the atomic gauge used by diagonalize_periodic_bc().
+
+        Returns
+        -------
+        translations : numpy.ndarray
+            lattice translations in units of the primitive cell vectors, array of the shape
+            (num_of_blocks, num_of_vectors), the first translation is zero
+        h_blocks : list
+            Hamiltonian matrices H(R), the first one is the matrix `h_matrix` of the unit cell,
+            other ones are sparse matrices in the CSR format
+        ov_blocks : list
+            overlap matrices S(R) or None if the overlap matrix is not computed
+        """
+
+        translations, h_stacked, ov_stacked = self._get_lattice_blocks()
+        size = self.basis_size
+
+        h_blocks = [self.h_matrix] + [h_stacked[j * size:(j + 1) * size] for j in range(len(translations))]
+
+        if ov_stacked is None:
+            ov_blocks = None
+        else:
+            ov_blocks = [self.ov_matrix] + [ov_stacked[j * size:(j + 1) * size] for j in range(len(translations))]
+
+        translations = np.concatenate((np.zeros((1, translations.shape[1]), dtype=int), translations))
+
+        return translations, h_blocks, ov_blocks
+
+    def _get_lattice_blocks(self):
+        """Computes the blocks H(R) and S(R) for non-zero lattice translations R
+        stacked vertically into sparse matrices of the shape (num_of_translations * basis_size, basis_size).
+
+        Returns
+        -------
+        tuple
+            non-zero lattice translations, stacked Hamiltonian and overlap matrices
+            (the latter is None if the overlap matrix is not computed)
+        """
+
+        if self._lattice_blocks is None:
+            table = self.get_periodic_neighbour_table()
+
+            if table is None:
+                table = NeighbourTable(*([np.zeros(0, dtype=int)] * 2 + [np.zeros((0, 3)), np.zeros(0)]))
+                table.translations = np.zeros((0, 1), dtype=int)
+
+            translations, index = np.unique(table.translations, axis=0, return_inverse=True)
+            index = np.ravel(index)
+
+            shape = (len(translations) * self.basis_size, self.basis_size)
+            h_triplets = TripletAssembler(shape, dtype=self.dtype)
+            ov_triplets = TripletAssembler(shape, dtype=self.dtype) if self.compute_overlap else None
+
+            for bonds, rows, cols, h_blocks, ov_blocks in self._bond_blocks(table.i, table.j, table.vectors,
+                                                                            overlap=ov_triplets is not None):
+                rows = rows + self.basis_size * index[bonds][:, np.newaxis, np.newaxis]
+                h_triplets.add(rows, cols, h_blocks)
+
+                if ov_triplets is not None:
+                    ov_triplets.add(rows, cols, ov_blocks)
+
+            self._lattice_blocks = (translations.reshape(-1, table.translations.shape[1]),
+                                    h_triplets.tocsr(),
+                                    None if ov_triplets is None else ov_triplets.tocsr())
+
+            # the sums over the lattice translations are formed for all non-zero matrix elements at once
+            self._lattice_sums = None
+
+        return self._lattice_blocks
+
+    def _get_lattice_sums(self):
+        """Rearranges the blocks H(R) and S(R) for non-zero lattice translations R
+        into dense tables of the shape (num_of_matrix_elements, num_of_translations),
+        so that the Bloch sums for all matrix elements are computed by a single matrix-vector product.
+
+        Returns
+        -------
+        tuple
+            Cartesian lattice vectors, row and column indices of matrix elements,
+            tables of matrix elements of the Hamiltonian and overlap matrices
+        """
+
+        translations, h_stacked, ov_stacked = self._get_lattice_blocks()
+
+        if self._lattice_sums is None:
+            matrices = [matrix.tocoo() for matrix in [h_stacked, ov_stacked] if matrix is not None]
+
+            # positions of all matrix elements in the matrix of the unit cell
+            positions = np.unique(np.concatenate([(matrix.row % self.basis_size) * self.basis_size + matrix.col
+                                                  for matrix in matrices]))
+            tables = [None, None]
+
+            for j, matrix in enumerate(matrices):
+                blocks, rows = np.divmod(matrix.row, self.basis_size)
+                tables[j] = np.zeros((len(positions), len(translations)), dtype=self.dtype)
+                tables[j][np.searchsorted(positions, rows * self.basis_size + matrix.col), blocks] = matrix.data
+
+            if len(translations) > 0:
+                vectors = np.dot(translations, np.array(self._cell_vectors(), dtype=float).reshape(-1, 3))
+            else:
+                vectors = np.zeros((0, 3))
+
+            self._lattice_sums = (vectors, positions // self.basis_size, positions % self.basis_size,
+                                  tables[0], tables[1])
+
+        return self._lattice_sums
+
+    def get_bloch_matrices(self, k_vector):
+        """Computes the Hamiltonian (and overlap) matrices for the wave vector `k_vector`
+        from the lattice blocks H(R) and S(R), see get_lattice_blocks(), and the current matrices `h_matrix`
+        and `ov_matrix` of the unit cell. The matrices are formed in buffers reused for all wave vectors,
+        i.e. they are overwritten by the next call.
+
+        Parameters
+        ----------
+        k_vector : list or numpy.ndarray
+            wave vector
+
+        Returns
+        -------
+        h_matrix : numpy.ndarray
+            Hamiltonian matrix
+        ov_matrix : numpy.ndarray
+            overlap matrix, or None if the overlap matrix is not computed
+        """
+
+        self.k_vector = list(k_vector)
+
+        vectors, rows, cols, h_table, ov_table = self._get_lattice_sums()
+        lattice_phases = np.exp(-1j * np.dot(vectors, self.k_vector))
+        phases = np.repeat(np.exp(1j * np.dot(self.atom_coords, self.k_vector)), self._num_of_orbitals)
+
+        if not np.issubdtype(self._bloch_dtype(), np.complexfloating):
+            lattice_phases = lattice_phases.real
+            phases = None
+
+        h_matrix = self._bloch_matrix('h_matrix', self.h_matrix, rows, cols,
+                                      np.dot(h_table, lattice_phases), phases)
+
+        if ov_table is None:
+            ov_matrix = None
+        else:
+            ov_matrix = self._bloch_matrix('ov_matrix', self.ov_matrix, rows, cols,
+                                           np.dot(ov_table, lattice_phases), phases)
+
+        return h_matrix, ov_matrix
+
+    def _bloch_matrix(self, name, matrix, rows, cols, values, phases):
+        """Forms the matrix for the current wave vector in a reusable buffer.
+
+        Parameters
+        ----------
+        name : str
+            name of the buffer
+        matrix : numpy.ndarray
+            matrix of the unit cell H(0)
+        rows : numpy.ndarray
+            row indices of the matrix elements coupling the unit cell with its periodic images
+        cols : numpy.ndarray
+            column indices of the matrix elements coupling the unit cell with its periodic images
+        values : numpy.ndarray
+            sums of the matrix elements over lattice translations with the phase factors exp(-ik R)
+        phases : numpy.ndarray
+            phase factors exp(ik r_j) of the atomic gauge, or None if the matrix is real
+
+        Returns
+        -------
+        numpy.ndarray
+            matrix for the current wave vector
+        """
+
+        dtype = self._bloch_dtype()
+        buffer = self._bloch_buffers.get((name, dtype))
+
+        if buffer is None:
+            buffer = np.empty((self.basis_size, self.basis_size), dtype=dtype)
+            self._bloch_buffers[(name, dtype)] = buffer
+
+        np.copyto(buffer, matrix)
+        buffer[rows, cols] += values
+
+        if phases is not None:
+            buffer *= phases[:, np.newaxis]
+            buffer *= np.conj(phases)[np.newaxis, :]
+
+        return buffer
+
+    def update(self, atoms, coords=None, energy_shift=None, subblocks=None):
+        """Updates the matrices after displacing a group of atoms and/or shifting their on-site energies.
+        Only the matrix elements coupling the atoms with their old and new neighbours are recomputed,
+        the matrices `h_matrix` and `ov_matrix` are patched in place. The periodic boundary conditions
+        terms are recomputed when the matrices for a wave vector are requested next time.
+
+        Parameters
+        ----------
+        atoms : int or numpy.ndarray
+            indices of atoms
+        coords : numpy.ndarray
+            new coordinates of atoms, array of the shape (len(atoms), 3);
+            if None, the atoms are not displaced (Default value = None)
+        energy_shift : float or numpy.ndarray
+            shifts of on-site energies of all orbitals for each atom, e.g. due to an electrostatic potential;
+            if None, on-site energies are not changed (Default value = None)
+        subblocks : list
+            sizes of block-tridiagonal subblocks; if None, the partition computed by the last call of
+            get_hamiltonians_block_tridiagonal() is used (Default value = None)
+
+        Returns
+        -------
+        numpy.ndarray
+            indices of the block-tridiagonal subblocks affected by the update;
+            if the partition is not known, the whole matrix is treated as one subblock
+        """
+
+        atoms = np.atleast_1d(np.asarray(atoms, dtype=int))
+        changed = []
+
+        h_triplets = TripletAssembler(self.h_matrix.shape, dtype=self.dtype)
+        ov_triplets = TripletAssembler(self.h_matrix.shape, dtype=self.dtype) if self.compute_overlap else None
+
+        if energy_shift is not None:
+            energy_shift = np.broadcast_to(np.asarray(energy_shift, dtype=float), atoms.shape)
+            ind = self.qn2ind({'atoms': np.repeat(atoms, self._num_of_orbitals[atoms]),
+                               'l': np.concatenate([np.arange(self._num_of_orbitals[j]) for j in atoms])})
+            h_triplets.add(ind, ind, np.repeat(energy_shift, self._num_of_orbitals[atoms]))
+            changed.append(ind)
+
+        if coords is not None:
+            # remove matrix elements of the old bonds
+            rows, cols = self._bond_indices(self._bonds_of(atoms))
+            h_triplets.add(rows, cols, -self._matrix_elements(self.h_matrix, rows, cols))
+            if ov_triplets is not None:
+                ov_triplets.add(rows, cols, -self._matrix_elements(self.ov_matrix, rows, cols))
+            changed.append(rows)
+
+            self.move_atoms(atoms, coords)
+            self._coords = np.repeat(self.atom_coords, self._num_of_orbitals, axis=0)
+
+            # add matrix elements of the new bonds,
+            # only one bond of each pair of conjugated bonds is evaluated
+            table = self.get_neighbour_table()
+            bonds = self._bonds_of(atoms)
+            moved1 = np.isin(table.i[bonds], atoms)
+            moved2 = np.isin(table.j[bonds], atoms)
+            bonds = bonds[moved1 & (~moved2 | (table.i[bonds] < table.j[bonds]))]
+
+            for _, rows, cols, h_blocks, ov_blocks in self._bond_blocks(table.i[bonds], table.j[bonds],
+                                                                        table.vectors[bonds],
+                                                                        overlap=ov_triplets is not None):
+                h_triplets.add(rows, cols, h_blocks)
+                h_triplets.add(cols, rows, np.conj(h_blocks))
+                changed.append(rows.ravel())
+                changed.append(cols.ravel())
+
+                if ov_triplets is not None:
+                    ov_triplets.add(rows, cols, ov_blocks)
+                    ov_triplets.add(cols, rows, np.conj(ov_blocks))
+
+            # periodic images have to be found again
+            if self._ct is not None:
+                self._primitive_cell = np.array(self._ct.pcv, dtype=float)
+                self._ct = None
+            self._periodic_table = None
+            self._lattice_blocks = None
+
+        self.h_matrix = self._patch_matrix(self.h_matrix, h_triplets)
+
+        if ov_triplets is not None:
+            self.ov_matrix = self._patch_matrix(self.ov_matrix, ov_triplets)
+
+        if len(changed) == 0:
+            return np.array([], dtype=int)
+
+        return self._changed_subblocks(np.unique(np.concatenate(changed)), subblocks)
+
+    def iter_frames(self, frames, batch_size=10):
+        """Computes Hamiltonian matrices for a sequence of geometries sharing the same topology,
+        e.g. snapshots of a molecular-dynamics trajectory. The bonds are taken from the neighbour table
+        of the current structure and are not searched again, matrix elements are computed for
+        batches of frames at once; the bonds stretched beyond the nearest-neighbour distance are switched off,
+        while new bonds are not detected. Only the matrices of the isolated system are computed.
+
+        Parameters
+        ----------
+        frames : numpy.ndarray
+            atomic coordinates for each frame, array of the shape (num_of_frames, num_of_atoms, 3)
+        batch_size : int
+            number of frames processed at once (Default value = 10)
+
+        Returns
+        -------
+        generator
+            yields the Hamiltonian matrix for each frame, or the tuple of the Hamiltonian
+            and overlap matrices if the overlap matrix is computed
+        """
+
+        frames = np.asarray(frames, dtype=float)
+
+        if frames.ndim == 2:
+            frames = frames[np.newaxis]
+
+        if frames.shape[1:] != (self.num_of_nodes, 3):
+            raise ValueError("The shape of the array of frames should be (num_of_frames, {}, 3)".format(self.num_of_nodes))
+
+        shape = (self.basis_size, self.basis_size)
+
+        # on-site matrix elements do not depend on the geometry
+        h_onsite = TripletAssembler(shape, dtype=self.dtype)
+        ov_onsite = TripletAssembler(shape, dtype=self.dtype) if self.compute_overlap else None
+        self._compute_h_matrix_onsite(h_onsite, ov_onsite)
+
+        table = self.get_neighbour_table()
+
+        if self.half_assembly:
+            bonds = np.flatnonzero(table.i < table.j)
+        else:
+            bonds = np.arange(len(table))
+
+        groups = group_bonds(self.species_ids[table.i[bonds]], self.species_ids[table.j[bonds]])
+
+        for start in range(0, len(frames), batch_size):
+
+            batch = frames[start:start + batch_size]
+            num_of_frames = len(batch)
+
+            h_triplets = [TripletAssembler(shape, capacity=len(h_onsite.values), dtype=self.dtype)
+                          for _ in range(num_of_frames)]
+
+            for j in range(num_of_frames):
+                h_triplets[j].add(h_onsite.rows, h_onsite.cols, h_onsite.values)
+
+            if ov_onsite is not None:
+                ov_triplets = [TripletAssembler(shape, capacity=len(ov_onsite.values), dtype=self.dtype)
+                               for _ in range(num_of_frames)]
+
+                for j in range(num_of_frames):
+                    ov_triplets[j].add(ov_onsite.rows, ov_onsite.cols, ov_onsite.values)
+
+            for (id1, id2), group in groups.items():
+                atoms1, atoms2 = table.i[bonds[group]], table.j[bonds[group]]
+                kind1, kind2 = self._kinds[id1], self._kinds[id2]
+                rows, cols = block_indices(self._offsets[atoms1], self._offsets[atoms2],
+                                           kind1.num_of_orbitals, kind2.num_of_orbitals)
+
+                # matrix elements for all frames of the batch are computed in one call
+                vectors = (batch[:, atoms1, :] - batch[:, atoms2, :]).reshape(-1, 3)
+                block_shape = (num_of_frames, len(atoms1), kind1.num_of_orbitals, kind2.num_of_orbitals)
+
+                if ov_onsite is not None:
+                    h_blocks, ov_blocks = self._get_me_block(kind1, kind2, vectors, with_overlap=True)
+                    ov_blocks = ov_blocks.reshape(block_shape)
+                else:
+                    h_blocks = self._get_me_block(kind1, kind2, vectors)
+                    ov_blocks = None
+
+                # bonds stretched beyond the radius of the neighbourhood
+                norm = np.linalg.norm(vectors, axis=1).reshape(num_of_frames, -1, 1, 1)
+                inside = (norm > 0.1 * self._nn_distance) & (norm < self._nn_distance)
+
+                h_blocks = h_blocks.reshape(block_shape) * inside
+
+                if ov_blocks is not None:
+                    ov_blocks = ov_blocks * inside
+
+                for j in range(num_of_frames):
+                    h_triplets[j].add(rows, cols, h_blocks[j])
+                    if self.half_assembly:
+                        h_triplets[j].add(cols, rows, np.conj(h_blocks[j]))
+
+                    if ov_blocks is not None:
+                        ov_triplets[j].add(rows, cols, ov_blocks[j])
+                        if self.half_assembly:
+                            ov_triplets[j].add(cols, rows, np.conj(ov_blocks[j]))
+
+            for j in range(num_of_frames):
+                if ov_onsite is not None:
+                    yield self._build_matrix(h_triplets[j]), self._build_matrix(ov_triplets[j])
+                else:
+                    yield self._build_matrix(h_triplets[j])
+
+    def _bonds_of(self, atoms):
+        """Returns indices of all bonds in the neighbour table involving any of given atoms.
+
+        Parameters
+        ----------
+        atoms : numpy.ndarray
+            indices of atoms
+
+        Returns
+        -------
+        numpy.ndarray
+            indices of bonds
+        """
+
+        table = self.get_neighbour_table()
+
+        return np.flatnonzero(np.isin(table.i, atoms) | np.isin(table.j, atoms))
+
+    def _bond_indices(self, bonds):
+        """Computes matrix indices of the blocks of matrix elements for bonds from the neighbour table.
 
-        # parent class StructDesignerXYZ stores atom list initialized from xyz-file
-        super(BasisTB, self).__init__(**kwargs)
+        Parameters
+        ----------
+        bonds : numpy.ndarray
+            indices of bonds
 
-        # each entry of the dictionary stores a label of the atom species as a key and
-        # corresponding Atom object as a value. Each atom object contains infomation about number,
-        # energy and symmetry of the orbitals
-        self._orbitals_dict = Orbitals.atoms_factory(list(self.num_of_species.keys()))
+        Returns
+        -------
+        tuple
+            flat arrays of row and column indices
+        """
 
-        # `quantum_number_lims` counts number of species and corresponding number
-        # of orbitals for each; each atom kind is enumerated
-        self.quantum_numbers_lims = []
-        for item in list(self.num_of_species.keys()):
-            self.quantum_numbers_lims.append(OrderedDict([('atoms', self.num_of_species[item]),
-                                                          ('l', self.orbitals_dict[item].num_of_orbitals)]))
+        table = self.get_neighbour_table()
+        rows = [np.array([], dtype=int)]
+        cols = [np.array([], dtype=int)]
 
-        # count total number of basis functions
-        self.basis_size = 0
-        for item in self.quantum_numbers_lims:
-            self.basis_size += reduce(mul, list(item.values()))
+        for (id1, id2), group in group_bonds(self.species_ids[table.i[bonds]],
+                                             self.species_ids[table.j[bonds]]).items():
+            group = bonds[group]
+            rows1, cols1 = block_indices(self._offsets[table.i[group]], self._offsets[table.j[group]],
+                                         self._kinds[id1].num_of_orbitals, self._kinds[id2].num_of_orbitals)
+            rows.append(rows1.ravel())
+            cols.append(cols1.ravel())
 
-        # compute offset index for each atom
-        self._offsets = [0]
-        for j in range(len(self.atom_list) - 1):
-            self._offsets.append(self.orbitals_dict[list(self.atom_list.keys())[j]].num_of_orbitals)
-        self._offsets = np.cumsum(self._offsets)
+        return np.concatenate(rows), np.concatenate(cols)
 
-        # make a log
-        logging.info("Basis set \n Num of species {} \n".format(self.num_of_species))
-        for key, label in self._orbitals_dict.items():
-            logging.info("\n {} {} ".format(key, label.generate_info()))
-        logging.info("---------------------------------\n")
+    @staticmethod
+    def _matrix_elements(matrix, rows, cols):
+        """Returns matrix elements of a dense or sparse matrix as a flat array."""
 
-    def qn2ind(self, qn):
-        """Computes a matrix index of an matrix element from the index of atom and the index of atomic orbital.
+        if len(rows) == 0:
+            return np.array([], dtype=matrix.dtype)
+
+        return np.asarray(matrix[rows, cols]).ravel()
+
+    @staticmethod
+    def _patch_matrix(matrix, triplets):
+        """Adds matrix elements stored as triplets to a dense (in place) or sparse matrix.
 
         Parameters
         ----------
-        qn : dict
-            A dictionary with two keys `atoms` and `l`, where the fist one is the atom index and
-            the later is the orbital index.
+        matrix : numpy.ndarray or scipy.sparse.spmatrix
+            matrix
+        triplets : TripletAssembler
+            matrix elements to add
 
         Returns
         -------
-        type int
-            Index of the TB matrix
+        numpy.ndarray or scipy.sparse.spmatrix
+            patched matrix
         """
 
-        qn = OrderedDict(qn)
-
-        if list(qn.keys()) == list(self.quantum_numbers_lims[0].keys()):  # check if the input is
-            # a proper set of quantum numbers
-            return self._offsets[qn['atoms']] + qn['l']
+        if scipy.sparse.issparse(matrix):
+            matrix = (matrix + triplets.tocsr()).tocsr()
+            matrix.eliminate_zeros()
         else:
-            raise IndexError("Wrong set of quantum numbers")
+            np.add.at(matrix, (triplets.rows, triplets.cols), triplets.values)
 
-    def ind2qn(self, ind):
-        """
+        return matrix
+
+    def _changed_subblocks(self, indices, subblocks=None):
+        """Finds block-tridiagonal subblocks containing given matrix indices.
 
         Parameters
         ----------
-        ind :
-            
+        indices : numpy.ndarray
+            matrix indices
+        subblocks : list
+            sizes of subblocks; if None, the last computed partition is used (Default value = None)
 
         Returns
         -------
-
+        numpy.ndarray
+            indices of subblocks
         """
-        pass  # TODO
 
-    @property
-    def orbitals_dict(self):
-        """Returns the dictionary data structure of orbitals. In the dictionary"""
+        if subblocks is None:
+            subblocks = self._subblocks
 
-        class MyDict(dict):
-            """ """
-            def __getitem__(self, key):
-                key = ''.join([i for i in key if not i.isdigit()])
-                return super(MyDict, self).__getitem__(key)
+        if subblocks is None:
+            subblocks = [self.basis_size]
 
-        return MyDict(self._orbitals_dict)
+        edges = np.cumsum(subblocks)
 
+        # new bonds may violate the block-tridiagonal structure
+        table = self.get_neighbour_table()
+        blocks = np.searchsorted(edges, self._offsets, side='right')
 
-class Hamiltonian(BasisTB):
-    """Class defines a Hamiltonian matrix as well as a set of member-functions
-    allowing to build, diagonalize and visualize the matrix.
+        if np.any(np.abs(blocks[table.i] - blocks[table.j]) > 1):
+            logging.warning("The matrix is not block-tridiagonal for the given partition into subblocks")
 
-    Examples
-    --------
-    >>> from nanonet.verbosity import set_verbosity
-    >>> import nanonet.tb as tb
-    >>> set_verbosity(0)
-    >>> tb.Orbitals('A').add_orbital(title='s', energy=-1)
-    >>> tb.Orbitals('B').add_orbital(title='s', energy=-2)
-    >>> xyz_file = '''2
-    ... Two atoms
-    ... A1 0 0 0
-    ... B1 0 0 1.5'''
-    >>> tb.set_tb_params(PARAMS_A_B={'ss_sigma': 0.1})
-    >>> h = tb.Hamiltonian(xyz=xyz_file, nn_distance=2.0).initialize()
-    >>> h.h_matrix
-    array([[-1. +0.j,  0.1+0.j],
-           [ 0.1+0.j, -2. +0.j]])
-    """
+        return np.unique(np.searchsorted(edges, indices, side='right'))
 
-    def __init__(self, **kwargs):
-        """
+    @staticmethod
+    def _eigh(h_matrix, ov_matrix=None, eigvals_only=False, subset_by_index=None, subset_by_value=None):
+        """Solves the standard or generalized eigenvalue problem for a Hermitian matrix.
+        If a subset of eigenvalues is requested, only the eigenpairs in this subset are computed
+        by the LAPACK drivers 'evr' (MRRR) or 'gvx' for the standard and generalized problems respectively.
 
         Parameters
         ----------
-        nn_distance : float, list
-            Nearest neighbour distance of distances
-            if the tight-binding method is beyond the first-nearest neighbour approximation (Default value = 2.39)
-        radial_dep : func
-             Radial dependence function (Default value = None)
+        h_matrix : numpy.ndarray
+            Hamiltonian matrix
+        ov_matrix : numpy.ndarray
+            overlap matrix or None for the standard eigenvalue problem (Default value = None)
+        eigvals_only : bool
+            if True, eigenvectors are not computed (Default value = False)
+        subset_by_index : tuple
+            indices (lo, hi) of the first and last eigenvalues in ascending order, both inclusive (Default value = None)
+        subset_by_value : tuple
+            half-open interval (lo, hi] of eigenvalues (Default value = None)
+
+        Returns
+        -------
+        vals : numpy.ndarray
+            eigenvalues in ascending order
+        vects : numpy.ndarray
+            eigenvectors or None if `eigvals_only` is True
         """
 
-        nn_distance = kwargs.get('nn_distance', 2.39)
-        self.int_radial_dependence = None
-        nn_distance = self._set_nn_distances(nn_distance)
-        self.compute_overlap = kwargs.get('comp_overlap', False)
-        self.compute_angular = kwargs.get('comp_angular_dep', True)
+        if subset_by_index is None and subset_by_value is None:
+            if ov_matrix is not None:
+                ans = scipy.linalg.eigh(h_matrix, ov_matrix, eigvals_only=eigvals_only)
+            elif eigvals_only:
+                ans = np.linalg.eigvalsh(h_matrix)
+            else:
+                ans = np.linalg.eigh(h_matrix)
+        else:
+            ans = scipy.linalg.eigh(h_matrix, ov_matrix, eigvals_only=eigvals_only,
+                                    subset_by_index=subset_by_index, subset_by_value=subset_by_value,
+                                    driver='evr' if ov_matrix is None else 'gvx')
 
-        logging.info('The verbosity level is {}'.format(verbosity.VERBOSITY))
-        logging.info('The radius of the neighbourhood is {} Ang'.format(nn_distance))
-        logging.info("\n---------------------------------\n")
+        vals, vects = (ans, None) if eigvals_only else ans
+        vals = np.real(vals)
+        ind = np.argsort(vals)
 
-        kwargs['nn_distance'] = nn_distance
+        if vects is None:
+            return vals[ind], None
 
-        if not isinstance(kwargs['xyz'], str):
-            kwargs['xyz'] = dict2xyz(kwargs['xyz'])
+        return vals[ind], vects[:, ind]
 
-        super(Hamiltonian, self).__init__(**kwargs)
+    def diagonalize(self, eigvals_only=False, subset_by_index=None, subset_by_value=None):
+        """Diagonalize the Hamiltonian matrix for the finite isolated system
+        (without periodic boundary conditions)
 
-        self._coords = None  # coordinates of sites
-        self.h_matrix = None  # Hamiltonian for an isolated system
-        self.ov_matrix = None  # overlap matrix for an isolated system
-        self.h_matrix_bc_factor = None  # exponential Bloch factors for pbc
-        self.h_matrix_bc_add = None  # additive Bloch exponentials for pbc
-        self.ov_matrix_bc_add = None  # additive Bloch exponentials for pbc
-        # (interaction with virtual neighbours
-        # in adacent primitive cells due to pbc)
+        Parameters
+        ----------
+        eigvals_only : bool
+            if True, eigenvectors are not computed (Default value = False)
+        subset_by_index : tuple
+            indices (lo, hi) of the first and last eigenvalues in ascending order, both inclusive;
+            only these eigenvalues are computed (Default value = None)
+        subset_by_value : tuple
+            energy window (lo, hi], only the eigenvalues within this window are computed (Default value = None)
 
-        self.h_matrix_left_lead = None
-        self.h_matrix_right_lead = None
-        self.k_vector = 0  # default value of the wave vector
-        self.ct = None
-        self.radial_dependence = None
-        self.so_coupling = kwargs.get('so_coupling', 0.0)
+        Returns
+        -------
+        vals : numpy.ndarray
+            Eigenvalues
+        vects : numpy.ndarray
+            Eigenvectors or None if `eigvals_only` is True
+        """
 
-        radial_dep = kwargs.get('radial_dep', None)
+        return self._eigh(self.h_matrix, self.ov_matrix, eigvals_only=eigvals_only,
+                          subset_by_index=subset_by_index, subset_by_value=subset_by_value)
 
-        if radial_dep is None:
-            logging.info('Radial dependence function: None')
-            logging.info("\n---------------------------------\n")
-        else:
-            logging.info('Radial dependence function:\n\n{}'.format(inspect.getsource(radial_dep)))
-            logging.info("\n---------------------------------\n")
+    def diagonalize_periodic_bc(self, k_vector, eigvals_only=False, subset_by_index=None, subset_by_value=None):
+        """Diagonalize the Hamiltonian matrix with the periodic boundary conditions
+        for a certain value of the wave vector k_vector
 
-        self.radial_dependence = radial_dep
+        Parameters
+        ----------
+        k_vector : numpy.ndarray
+            wave vector
+        eigvals_only : bool
+            if True, eigenvectors are not computed (Default value = False)
+        subset_by_index : tuple
+            indices (lo, hi) of the first and last eigenvalues in ascending order, both inclusive;
+            only these eigenvalues are computed (Default value = None)
+        subset_by_value : tuple
+            energy window (lo, hi], only the eigenvalues within this window are computed (Default value = None)
 
-    def initialize(self):
-        """Compute matrix elements of the Hamiltonian.
+        Returns
+        -------
+        vals : numpy.ndarray
+            Eigenvalues
+        vects : numpy.ndarray
+            Eigenvectors or None if `eigvals_only` is True
+        """
+
+        h_matrix, ov_matrix = self.get_bloch_matrices(k_vector)
+
+        return self._eigh(h_matrix, ov_matrix, eigvals_only=eigvals_only,
+                          subset_by_index=subset_by_index, subset_by_value=subset_by_value)
+
+    def diagonalize_periodic_bc_batch(self, k_points, workers=1, eigvals_only=False,
+                                      subset_by_index=None, subset_by_value=None):
+        """Diagonalizes the Hamiltonian matrix with the periodic boundary conditions for a set of wave vectors.
+
+        If `workers` is larger than one, the wave vectors are distributed over a pool of local processes.
+        The lattice blocks of the Hamiltonian are computed before starting the pool,
+        so that each worker is initialized once with the complete Hamiltonian. On platforms without
+        the 'fork' start method, the Hamiltonian is pickled and has to be picklable.
+
+        Small dense Hamiltonians without the overlap matrix are diagonalized serially as one stack of matrices
+        of the shape (num_of_k_points, basis_size, basis_size), see STACKED_EIGH_MAX_SIZE.
+
+        Parameters
+        ----------
+        k_points : list or numpy.ndarray
+            wave vectors, array of the shape (num_of_k_points, 3)
+        workers : int
+            number of worker processes (Default value = 1)
+        eigvals_only : bool
+            if True, eigenvectors are not computed (Default value = False)
+        subset_by_index : tuple
+            indices (lo, hi) of the first and last eigenvalues in ascending order, both inclusive;
+            only these eigenvalues are computed (Default value = None)
+        subset_by_value : tuple
+            energy window (lo, hi], only the eigenvalues within this window are computed (Default value = None)
 
         Returns
         -------
-        type Hamiltonian
-            Returns the instance of the class Hamiltonian
+        vals : numpy.ndarray or list
+            eigenvalues for each wave vector in the order of `k_points`, array of the shape
+            (num_of_k_points, num_of_eigenvalues); if `subset_by_value` is given, a list of arrays,
+            since the number of eigenvalues within the window may depend on the wave vector
+        vects : numpy.ndarray or list
+            eigenvectors for each wave vector in the order of `k_points`, array of the shape
+            (num_of_k_points, basis_size, num_of_eigenvalues) or a list of arrays if `subset_by_value` is given;
+            None if `eigvals_only` is True
         """
 
-        self._coords = [0 for _ in range(self.basis_size)]
-        # initialize Hamiltonian matrices
-        self.h_matrix = np.zeros((self.basis_size, self.basis_size), dtype=complex)
-        self.h_matrix_bc_add = np.zeros((self.basis_size, self.basis_size), dtype=complex)
-        self.h_matrix_bc_factor = np.ones((self.basis_size, self.basis_size), dtype=complex)
+        k_points = [list(item) for item in np.asarray(k_points, dtype=float).reshape(-1, 3)]
+        options = dict(eigvals_only=eigvals_only, subset_by_index=subset_by_index, subset_by_value=subset_by_value)
 
-        if self.compute_overlap:
-            self.ov_matrix = np.zeros((self.basis_size, self.basis_size), dtype=complex)
-            self.ov_matrix_bc_add = np.zeros((self.basis_size, self.basis_size), dtype=complex)
+        # precompute lattice blocks shared by all wave vectors
+        self._get_lattice_sums()
 
-        # loop over all nodes
-        for j1 in range(self.num_of_nodes):
+        if workers > 1 and len(k_points) > 1:
+            if 'fork' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('fork')
+            else:
+                context = None
 
-            # find neighbours for each node
-            list_of_neighbours = self.get_neighbours(j1)
+            chunksize = max(1, len(k_points) // (4 * workers))
 
-            for j2 in list_of_neighbours:
-                # on site interactions
-                if j1 == j2:
-                    for l1 in range(self.orbitals_dict[list(self.atom_list.keys())[j1]].num_of_orbitals):
-                        ind1 = self.qn2ind([('atoms', j1), ('l', l1)], )
-                        self.h_matrix[ind1, ind1] = self._get_me(j1, j2, l1, l1)
-                        if self.compute_overlap:
-                            self.ov_matrix[ind1, ind1] = self._get_me(j1, j2, l1, l1, overlap=True)
-                        self._coords[ind1] = list(self.atom_list.values())[j1]
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                     initializer=_init_worker, initargs=(self,)) as executor:
+                results = list(executor.map(partial(_diagonalize_in_worker, **options),
+                                            k_points, chunksize=chunksize))
 
-                        if self.so_coupling != 0:
-                            for l2 in range(self.orbitals_dict[list(self.atom_list.keys())[j1]].num_of_orbitals):
-                                ind2 = self.qn2ind([('atoms', j1), ('l', l2)], )
-                                self.h_matrix[ind1, ind2] = self._get_me(j1, j2, l1, l2)
+        elif isinstance(self.h_matrix, np.ndarray) and not self.compute_overlap and \
+                self.basis_size <= STACKED_EIGH_MAX_SIZE and subset_by_index is None and subset_by_value is None:
+            return self._diagonalize_stacked(k_points, eigvals_only=eigvals_only)
+        else:
+            results = [self.diagonalize_periodic_bc(k_vector, **options) for k_vector in k_points]
 
-                # nearest neighbours interaction
-                else:
-                    for l1 in range(self.orbitals_dict[list(self.atom_list.keys())[j1]].num_of_orbitals):
-                        for l2 in range(self.orbitals_dict[list(self.atom_list.keys())[j2]].num_of_orbitals):
-                            ind1 = self.qn2ind([('atoms', j1), ('l', l1)], )
-                            ind2 = self.qn2ind([('atoms', j2), ('l', l2)], )
+        vals = [item[0] for item in results]
+        vects = None if eigvals_only else [item[1] for item in results]
 
-                            self.h_matrix[ind1, ind2] = self._get_me(j1, j2, l1, l2)
-                            if self.compute_overlap:
-                                self.ov_matrix[ind1, ind2] = self._get_me(j1, j2, l1, l2, overlap=True)
+        # the number of eigenvalues within the energy window may depend on the wave vector
+        if subset_by_value is not None:
+            return vals, vects
 
-        logging.info("Unique distances: \n    {}".format("\n    ".join(unique_distances)))
-        logging.info("---------------------------------\n")
+        return np.array(vals), None if eigvals_only else np.array(vects)
 
-        return self
+    def diagonalize_k_path(self, k_points, workers=1, track_bands=True):
+        """Diagonalizes the Hamiltonian matrix with the periodic boundary conditions
+        for a sequence of closely spaced wave vectors, e.g. a path in the Brillouin zone,
+        and orders the states by bands.
 
-    def set_periodic_bc(self, primitive_cell):
-        """Set periodic boundary conditions.
-        The function sets the periodic boundary conditions by creating an object of the class CyclicTopology.
+        The Hamiltonian is diagonalized by diagonalize_periodic_bc_batch(). After that, the eigenvectors
+        for adjacent wave vectors are matched by their overlaps, see match_bands(), so that each column of
+        the output follows a band through the band crossings rather than the energy order.
+        In the atomic gauge used by get_bloch_matrices(), the eigenvectors change continuously along the path,
+        so the overlaps are well defined if the wave vectors are dense enough.
+        HamiltonianSp can also start the eigensolver for each wave vector from the eigenvectors
+        of the previous one, see HamiltonianSp.diagonalize_k_path().
 
         Parameters
         ----------
-        primitive_cell : list
-            list of vectors defining a primitive cell
-        """
-        if list(primitive_cell):
-            self.ct = CyclicTopology(primitive_cell,
-                                     list(self.atom_list.keys()),
-                                     list(self.atom_list.values()),
-                                     self._nn_distance)
-        else:
-            self.ct = None
-
-    def diagonalize(self):
-        """Diagonalize the Hamiltonian matrix for the finite isolated system
-        (without periodic boundary conditions)
+        k_points : list or numpy.ndarray
+            wave vectors along the path, array of the shape (num_of_k_points, 3)
+        workers : int
+            number of worker processes, see diagonalize_periodic_bc_batch() (Default value = 1)
+        track_bands : bool
+            if False, the states are ordered by energies (Default value = True)
 
         Returns
         -------
         vals : numpy.ndarray
-            Eigenvalues
+            eigenvalues, array of the shape (num_of_k_points, num_of_states)
         vects : numpy.ndarray
-            Eigenvectors
+            eigenvectors, array of the shape (num_of_k_points, basis_size, num_of_states)
         """
 
-        vals, vects = scipy.linalg.eigh(self.h_matrix, self.ov_matrix)
-        vals = np.real(vals)
-        ind = np.argsort(vals)
+        vals, vects = self.diagonalize_periodic_bc_batch(k_points, workers=workers)
 
-        return vals[ind], vects[:, ind]
+        if track_bands:
+            for j in range(1, len(vals)):
+                ind = match_bands(vects[j - 1], vects[j])
+                vals[j] = vals[j][ind]
+                vects[j] = vects[j][:, ind]
 
-    def diagonalize_periodic_bc(self, k_vector):
-        """Diagonalize the Hamiltonian matrix with the periodic boundary conditions
-        for a certain value of the wave vector k_vector
+        return vals, vects
+
+    def _diagonalize_stacked(self, k_points, eigvals_only=False):
+        """Forms the Hamiltonian matrices for all wave vectors at once
+        and diagonalizes them as a stack of matrices.
 
         Parameters
         ----------
-        k_vector : numpy.ndarray
-            wave vector
+        k_points : list
+            wave vectors
+        eigvals_only : bool
+            if True, eigenvectors are not computed (Default value = False)
 
         Returns
         -------
         vals : numpy.ndarray
-            Eigenvalues
+            eigenvalues for each wave vector
         vects : numpy.ndarray
-            Eigenvectors
+            eigenvectors for each wave vector, None if `eigvals_only` is True
         """
 
-        k_vector = list(k_vector)
+        vectors, rows, cols, h_table, _ = self._get_lattice_sums()
+        k_points = np.array(k_points, dtype=float).reshape(-1, 3)
 
-        # reset previous wave vector if any
-        if k_vector != self.k_vector:
-            self._reset_periodic_bc()
-            self.k_vector = k_vector
-            self._compute_h_matrix_bc_factor()
-            self._compute_h_matrix_bc_add(overlap=self.compute_overlap)
+        lattice_phases = np.exp(-1j * np.dot(k_points, vectors.T))
+        phases = np.repeat(np.exp(1j * np.dot(k_points, self.atom_coords.T)), self._num_of_orbitals, axis=1)
 
-        if self.compute_overlap:
-            vals, vects = scipy.linalg.eigh(self.h_matrix_bc_factor * self.h_matrix + self.h_matrix_bc_add,
-                                            self.h_matrix_bc_factor * self.ov_matrix + self.ov_matrix_bc_add)
-        else:
-            vals, vects = np.linalg.eigh(self.h_matrix_bc_factor * self.h_matrix + self.h_matrix_bc_add)
+        h_matrices = np.empty((len(k_points), self.basis_size, self.basis_size), dtype=complex_dtype(self.dtype))
+        h_matrices[:] = self.h_matrix
+        h_matrices[:, rows, cols] += np.dot(lattice_phases, h_table.T)
+        h_matrices *= phases[:, :, np.newaxis]
+        h_matrices *= np.conj(phases)[:, np.newaxis, :]
 
-        vals = np.real(vals)
-        ind = np.argsort(vals)
+        if eigvals_only:
+            return np.linalg.eigvalsh(h_matrices), None
 
-        return vals[ind], vects[:, ind]
+        vals, vects = np.linalg.eigh(h_matrices)
+
+        return vals, vects
 
     def _set_nn_distances(self, nn_dist):
         if nn_dist is not None:
@@ -354,16 +1911,20 @@ class Hamiltonian(BasisTB):
                 nn_dist.sort()
                 self._nn_distance = nn_dist[-1]
 
-                def int_radial_dep(coords):
+                nn_dist_array = np.array(nn_dist, dtype=float)
+
+                def int_radial_dep(distances):
                     """
-                        Step-wise radial dependence function
+                        Step-wise radial dependence function, accepts a distance or an array of distances
                     """
-                    norm_of_coords = np.linalg.norm(coords)
+                    distances = np.asarray(distances, dtype=float)
 
-                    ans = sum([norm_of_coords > item for item in nn_dist]) + 1
+                    # number of the nearest-neighbour distances smaller than a distance
+                    ans = np.searchsorted(nn_dist_array, distances, side='left') + 1
+                    ans = np.where(distances > nn_dist_array[-1], 100, ans)
 
-                    if norm_of_coords > nn_dist[-1]:
-                        return 100
+                    if ans.ndim == 0:
+                        return int(ans)
                     else:
                         return ans
 
@@ -376,20 +1937,58 @@ class Hamiltonian(BasisTB):
 
         return self._nn_distance
 
-    def _ind2atom(self, ind):
+    def get_neighbour_table(self):
+        """Returns the table of all bonds in the structure
+        supplemented by the orders of the nearest neighbours.
+
+        Returns
+        -------
+        NeighbourTable
+            table of bonds
         """
 
+        table = super(Hamiltonian, self).get_neighbour_table()
+
+        if table.order is None:
+            table.order = self._which_neighbour(table.distances)
+
+        return table
+
+    def _which_neighbour(self, distances):
+        """Computes orders of the nearest neighbours from the distances between atoms.
+
         Parameters
         ----------
-        ind :
-            
+        distances : numpy.ndarray
+            array of distances
 
         Returns
         -------
+        numpy.ndarray
+            orders of the nearest neighbours, zeros if the
+            tight-binding model does not distinguish them
+        """
+
+        if self.int_radial_dependence is None:
+            return np.zeros(len(distances), dtype=int)
+        else:
+            return np.asarray(self.int_radial_dependence(np.asarray(distances, dtype=float)), dtype=int)
+
+    def _ind2atom(self, ind):
+        """Returns the basis set (Orbitals object) of an atom.
+
+        Parameters
+        ----------
+        ind : int
+            Atom index
 
+        Returns
+        -------
+        type Orbitals
+            Basis set of the atom
         """
 
-        return self.orbitals_dict[list(self.atom_list.keys())[ind]]
+        return self._kinds[self.species_ids[ind]]
 
     def _get_me(self, atom1, atom2, l1, l2, coords=None, overlap=False):
         """Compute the matrix element <atom1, l1|H|l2, atom2>.
@@ -437,8 +2036,7 @@ class Hamiltonian(BasisTB):
 
             # compute radius vector pointing from one atom to another
             if coords is None:
-                coords1 = np.array(list(self.atom_list.values())[atom1], dtype=float) - \
-                          np.array(list(self.atom_list.values())[atom2], dtype=float)
+                coords1 = self.atom_coords[atom1] - self.atom_coords[atom2]
             else:
                 coords1 = coords.copy()
 
@@ -471,179 +2069,171 @@ class Hamiltonian(BasisTB):
             return me(atom_kind1, l1, atom_kind2, l2, coords1, which_neighbour,
                       overlap=overlap) * factor
 
-    def _comp_so(self, atom, ind1, ind2):
-        """
+    def _get_me_block(self, atom_kind1, atom_kind2, coords, overlap=False, with_overlap=False):
+        """Compute blocks of matrix elements <atom1, l1|H|l2, atom2> for all pairs of orbitals
+        and for a batch of bonds connecting atoms of the kinds atom_kind1 and atom_kind2.
+        This is the vectorized counterpart of the member function _get_me() invoking the function
+        me_block() from the module diatomic_matrix_element.
 
         Parameters
         ----------
-        atom : Atom
-            
-        ind1 :
-            
-        ind2 :
-            
+        atom_kind1 : Orbitals
+            Basis set of the first atom
+        atom_kind2 : Orbitals
+            Basis set of the second atom
+        coords : numpy.ndarray
+            Radius vectors r1 - r2 for each bond, array of the shape (num_of_bonds, 3)
+        overlap : bool
+            A flag indicating that the overlap matrix elements have to be computed
+        with_overlap : bool
+            If True, the blocks of the Hamiltonian and overlap matrices are computed
+            together from one evaluation of the bond geometry (Default value = False)
 
         Returns
         -------
-        type float
-            Spin-orbit coupling energy
+        numpy.ndarray or tuple
+            Array of the shape (num_of_bonds, atom_kind1.num_of_orbitals, atom_kind2.num_of_orbitals);
+            if `with_overlap` is True, the tuple of such arrays for the Hamiltonian and overlap matrices
         """
 
-        type1 = atom.orbitals[ind1]['title']
-        type2 = atom.orbitals[ind2]['title']
+        coords = np.asarray(coords, dtype=float)
+        norm = np.linalg.norm(coords, axis=1)
 
-        # quantum numbers
-        l1 = atom.orbitals[ind1]['l']
-        s1 = atom.orbitals[ind1]['s']
-        l2 = atom.orbitals[ind2]['l']
-        s2 = atom.orbitals[ind2]['s']
+        if verbosity.VERBOSITY > 0:
+            for item in np.unique(np.round(norm, 4)):
+                unique_distances.add(np.array2string(item, precision=4) + " Ang between atoms " +
+                                     atom_kind1.title + " and " + atom_kind2.title)
 
-        if l1 == 1 and l2 == 1:
+        which_neighbour = self._which_neighbour(norm)
 
-            if type1 == 'px' and type2 == 'py' and s1 == 0 and s2 == 0:
-                return -1j * self.so_coupling / 3
-
-            elif type1 == 'px' and type2 == 'pz' and s1 == 0 and s2 == 1:
-                return self.so_coupling / 3
-
-            elif type1 == 'py' and type2 == 'pz' and s1 == 0 and s2 == 1:
-                return -1j * self.so_coupling / 3
-
-            elif type1 == 'pz' and type2 == 'px' and s1 == 0 and s2 == 1:
-                return -self.so_coupling / 3
-
-            elif type1 == 'pz' and type2 == 'py' and s1 == 0 and s2 == 1:
-                return 1j * self.so_coupling / 3
-
-            elif type1 == 'px' and type2 == 'py' and s1 == 1 and s2 == 1:
-                return 1j * self.so_coupling / 3
-
-            elif type1 == 'py' and type2 == 'px' and s1 == 0 and s2 == 0:
-                return 1j * self.so_coupling / 3
-
-            elif type1 == 'pz' and type2 == 'px' and s1 == 1 and s2 == 0:
-                return self.so_coupling / 3
-
-            elif type1 == 'pz' and type2 == 'py' and s1 == 1 and s2 == 0:
-                return 1j * self.so_coupling / 3
+        if self.radial_dependence is None:
+            factor = np.ones(len(norm))
+        else:
+            factor = np.asarray(self._radial_dependence(norm), dtype=float)
 
-            elif type1 == 'px' and type2 == 'pz' and s1 == 1 and s2 == 0:
-                return -self.so_coupling / 3
+        # compute directional cosines
+        if self.compute_angular:
+            coords = coords / norm[:, np.newaxis]
+        else:
+            coords = np.tile([1.0, 0.0, 0.0], (len(norm), 1))
 
-            elif type1 == 'py' and type2 == 'pz' and s1 == 1 and s2 == 0:
-                return -1j * self.so_coupling / 3
+        factor = factor[:, np.newaxis, np.newaxis]
 
-            elif type1 == 'py' and type2 == 'px' and s1 == 1 and s2 == 1:
-                return -1j * self.so_coupling / 3
-            else:
-                return 0
+        if with_overlap:
+            h_block, ov_block = me_block(atom_kind1, atom_kind2, coords, which_neighbour, with_overlap=True)
+            return h_block * factor, ov_block * factor
         else:
-            return 0
+            return me_block(atom_kind1, atom_kind2, coords, which_neighbour, overlap=overlap) * factor
 
-    def _reset_periodic_bc(self):
-        """Reset the matrices determining periodic boundary conditions to their default state
-        :return:
+    def _comp_so(self, atom, ind1, ind2):
+        """
 
         Parameters
         ----------
+        atom : Atom
+            
+        ind1 :
+            
+        ind2 :
+            
 
         Returns
         -------
-
+        type float
+            Spin-orbit coupling energy
         """
 
-        self.h_matrix_bc_add = np.zeros((self.basis_size, self.basis_size), dtype=complex)
-        self.ov_matrix_bc_add = np.zeros((self.basis_size, self.basis_size), dtype=complex)
-        self.h_matrix_bc_factor = np.ones((self.basis_size, self.basis_size), dtype=complex)
-        self.k_vector = None
-
-    def _compute_h_matrix_bc_factor(self):
-        """Compute the exponential Bloch factors needed when the periodic boundary conditions are applied."""
+        orbital1 = atom.orbitals[ind1]
+        orbital2 = atom.orbitals[ind2]
 
-        for j1 in range(self.num_of_nodes):
+        if orbital1['l'] == 1 and orbital2['l'] == 1:
+            key = (orbital1['title'], orbital1['s'], orbital2['title'], orbital2['s'])
+            return SO_P_ORBITALS.get(key, 0) * self.so_coupling / 3
+        else:
+            return 0
 
-            list_of_neighbours = self.get_neighbours(j1)
+    def _compute_leads(self):
+        """Computes the matrices coupling the unit cell with the left and right neighbouring cells."""
 
-            for j2 in list_of_neighbours:
-                if j1 != j2:
-                    coords = np.array(list(self.atom_list.values())[j1], dtype=float) - \
-                             np.array(list(self.atom_list.values())[j2], dtype=float)
-                    phase = np.exp(1j * np.dot(self.k_vector, coords))
+        matrices = self._assemble_leads(half=self.half_assembly)
 
-                    for l1 in range(self.orbitals_dict[list(self.atom_list.keys())[j1]].num_of_orbitals):
-                        for l2 in range(self.orbitals_dict[list(self.atom_list.keys())[j2]].num_of_orbitals):
-                            ind1 = self.qn2ind([('atoms', j1), ('l', l1)], )
-                            ind2 = self.qn2ind([('atoms', j2), ('l', l2)], )
+        if self.half_assembly and self.check_half_assembly:
+            self._check_half_assembly(matrices, self._assemble_leads(half=False))
 
-                            self.h_matrix_bc_factor[ind1, ind2] = phase
-                            # self.h_matrix[ind2, ind1] = self.h_matrix[ind1, ind2]
+        self.h_matrix_left_lead, self.h_matrix_right_lead = matrices
 
-    def _compute_h_matrix_bc_add(self, split_the_leads=False, overlap=False):
-        """Compute additive Bloch exponentials needed to specify pbc
+    def _assemble_leads(self, half=False):
+        """Computes matrix elements describing interactions of atoms with the virtual neighbours
+        in the left and right neighbouring primitive cells.
 
         Parameters
         ----------
-        split_the_leads :
-             (Default value = False)
-        overlap :
-             (Default value = False)
+        half : bool
+            If True, only one bond of each pair of mutually conjugated bonds is evaluated,
+            the other one is obtained by mirroring (Default value = False)
+
         Returns
         -------
-
+        tuple
+            matrices for the left and right leads
         """
 
         two_leads = False
 
-        if self.ct is not None:
-            if np.array(self.ct.pcv).shape[0] == 1:
-                two_leads = True
-
-            if split_the_leads:
-                if two_leads:
-                    flag = None
-                else:
-                    flag = 'L'
-
-            # loop through all interfacial atoms
-            for j1 in self.ct.interfacial_atoms_ind:
+        shape = (self.basis_size, self.basis_size)
+        dtype = self._bloch_dtype()
+        left_triplets = TripletAssembler(shape, dtype=dtype)
+        right_triplets = TripletAssembler(shape, dtype=dtype)
 
-                list_of_neighbours = self.ct.get_neighbours(list(self.atom_list.values())[j1])
+        table = self.get_periodic_neighbour_table()
 
-                for j2 in list_of_neighbours:
-
-                    coords = np.array(list(self.atom_list.values())[j1]) - \
-                             np.array(list(self.ct.virtual_and_interfacial_atoms.values())[j2])
-
-                    if split_the_leads and two_leads:
-                        flag = self.ct.atom_classifier(list(self.ct.virtual_and_interfacial_atoms.values())[j2],
-                                                       self.ct.pcv[0])
-
-                    phase = np.exp(1j * np.dot(self.k_vector, coords))
-
-                    ind = int(list(self.ct.virtual_and_interfacial_atoms.keys())[j2].split('_')[2])
+        if table is not None:
+            if table.translations.shape[1] == 1:
+                two_leads = True
 
-                    for l1 in range(self.orbitals_dict[list(self.atom_list.keys())[j1]].num_of_orbitals):
-                        for l2 in range(self.orbitals_dict[list(self.atom_list.keys())[ind]].num_of_orbitals):
+            # bonds between atoms of the unit cell and their periodic images in the neighbouring cells
+            atoms1, atoms2, coords = table.i, table.j, table.vectors
 
-                            ind1 = self.qn2ind([('atoms', j1), ('l', l1)])
-                            ind2 = self.qn2ind([('atoms', ind), ('l', l2)])
+            if two_leads:
+                # the second atom of a bond belongs to the left or right neighbouring cell
+                flags = np.where(table.translations[:, 0] > 0, 'R', 'L').astype(object)
+            else:
+                flags = np.full(len(atoms1), 'L', dtype=object)
+
+            # the bond (j1, j2, r) and the bond (j2, j1, -r) are conjugated to each other,
+            # from each pair only the bond with j1 < j2 or with the first non-zero component of r > 0 is kept;
+            # mirroring is possible only if the list of bonds contains all conjugated pairs
+            if half and not _has_conjugated_bonds(atoms1, atoms2, coords):
+                logging.info("The list of bonds with virtual neighbours is not closed under conjugation, "
+                                "matrix elements are computed for all bonds")
+                half = False
+
+            if half:
+                first = np.argmax(np.abs(coords) > 0, axis=1)
+                keep = (atoms1 < atoms2) | ((atoms1 == atoms2) & (coords[np.arange(len(coords)), first] > 0))
+                atoms1, atoms2, coords, flags = atoms1[keep], atoms2[keep], coords[keep], flags[keep]
+
+            phases = self._bloch_phases(coords)[:, np.newaxis, np.newaxis]
+
+            # the same pair of atoms may be coupled through several images,
+            # therefore the matrix elements are accumulated
+            for bonds, rows, cols, h_blocks, _ in self._bond_blocks(atoms1, atoms2, coords):
+
+                h_blocks = h_blocks * phases[bonds]
+
+                right = flags[bonds] == 'R'
+                left_triplets.add(rows[right], cols[right], h_blocks[right])
+                right_triplets.add(rows[~right], cols[~right], h_blocks[~right])
+
+                # conjugated bonds point to the opposite neighbouring cell
+                if half:
+                    if two_leads:
+                        right_triplets.add(cols[right], rows[right], np.conj(h_blocks[right]))
+                        left_triplets.add(cols[~right], rows[~right], np.conj(h_blocks[~right]))
+                    else:
+                        right_triplets.add(cols, rows, np.conj(h_blocks))
 
-                            if split_the_leads:
-                                if flag == 'R':
-                                    self.h_matrix_left_lead[ind1, ind2] += phase * \
-                                                                           self._get_me(j1, ind, l1, l2, coords=coords)
-                                elif flag == 'L':
-                                    self.h_matrix_right_lead[ind1, ind2] += phase * \
-                                                                            self._get_me(j1, ind, l1, l2, coords=coords)
-                                else:
-                                    raise ValueError("Wrong flag value")
-                            else:
-                                self.h_matrix_bc_add[ind1, ind2] += phase * \
-                                                                    self._get_me(j1, ind, l1, l2, coords)
-                                if overlap:
-                                    self.ov_matrix_bc_add[ind1, ind2] += phase * \
-                                                                         self._get_me(j1, ind, l1, l2,
-                                                                                      coords=coords, overlap=True)
+        return self._build_matrix(left_triplets), self._build_matrix(right_triplets)
 
     def get_hamiltonians(self):
         """Return a list of Hamiltonian matrices. For 1D systems, the list is [Hl, Hc, Hr],
@@ -661,16 +2251,32 @@ class Hamiltonian(BasisTB):
 
         """
 
-        self.k_vector = [0.0, 0.0, 0.0]
+        key = self._cache_key('leads', self._cell_vectors())
+        matrices = self._load_from_cache(key, ['h_matrix_left_lead', 'h_matrix_right_lead'])
+
+        if matrices is None:
+            self.k_vector = [0.0, 0.0, 0.0]
 
-        self.h_matrix_left_lead = np.zeros((self.basis_size, self.basis_size), dtype=complex)
-        self.h_matrix_right_lead = np.zeros((self.basis_size, self.basis_size), dtype=complex)
+            self._compute_leads()
+            self.k_vector = None
 
-        self._compute_h_matrix_bc_add(split_the_leads=True)
-        self.k_vector = None
+            self._save_to_cache(key, {'h_matrix_left_lead': self.h_matrix_left_lead,
+                                      'h_matrix_right_lead': self.h_matrix_right_lead})
+        else:
+            self.h_matrix_left_lead, self.h_matrix_right_lead = matrices
 
         return self.h_matrix_left_lead.T, self.h_matrix, self.h_matrix_right_lead.T
 
+    def _cell_vectors(self):
+        """Returns primitive cell vectors as a list used to identify cache entries."""
+
+        if self._ct is not None:
+            return np.array(self._ct.pcv, dtype=float).tolist()
+        elif self._primitive_cell is not None:
+            return self._primitive_cell.tolist()
+        else:
+            return None
+
     def get_site_coordinates(self):
         """Return coordinates of atoms.
 
@@ -706,18 +2312,32 @@ class Hamiltonian(BasisTB):
 
         hl, h0, hr = self.get_hamiltonians()
 
-        if left == -1 and right == -1:
-            h_r_h = find_nonzero_lines(hr, 'bottom')
-            h_r_v = find_nonzero_lines(hr[-h_r_h:, :], 'left')
-            h_l_h = find_nonzero_lines(hl, 'top')
-            h_l_v = find_nonzero_lines(hl[:h_l_h, :], 'right')
-            left = max(h_l_h, h_r_v)
-            right = max(h_r_h, h_l_v)
+        key = self._cache_key('subblocks', self._cell_vectors(), left, right, optimized)
+        matrices = self._load_from_cache(key, ['subblocks', 'edges'])
 
-        if optimized:
-            subblocks = split_into_subblocks_optimized(h0, left=left, right=right)
+        if matrices is None:
+            if left == -1 and right == -1:
+                h_r_h = find_nonzero_lines(hr, 'bottom')
+                h_r_v = find_nonzero_lines(hr[-h_r_h:, :], 'left')
+                h_l_h = find_nonzero_lines(hl, 'top')
+                h_l_v = find_nonzero_lines(hl[:h_l_h, :], 'right')
+                left = max(h_l_h, h_r_v)
+                right = max(h_r_h, h_l_v)
+
+            if optimized:
+                subblocks = split_into_subblocks_optimized(h0, left=left, right=right)
+            else:
+                subblocks = split_into_subblocks(h0, left, right)
+
+            # None values of the edges are stored as -1
+            self._save_to_cache(key, {'subblocks': np.array(subblocks, dtype=int),
+                                      'edges': np.array([-1 if item is None else item for item in (left, right)],
+                                                        dtype=int)})
         else:
-            subblocks = split_into_subblocks(h0, left, right)
+            subblocks = [int(item) for item in matrices[0]]
+            left, right = [None if item == -1 else int(item) for item in matrices[1]]
+
+        self._subblocks = subblocks
 
         h01, hl1, hr1 = cut_in_blocks(h0, subblocks)
 
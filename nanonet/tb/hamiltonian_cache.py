@@ -0,0 +1,181 @@
+"""
+The module contains a content-addressed on-disk cache of Hamiltonian matrices.
+"""
+from __future__ import print_function, division
+from __future__ import absolute_import
+import os
+import json
+import hashlib
+import inspect
+import logging
+import numpy as np
+import scipy.sparse
+from nanonet.tb import tb_params
+
+
+class HamiltonianCache(object):
+    """Stores assembled matrices on disk in the directory `cache_dir`.
+    Each entry is a sub-directory named by a hash key; each array is stored in a separate npy-file,
+    so that it can be loaded as a memory-mapped array. Sparse matrices are stored in the CSR format.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Path to the cache directory
+    mmap_mode : str
+        Memory-mapping mode used to load arrays, see numpy.load; the default copy-on-write mode
+        allows modifying loaded matrices in memory without changing the cache (Default value = 'c')
+
+    Examples
+    --------
+    >>> import tempfile
+    >>> cache = HamiltonianCache(tempfile.mkdtemp())
+    >>> key = HamiltonianCache.make_key('structure', [1.0, 2.0])
+    >>> cache.load(key, 'h_matrix') is None
+    True
+    >>> cache.save(key, 'h_matrix', np.eye(2))
+    >>> print(cache.load(key, 'h_matrix'))
+    [[1. 0.]
+     [0. 1.]]
+    """
+
+    def __init__(self, cache_dir, mmap_mode='c'):
+
+        self.cache_dir = cache_dir
+        self.mmap_mode = mmap_mode
+
+    @staticmethod
+    def make_key(*items):
+        """Computes a hash key from a sequence of JSON-serializable objects and numpy arrays.
+
+        Parameters
+        ----------
+        *items :
+            objects determining the content of an entry
+
+        Returns
+        -------
+        str
+            hash key
+        """
+
+        sha = hashlib.sha1()
+
+        for item in items:
+            if isinstance(item, np.ndarray):
+                sha.update(str(item.dtype).encode())
+                sha.update(str(item.shape).encode())
+                sha.update(np.ascontiguousarray(item).tobytes())
+            else:
+                sha.update(json.dumps(item, sort_keys=True, default=str).encode())
+
+        return sha.hexdigest()
+
+    def _path(self, key, name):
+
+        return os.path.join(self.cache_dir, key, name)
+
+    def save(self, key, name, matrix):
+        """Stores a dense or sparse matrix in the cache.
+
+        Parameters
+        ----------
+        key : str
+            hash key of the entry
+        name : str
+            name of the matrix
+        matrix : numpy.ndarray or scipy.sparse.spmatrix
+            matrix to store
+        """
+
+        path = self._path(key, name)
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        if scipy.sparse.issparse(matrix):
+            matrix = scipy.sparse.csr_matrix(matrix)
+            arrays = {'data': matrix.data, 'indices': matrix.indices, 'indptr': matrix.indptr,
+                      'shape': np.array(matrix.shape)}
+        else:
+            arrays = {'dense': np.asarray(matrix)}
+
+        for item, array in arrays.items():
+            # write to a temporary file first to keep the entry consistent
+            # if several processes share the cache
+            tmp_name = os.path.join(path, '{}.{}.tmp.npy'.format(item, os.getpid()))
+            np.save(tmp_name, array)
+            os.replace(tmp_name, os.path.join(path, item + '.npy'))
+
+    def load(self, key, name):
+        """Loads a matrix from the cache.
+
+        Parameters
+        ----------
+        key : str
+            hash key of the entry
+        name : str
+            name of the matrix
+
+        Returns
+        -------
+        numpy.ndarray or scipy.sparse.csr_matrix
+            stored matrix or None if there is no such a matrix in the cache
+        """
+
+        path = self._path(key, name)
+
+        try:
+            if os.path.isfile(os.path.join(path, 'dense.npy')):
+                return np.load(os.path.join(path, 'dense.npy'), mmap_mode=self.mmap_mode)
+            elif os.path.isfile(os.path.join(path, 'indptr.npy')):
+                arrays = {item: np.load(os.path.join(path, item + '.npy'), mmap_mode=self.mmap_mode)
+                          for item in ['data', 'indices', 'indptr', 'shape']}
+                return scipy.sparse.csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']),
+                                               shape=tuple(arrays['shape']), copy=False)
+        except (IOError, ValueError):
+            logging.info('Cache entry {} is damaged and will be recomputed'.format(path))
+
+        return None
+
+
+def tb_params_tables():
+    """Returns all tables of tight-binding parameters currently set in the module tb_params.
+
+    Returns
+    -------
+    dict
+        dictionary with the names of tables as keys and tables as values
+    """
+
+    return {key: value for key, value in vars(tb_params).items()
+            if key.startswith('PARAMS_') or key.startswith('OV_')}
+
+
+def function_source(func):
+    """Returns the source code of a function used to identify it in hash keys.
+
+    Parameters
+    ----------
+    func : callable
+        function
+
+    Returns
+    -------
+    str
+        source code of the function followed by the values of its default arguments and closure variables,
+        empty string if `func` is None and None if the source code is not available
+    """
+
+    if func is None:
+        return ''
+
+    try:
+        source = inspect.getsource(func)
+    except (IOError, OSError, TypeError):
+        return None
+
+    defaults = getattr(func, '__defaults__', None) or ()
+    closure = getattr(func, '__closure__', None) or ()
+
+    return source + repr(defaults) + repr([item.cell_contents for item in closure])
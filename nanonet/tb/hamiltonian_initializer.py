@@ -8,6 +8,7 @@ import sys
 import numpy as np
 from nanonet.tb.orbitals import Orbitals
 from nanonet.tb import tb_params as dme
+from nanonet.tb.diatomic_matrix_element import compile_tb_params
 from nanonet.tb.hamiltonian import Hamiltonian
 from nanonet.tb.hamiltonian_sparse import HamiltonianSp
 
@@ -29,6 +30,8 @@ def set_tb_params(**kwargs):
         if item.startswith('PARAMS_') or item.startswith('OV_'):
             setattr(dme, item, kwargs[item])
 
+    compile_tb_params()
+
 
 def initializer(**kwargs):
     """Creates a Hamiltonian object from a set of parameters stored in a Python dictionary.
@@ -58,11 +61,12 @@ def initializer(**kwargs):
     sparse = kwargs.get('sparse', 0)
     sigma = kwargs.get('sigma', 1.1)
     num_eigs = kwargs.get('num_eigs', 14)
+    dtype = kwargs.get('dtype', None)
 
     if sparse:
-        h = HamiltonianSp(xyz=xyz, nn_distance=nn_distance, sigma=sigma, num_eigs=num_eigs)
+        h = HamiltonianSp(xyz=xyz, nn_distance=nn_distance, sigma=sigma, num_eigs=num_eigs, dtype=dtype)
     else:
-        h = Hamiltonian(xyz=xyz, nn_distance=nn_distance)
+        h = Hamiltonian(xyz=xyz, nn_distance=nn_distance, dtype=dtype)
 
     h.initialize()
 
@@ -3,12 +3,13 @@ The module contains all necessary classes needed to compute the Hamiltonian matr
 """
 from __future__ import print_function, division
 from __future__ import absolute_import
+import logging
 import matplotlib.pyplot as plt
 import numpy as np
 import scipy.sparse.linalg as splin
 import scipy.sparse as sp
 from nanonet.tb.orbitals import Orbitals
-from nanonet.tb.hamiltonian import Hamiltonian
+from nanonet.tb.hamiltonian import Hamiltonian, match_bands
 
 
 class HamiltonianSp(Hamiltonian):
@@ -36,55 +37,86 @@ class HamiltonianSp(Hamiltonian):
     def initialize(self):
         """The function computes matrix elements of the Hamiltonian."""
 
-        # initialize Hamiltonian matrices
-        self.h_matrix = sp.lil_matrix((self.basis_size, self.basis_size), dtype=complex)
-        self.h_matrix_bc_add = sp.lil_matrix((self.basis_size, self.basis_size), dtype=complex)
-        self.h_matrix_bc_factor = np.ones((self.basis_size, self.basis_size), dtype=complex)
-        self.h_matrix_bc_factor = sp.lil_matrix(self.h_matrix_bc_factor)
+        self.h_matrix, _ = self._assemble_h_matrix()
 
-        # loop over all nodes
-        for j1 in range(self.num_of_nodes):
+        # the tight-binding parameters may have been changed since the lattice blocks were computed
+        self._lattice_blocks = None
+        self._lattice_sums = None
 
-            # find neighbours for each node
-            list_of_neighbours = self.get_neighbours(j1)
+        return self
 
-            for j2 in list_of_neighbours:
-                # on site interactions
-                if j1 == j2:
-                    for l1 in range(self.orbitals_dict[list(self.atom_list.keys())[j1]].num_of_orbitals):
-                        ind1 = self.qn2ind([('atoms', j1), ('l', l1)], )
-                        self.h_matrix[ind1, ind1] = self._get_me(j1, j2, l1, l1)
+    def _eigsh(self, matrix, eigvals_only=False, subset_by_index=None, subset_by_value=None, v0=None):
+        """Computes `num_eigs` eigenpairs of a sparse Hermitian matrix closest to `sigma`
+        using the shift-invert mode of ARPACK.
 
-                # nearest neighbours interaction
-                else:
-                    for l1 in range(self.orbitals_dict[list(self.atom_list.keys())[j1]].num_of_orbitals):
-                        for l2 in range(self.orbitals_dict[list(self.atom_list.keys())[j2]].num_of_orbitals):
+        Parameters
+        ----------
+        matrix : scipy.sparse.spmatrix
+            Hermitian matrix
+        eigvals_only : bool
+            if True, eigenvectors are not computed (Default value = False)
+        subset_by_index : tuple
+            not supported, since the indices of the eigenvalues closest to `sigma`
+            in the whole spectrum are unknown (Default value = None)
+        subset_by_value : tuple
+            energy window (lo, hi], the eigenvalues found outside this window are discarded (Default value = None)
+        v0 : numpy.ndarray
+            starting vector of the Lanczos iterations; if None, a random vector is used (Default value = None)
 
-                            ind1 = self.qn2ind([('atoms', j1), ('l', l1)], )
-                            ind2 = self.qn2ind([('atoms', j2), ('l', l2)], )
+        Returns
+        -------
+        vals : numpy.ndarray
+            eigenvalues in ascending order
+        vects : numpy.ndarray
+            eigenvectors or None if `eigvals_only` is True
+        """
 
-                            self.h_matrix[ind1, ind2] = self._get_me(j1, j2, l1, l2)
+        if subset_by_index is not None:
+            raise ValueError("subset_by_index is not supported by the sparse eigensolver, "
+                             "use subset_by_value or the class Hamiltonian")
 
-        return self
+        # ARPACK computes at most N - 2 eigenpairs of a matrix of the size N
+        if self.num_eigs >= matrix.shape[0] - 1:
+            return self._eigh(matrix.toarray(), eigvals_only=eigvals_only, subset_by_value=subset_by_value)
 
-    def diagonalize(self):
+        ans = splin.eigsh(matrix, k=self.num_eigs, sigma=self.sigma, v0=v0, return_eigenvectors=not eigvals_only)
+
+        vals, vects = (ans, None) if eigvals_only else ans
+        vals = np.real(vals)
+        ind = np.argsort(vals)
+
+        if subset_by_value is not None:
+            ind = ind[(vals[ind] > subset_by_value[0]) & (vals[ind] <= subset_by_value[1])]
+
+        if vects is None:
+            return vals[ind], None
+
+        return vals[ind], vects[:, ind]
+
+    def diagonalize(self, eigvals_only=False, subset_by_index=None, subset_by_value=None):
         """Diagonalize the Hamiltonian matrix for the finite isolated system
-        :return:
 
         Parameters
         ----------
+        eigvals_only : bool
+            if True, eigenvectors are not computed (Default value = False)
+        subset_by_index : tuple
+            not supported by the sparse eigensolver (Default value = None)
+        subset_by_value : tuple
+            energy window (lo, hi], only the eigenvalues within this window are returned (Default value = None)
 
         Returns
         -------
-
+        vals : numpy.ndarray
+            Eigenvalues
+        vects : numpy.ndarray
+            Eigenvectors or None if `eigvals_only` is True
         """
 
-        vals, vects = splin.eigsh(self.h_matrix, k=self.num_eigs, sigma=self.sigma)
-        vals = np.real(vals)
-        ind = np.argsort(vals)
-        return vals[ind], vects[:, ind]
+        return self._eigsh(self.h_matrix, eigvals_only=eigvals_only,
+                           subset_by_index=subset_by_index, subset_by_value=subset_by_value)
 
-    def diagonalize_periodic_bc(self, k_vector):
+    def diagonalize_periodic_bc(self, k_vector, eigvals_only=False, subset_by_index=None, subset_by_value=None):
         """Diagonalize the Hamiltonian matrix with the periodic boundary conditions
         for a certain value of the wave vector k_vector
 
@@ -92,63 +124,169 @@ class HamiltonianSp(Hamiltonian):
         ----------
         k_vector :
             wave vector
+        eigvals_only : bool
+            if True, eigenvectors are not computed (Default value = False)
+        subset_by_index : tuple
+            not supported by the sparse eigensolver (Default value = None)
+        subset_by_value : tuple
+            energy window (lo, hi], only the eigenvalues within this window are returned (Default value = None)
 
         Returns
         -------
+        vals : numpy.ndarray
+            Eigenvalues
+        vects : numpy.ndarray
+            Eigenvectors or None if `eigvals_only` is True
+        """
+
+        mat, _ = self.get_bloch_matrices(k_vector)
+
+        return self._eigsh(mat, eigvals_only=eigvals_only,
+                           subset_by_index=subset_by_index, subset_by_value=subset_by_value)
+
+    def diagonalize_k_path(self, k_points, workers=1, track_bands=True, warm_start=False):
+        """Diagonalizes the Hamiltonian matrix with the periodic boundary conditions
+        for a sequence of closely spaced wave vectors, e.g. a path in the Brillouin zone,
+        and orders the states by bands, see Hamiltonian.diagonalize_k_path().
+
+        If `warm_start` is True, the wave vectors are processed one after another in the calling process
+        and the Lanczos iterations for each wave vector start from the eigenvectors found for the previous one,
+        see _start_vector(). For the spectra of nanowires with `sigma` in the band gap, this saves only a few
+        per cent of the shift-invert solves, so that the batched diagonalization distributed over `workers`
+        processes is used by default.
+        A band can be followed only as long as it is among the `num_eigs` states closest to `sigma`.
+
+        Parameters
+        ----------
+        k_points : list or numpy.ndarray
+            wave vectors along the path, array of the shape (num_of_k_points, 3)
+        workers : int
+            number of worker processes, ignored if `warm_start` is True (Default value = 1)
+        track_bands : bool
+            if False, the states are ordered by energies (Default value = True)
+        warm_start : bool
+            if True, the eigensolver is started from the eigenvectors of the previous wave vector
+            (Default value = False)
 
+        Returns
+        -------
+        vals : numpy.ndarray
+            eigenvalues, array of the shape (num_of_k_points, num_eigs)
+        vects : numpy.ndarray
+            eigenvectors, array of the shape (num_of_k_points, basis_size, num_eigs)
         """
 
-        k_vector = list(k_vector)
+        if not warm_start:
+            return super(HamiltonianSp, self).diagonalize_k_path(k_points, workers=workers,
+                                                                 track_bands=track_bands)
 
-        # reset previous wave vector if any
-        if k_vector != self.k_vector:
+        if workers > 1:
+            logging.warning("The warm-started eigensolver processes the wave vectors sequentially, "
+                            "the argument workers={} is ignored".format(workers))
 
-            self._reset_periodic_bc()
-            self.k_vector = k_vector
-            self._compute_h_matrix_bc_factor()
-            self._compute_h_matrix_bc_add()
+        # the starting vectors are reproducible
+        random_state = np.random.RandomState(0)
+        vals, vects = [], []
 
-        try:
-            vals, vects = splin.eigsh(self.h_matrix_bc_factor.multiply(self.h_matrix) + self.h_matrix_bc_add,
-                                      k=self.num_eigs, sigma=self.sigma)
-        except TypeError:
-            mat = self.h_matrix_bc_factor.multiply(self.h_matrix) + self.h_matrix_bc_add
-            vals, vects = np.linalg.eigh(mat.todense())
+        for k_vector in k_points:
+            mat, _ = self.get_bloch_matrices(k_vector)
+            v0 = self._start_vector(vects[-1] if vects else None, mat.dtype, random_state)
+            vals1, vects1 = self._eigsh(mat, v0=v0)
 
-        vals = np.real(vals)
-        ind = np.argsort(vals)
+            if track_bands and vects:
+                ind = match_bands(vects[-1], vects1)
+                vals1, vects1 = vals1[ind], vects1[:, ind]
 
-        return vals[ind], vects[:, ind]
+            vals.append(vals1)
+            vects.append(vects1)
+
+        return np.array(vals), np.array(vects)
 
-    def _reset_periodic_bc(self):
-        """Resets the matrices determining periodic boundary conditions to their default state
-        :return:
+    def _start_vector(self, vects, dtype, random_state):
+        """Forms the starting vector of the Lanczos iterations from the eigenvectors found for the previous
+        wave vector. A single vector spans only one direction in each degenerate eigenspace, and states
+        entering the window around `sigma` are missing among the previous eigenvectors, so that
+        a random vector of the same norm is added to the combination of the eigenvectors.
 
         Parameters
         ----------
+        vects : numpy.ndarray
+            eigenvectors for the previous wave vector, or None for the first one
+        dtype : numpy.dtype
+            data type of the matrix
+        random_state : numpy.random.RandomState
+            generator of random numbers
 
         Returns
         -------
+        numpy.ndarray
+            starting vector
+        """
+
+        vector = random_state.randn(self.basis_size)
+
+        if np.issubdtype(dtype, np.complexfloating):
+            vector = vector + 1j * random_state.randn(self.basis_size)
+
+        vector /= np.linalg.norm(vector)
+
+        if vects is not None:
+            guess = np.dot(vects, random_state.uniform(0.5, 1.5, vects.shape[1]))
+
+            if not np.issubdtype(dtype, np.complexfloating):
+                guess = guess.real
+
+            vector = vector + guess / np.linalg.norm(guess)
 
+        return vector.astype(dtype)
+
+    def _bloch_matrix(self, name, matrix, rows, cols, values, phases):
+        """Forms the sparse matrix for the current wave vector.
+
+        Parameters
+        ----------
+        name : str
+            name of the matrix
+        matrix : scipy.sparse.csr_matrix
+            matrix of the unit cell H(0)
+        rows : numpy.ndarray
+            row indices of the matrix elements coupling the unit cell with its periodic images
+        cols : numpy.ndarray
+            column indices of the matrix elements coupling the unit cell with its periodic images
+        values : numpy.ndarray
+            sums of the matrix elements over lattice translations with the phase factors exp(-ik R)
+        phases : numpy.ndarray
+            phase factors exp(ik r_j) of the atomic gauge, or None if the matrix is real
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            matrix for the current wave vector
         """
 
-        self.h_matrix_bc_add = sp.lil_matrix((self.basis_size, self.basis_size), dtype=complex)
-        self.h_matrix_bc_factor = np.ones((self.basis_size, self.basis_size), dtype=complex)
-        self.h_matrix_bc_factor = sp.lil_matrix(self.h_matrix_bc_factor)
-        self.k_vector = None
+        dtype = self._bloch_dtype()
+        mat = (matrix + sp.csr_matrix((values, (rows, cols)), shape=matrix.shape)).astype(dtype)
 
-    def get_hamiltonians(self):
-        """ """
+        if phases is not None:
+            mat = sp.diags(phases.astype(dtype)) @ mat @ sp.diags(np.conj(phases).astype(dtype))
 
-        self.k_vector = [0.0, 0.0, 0.0]
+        return sp.csr_matrix(mat)
 
-        self.h_matrix_left_lead = sp.lil_matrix((self.basis_size, self.basis_size), dtype=complex)
-        self.h_matrix_right_lead = sp.lil_matrix((self.basis_size, self.basis_size), dtype=complex)
+    def _build_matrix(self, triplets):
+        """Builds a sparse matrix from triplets.
 
-        self._compute_h_matrix_bc_add(split_the_leads=True)
-        self.k_vector = None
+        Parameters
+        ----------
+        triplets : TripletAssembler
+            Triplets of matrix elements
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            Sparse matrix in the CSR format
+        """
 
-        return self.h_matrix_left_lead.T, self.h_matrix, self.h_matrix_right_lead.T
+        return triplets.tocsr()
 
 
 def main():
@@ -0,0 +1,255 @@
+"""
+The module contains functions generating Monkhorst-Pack meshes of wave vectors
+and reducing them to the irreducible wedge of the Brillouin zone using the point-group symmetry of a crystal.
+"""
+from __future__ import print_function, division
+from __future__ import absolute_import
+from itertools import product
+import logging
+import numpy as np
+from nanonet.tb.aux_functions import strip_digits
+
+
+def reciprocal_lattice(primitive_cell):
+    """Computes the reciprocal lattice vectors b_i satisfying a_i b_j = 2 pi delta_ij.
+
+    Parameters
+    ----------
+    primitive_cell : list or numpy.ndarray
+        primitive cell vectors a_i, array of the shape (3, 3)
+
+    Returns
+    -------
+    numpy.ndarray
+        reciprocal lattice vectors, array of the shape (3, 3)
+    """
+
+    return 2 * np.pi * np.linalg.inv(np.asarray(primitive_cell, dtype=float)).T
+
+
+def find_point_group(primitive_cell, coords=None, labels=None, tol=1e-5):
+    """Finds the point-group operations of a crystal, i.e. the rotational parts of its space-group operations.
+
+    First, the operations of the lattice are found among the integer matrices with the elements -1, 0 and 1,
+    which requires the primitive cell to be Minkowski-reduced or close to it. An operation of the lattice belongs
+    to the point group of the crystal if, combined with some translation, it maps each atom onto an atom
+    of the same species.
+
+    Parameters
+    ----------
+    primitive_cell : list or numpy.ndarray
+        primitive cell vectors, array of the shape (3, 3)
+    coords : numpy.ndarray
+        coordinates of atoms in the primitive cell, array of the shape (num_of_atoms, 3);
+        if None, the point group of the lattice is returned (Default value = None)
+    labels : list
+        atomic labels, the atoms with the same labels without digits are considered to be equivalent;
+        if None, all atoms are equivalent (Default value = None)
+    tol : float
+        tolerance used to compare coordinates, in the units of the primitive cell vectors (Default value = 1e-5)
+
+    Returns
+    -------
+    numpy.ndarray
+        rotation matrices in Cartesian coordinates, array of the shape (num_of_operations, 3, 3)
+    """
+
+    cell = np.asarray(primitive_cell, dtype=float)
+
+    # a lattice operation W transforms the primitive cell vectors as W A and preserves the metric tensor
+    candidates = np.array(list(product([-1, 0, 1], repeat=9))).reshape(-1, 3, 3)
+    metric = np.dot(cell, cell.T)
+    transformed = np.einsum('nij,jk,nlk->nil', candidates, metric, candidates)
+    mask = np.all(np.abs(transformed - metric) < tol * np.max(np.abs(metric)), axis=(1, 2))
+    operations = candidates[mask]
+
+    if coords is not None and len(coords) > 0:
+        frac = np.dot(np.asarray(coords, dtype=float), np.linalg.inv(cell))
+
+        if labels is None:
+            species = np.zeros(len(frac), dtype=int)
+        else:
+            _, species = np.unique(strip_digits(labels), return_inverse=True)
+
+        if len(species) != len(frac):
+            raise ValueError("The numbers of atomic labels and coordinates are different")
+
+        operations = np.array([operation for operation in operations
+                               if _is_crystal_operation(operation, frac, species, tol)])
+
+    # the operation W maps the primitive cell vectors a_i onto R a_i = W_ij a_j, so that R = A^T W^T A^(-T)
+    rotations = np.einsum('ji,nkj,kl->nil', cell, operations, np.linalg.inv(cell).T)
+
+    return rotations
+
+
+def _is_crystal_operation(operation, frac, species, tol):
+    """Checks whether a lattice operation combined with some translation maps the crystal onto itself.
+
+    Parameters
+    ----------
+    operation : numpy.ndarray
+        lattice operation, integer matrix acting on the primitive cell vectors
+    frac : numpy.ndarray
+        fractional coordinates of atoms
+    species : numpy.ndarray
+        species indices of atoms
+    tol : float
+        tolerance used to compare fractional coordinates
+
+    Returns
+    -------
+    bool
+        True if the operation belongs to the point group of the crystal
+    """
+
+    # the fractional coordinates x of atoms transform as x W
+    rotated = np.dot(frac, operation)
+
+    for j in np.flatnonzero(species == species[0]):
+        # translation mapping the first atom onto the atom j
+        diff = rotated[:, np.newaxis, :] + (frac[j] - rotated[0]) - frac[np.newaxis, :, :]
+        diff -= np.round(diff)
+        matches = np.all(np.abs(diff) < tol, axis=2) & (species[:, np.newaxis] == species[np.newaxis, :])
+
+        if np.all(np.any(matches, axis=1)):
+            return True
+
+    return False
+
+
+def monkhorst_pack(size, gamma_centered=False):
+    """Generates a Monkhorst-Pack mesh of wave vectors in fractional coordinates,
+    i.e. in the units of the reciprocal lattice vectors.
+
+    Parameters
+    ----------
+    size : list
+        numbers of mesh points along each reciprocal lattice vector
+    gamma_centered : bool
+        if True, the mesh is shifted to include the Gamma point (Default value = False)
+
+    Returns
+    -------
+    numpy.ndarray
+        fractional coordinates of wave vectors, array of the shape (prod(size), 3)
+
+    Examples
+    --------
+    >>> print(monkhorst_pack([2, 1, 1]))
+    [[-0.25  0.    0.  ]
+     [ 0.25  0.    0.  ]]
+    """
+
+    size = np.asarray(size, dtype=int)
+    grid = np.array(list(product(*[range(item) for item in size])), dtype=float)
+
+    if gamma_centered:
+        return grid / size
+    else:
+        return (grid + 0.5 - 0.5 * size) / size
+
+
+def irreducible_k_mesh(primitive_cell, size, coords=None, labels=None, gamma_centered=False,
+                       time_reversal=True, tol=1e-5):
+    """Generates a Monkhorst-Pack mesh of wave vectors and reduces it to the irreducible wedge
+    of the Brillouin zone using the point group of the crystal, see find_point_group().
+
+    The operations of the point group mapping the mesh onto itself split the mesh points into stars.
+    A single point of each star is returned with the weight proportional to the number of points in the star.
+    The quantities computed for the irreducible wave vectors are unfolded to the full mesh by unfold_k_mesh().
+
+    Parameters
+    ----------
+    primitive_cell : list or numpy.ndarray
+        primitive cell vectors, array of the shape (3, 3)
+    size : list
+        numbers of mesh points along each reciprocal lattice vector
+    coords : numpy.ndarray
+        coordinates of atoms in the primitive cell; if None, the point group of the lattice is used
+        (Default value = None)
+    labels : list
+        atomic labels (Default value = None)
+    gamma_centered : bool
+        if True, the mesh includes the Gamma point (Default value = False)
+    time_reversal : bool
+        if True, the wave vectors k and -k are considered to be equivalent (Default value = True)
+    tol : float
+        tolerance used to compare coordinates (Default value = 1e-5)
+
+    Returns
+    -------
+    k_points : numpy.ndarray
+        Cartesian coordinates of the irreducible wave vectors, array of the shape (num_of_k_points, 3)
+    weights : numpy.ndarray
+        weights of the irreducible wave vectors summing up to one
+    mapping : numpy.ndarray
+        index of the irreducible wave vector for each point of the full mesh
+
+    Examples
+    --------
+    >>> a = 5.43
+    >>> cell = 0.5 * a * np.array([[0, 1, 1], [1, 0, 1], [1, 1, 0]])
+    >>> coords = np.array([[0, 0, 0], [0.25 * a, 0.25 * a, 0.25 * a]])
+    >>> k_points, weights, mapping = irreducible_k_mesh(cell, [4, 4, 4], coords, gamma_centered=True)
+    >>> print(len(k_points), len(mapping))
+    8 64
+    """
+
+    size = np.asarray(size, dtype=int)
+    mesh = monkhorst_pack(size, gamma_centered=gamma_centered)
+
+    cell = np.asarray(primitive_cell, dtype=float)
+    rotations = find_point_group(cell, coords, labels, tol=tol)
+
+    if time_reversal:
+        rotations = np.concatenate((rotations, -rotations))
+
+    # the fractional coordinates kappa of wave vectors transform as kappa A^(-T) R^T A^T
+    operations = np.einsum('ji,njk,lk->nil', np.linalg.inv(cell), rotations, cell)
+
+    # index coordinates of the mesh points, mesh = (indices + offset) / size
+    offset = mesh[0] * size
+    images = []
+
+    for operation in operations:
+        image = np.dot(mesh, operation) * size - offset
+        rounded = np.round(image)
+
+        # the operations not mapping the mesh onto itself, e.g. for shifted meshes, are skipped
+        if np.all(np.abs(image - rounded) < tol):
+            images.append(np.ravel_multi_index((rounded.astype(int) % size).T, size))
+
+    images = np.array(images)
+
+    # the operations mapping the mesh onto itself form a group,
+    # so that the images of a point under all operations form its star
+    representatives = np.min(images, axis=0)
+    irreducible, mapping, counts = np.unique(representatives, return_inverse=True, return_counts=True)
+
+    logging.info('{} operations of the point group map the mesh onto itself, '
+                 '{} of {} wave vectors are irreducible'.format(len(images), len(irreducible), len(mesh)))
+
+    k_points = np.dot(mesh[irreducible], reciprocal_lattice(cell))
+
+    return k_points, counts / float(len(mesh)), mapping
+
+
+def unfold_k_mesh(values, mapping):
+    """Unfolds the quantities computed for the irreducible wave vectors to the full mesh.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        quantities invariant under the point-group operations, e.g. eigenvalues,
+        for each irreducible wave vector
+    mapping : numpy.ndarray
+        index of the irreducible wave vector for each point of the full mesh, see irreducible_k_mesh()
+
+    Returns
+    -------
+    numpy.ndarray
+        quantities for each point of the full mesh in the order of monkhorst_pack()
+    """
+
+    return np.asarray(values)[mapping]
@@ -4,6 +4,7 @@ the linear combination of atomic orbitals (LCAO). Also, the module contains a se
 `SiliconSP3D5S`, `HydrogenS`, `Bismuth`.
 """
 import sys
+import numpy as np
 from nanonet.tb.aux_functions import print_table
 
 
@@ -64,6 +65,20 @@ class Orbitals(object):
 
         Orbitals.orbital_sets[self.title] = self
 
+    def get_quantum_numbers(self):
+        """Returns quantum numbers of all orbitals as a structured array
+        with the fields `n`, `l`, `m` and `s`
+
+        Returns
+        -------
+        numpy.ndarray
+            structured array of quantum numbers
+
+        """
+
+        return np.array([(item['n'], item['l'], item['m'], item['s']) for item in self.orbitals],
+                        dtype=[('n', int), ('l', int), ('m', int), ('s', int)])
+
     def generate_info(self):
         """ """
 
@@ -10,13 +10,215 @@ import logging
 import numpy as np
 import scipy.spatial
 from nanonet.tb.abstract_interfaces import AbstractStructureDesigner
-from nanonet.tb.aux_functions import xyz2np, count_species, is_in_coords, print_dict
+from nanonet.tb.aux_functions import xyz2np, count_species, print_dict, load_structure, strip_digits, \
+    enumerate_labels
+
+
+class NeighbourTable(object):
+    """Compact array representation of all bonds in an atomic structure.
+    Each bond is stored twice, once for each direction, and bonds are sorted
+    by the index of the first atom and then by the index of the second one.
+
+    Attributes
+    ----------
+    i : numpy.ndarray
+        indices of the first atom of each pair
+    j : numpy.ndarray
+        indices of the second atom of each pair
+    vectors : numpy.ndarray
+        bond vectors r_i - r_j, array of the shape (num_of_bonds, 3)
+    distances : numpy.ndarray
+        bond lengths
+    order : numpy.ndarray
+        order of the nearest neighbour for each bond (default None)
+    """
+
+    def __init__(self, i, j, vectors, distances, order=None):
+
+        self.i = i
+        self.j = j
+        self.vectors = vectors
+        self.distances = distances
+        self.order = order
+
+    def __len__(self):
+        return len(self.i)
+
+
+def build_neighbour_table(kd_tree, nn_distance, other_tree=None):
+    """Finds all pairs of sites separated by the distance larger than `0.1 * nn_distance`
+    and smaller than `nn_distance` with a single query of the kd-tree.
+
+    Parameters
+    ----------
+    kd_tree : scipy.spatial.cKDTree
+        kd-tree of the sites the first atom of each pair belongs to
+    nn_distance : float
+        nearest neighbour search radius
+    other_tree : scipy.spatial.cKDTree
+        kd-tree of the sites the second atom of each pair belongs to;
+        if None, the pairs are searched within `kd_tree` (Default value = None)
+
+    Returns
+    -------
+    NeighbourTable
+        table of bonds
+    """
+
+    if other_tree is None:
+        other_tree = kd_tree
+        pairs = kd_tree.query_pairs(nn_distance, output_type='ndarray')
+        i = np.concatenate((pairs[:, 0], pairs[:, 1]))
+        j = np.concatenate((pairs[:, 1], pairs[:, 0]))
+    else:
+        pairs = kd_tree.sparse_distance_matrix(other_tree, nn_distance, output_type='ndarray')
+        i = pairs['i']
+        j = pairs['j']
+
+    i = i.astype(int)
+    j = j.astype(int)
+    vectors = kd_tree.data[i, :3] - other_tree.data[j, :3]
+    distances = np.linalg.norm(vectors, axis=1)
+
+    mask = (nn_distance * 0.1 < distances) & (distances < nn_distance)
+    order = np.lexsort((j[mask], i[mask]))
+
+    return NeighbourTable(i[mask][order], j[mask][order], vectors[mask][order], distances[mask][order])
+
+
+def query_neighbours(kd_tree, points, nn_distance):
+    """Finds all sites separated from each of the points by the distance larger than `0.1 * nn_distance`
+    and smaller than `nn_distance` with a single ball-point query of the kd-tree.
+    Unlike fixed-size nearest-neighbour queries, the number of neighbours is not limited.
+
+    Parameters
+    ----------
+    kd_tree : scipy.spatial.cKDTree
+        kd-tree of the sites
+    points : numpy.ndarray
+        coordinates of the points, array of the shape (num_of_points, 3)
+    nn_distance : float
+        nearest neighbour search radius
+
+    Returns
+    -------
+    NeighbourTable
+        table of pairs, where `i` are indices of the points and `j` are indices of the sites;
+        the pairs are sorted by the index of the point and then by the distance
+    """
+
+    points = np.asarray(points, dtype=float).reshape(-1, kd_tree.m)
+    neighbours = kd_tree.query_ball_point(points, nn_distance)
+    lengths = np.fromiter((len(item) for item in neighbours), dtype=int, count=len(neighbours))
+
+    i = np.repeat(np.arange(len(points)), lengths)
+    j = np.fromiter((item for items in neighbours for item in items), dtype=int, count=np.sum(lengths))
+    vectors = points[i, :3] - kd_tree.data[j, :3]
+    distances = np.linalg.norm(vectors, axis=1)
+
+    mask = (nn_distance * 0.1 < distances) & (distances < nn_distance)
+    order = np.lexsort((distances[mask], i[mask]))
+
+    return NeighbourTable(i[mask][order], j[mask][order], vectors[mask][order], distances[mask][order])
+
+
+def build_periodic_neighbour_table(coords, primitive_cell, nn_distance):
+    """Finds all pairs of atoms in a periodic structure separated by the distance larger than `0.1 * nn_distance`
+    and smaller than `nn_distance`, including the pairs of atoms in different unit cells.
+    The second atom of each pair is translated by the lattice vector `R = translations[k] @ primitive_cell`,
+    so that the bond vector is `coords[i] - coords[j] - R`.
+
+    The atoms are wrapped into the unit cell using their fractional coordinates. For orthorhombic cells,
+    the pairs are found with a periodic kd-tree; otherwise the kd-tree of the unit cell is matched against
+    the periodic images of atoms lying within `nn_distance` of the faces of the unit cell.
+    The number of periodic images grows with the area of the faces rather than with the volume of the cell.
+
+    Parameters
+    ----------
+    coords : numpy.ndarray
+        coordinates of atoms, array of the shape (num_of_atoms, 3)
+    primitive_cell : list or numpy.ndarray
+        primitive cell vectors, array of the shape (num_of_vectors, 3) with one, two or three vectors;
+        the structure is not periodic in the directions orthogonal to the vectors
+    nn_distance : float
+        nearest neighbour search radius
+
+    Returns
+    -------
+    NeighbourTable
+        table of bonds with the attribute `translations` containing the lattice translations
+        in units of the primitive cell vectors, array of the shape (num_of_bonds, num_of_vectors)
+    """
+
+    coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+    pcv = np.asarray(primitive_cell, dtype=float).reshape(-1, 3)
+    num_vectors = len(pcv)
+
+    # columns of the pseudo-inverse matrix are reciprocal vectors,
+    # their inverse lengths are distances between the lattice planes
+    reciprocal = np.linalg.pinv(pcv)
+    fractional = np.dot(coords, reciprocal)
+    cells = np.floor(fractional).astype(int)
+    fractional = fractional - cells
+    wrapped = coords - np.dot(cells, pcv)
+
+    sizes = np.diag(pcv) if num_vectors == 3 else None
+
+    if sizes is not None and np.allclose(pcv, np.diag(sizes)) and np.all(sizes > 0) and \
+            nn_distance < 0.5 * np.min(sizes):
+        # for orthorhombic cells, the kd-tree takes into account the periodicity itself
+        wrapped = np.clip(fractional, 0, np.nextafter(1, 0)) * sizes
+        pairs = scipy.spatial.cKDTree(wrapped, boxsize=sizes).query_pairs(nn_distance, output_type='ndarray')
+        i = np.concatenate((pairs[:, 0], pairs[:, 1]))
+        j = np.concatenate((pairs[:, 1], pairs[:, 0]))
+        translations = np.rint((fractional[i] - fractional[j]) - ((fractional[i] - fractional[j] + 0.5) % 1.0 - 0.5))
+        translations = translations.astype(int)
+    else:
+        # thickness of the layer of the width nn_distance in fractional coordinates
+        margin = nn_distance * np.linalg.norm(reciprocal, axis=0)
+        num_cells = np.ceil(margin).astype(int)
+
+        image_atoms = []
+        image_translations = []
+
+        for translation in np.array(list(np.ndindex(*(2 * num_cells + 1)))) - num_cells:
+            shifted = fractional + translation
+            inside = np.flatnonzero(np.all((shifted > -margin) & (shifted < 1.0 + margin), axis=1))
+            image_atoms.append(inside)
+            image_translations.append(np.tile(translation, (len(inside), 1)))
+
+        image_atoms = np.concatenate(image_atoms)
+        image_translations = np.concatenate(image_translations).reshape(-1, num_vectors)
+
+        cell_tree = scipy.spatial.cKDTree(wrapped)
+        image_tree = scipy.spatial.cKDTree(wrapped[image_atoms] + np.dot(image_translations, pcv))
+        pairs = cell_tree.sparse_distance_matrix(image_tree, nn_distance, output_type='ndarray')
+
+        i = pairs['i'].astype(int)
+        j = image_atoms[pairs['j']]
+        translations = image_translations[pairs['j']]
+
+    # translations between the original positions of atoms
+    translations = translations + cells[i] - cells[j]
+    vectors = coords[i] - coords[j] - np.dot(translations, pcv)
+    distances = np.linalg.norm(vectors, axis=1)
+
+    mask = (nn_distance * 0.1 < distances) & (distances < nn_distance)
+    order = np.lexsort(tuple(translations[mask].T[::-1]) + (j[mask], i[mask]))
+
+    table = NeighbourTable(i[mask][order], j[mask][order], vectors[mask][order], distances[mask][order])
+    table.translations = translations[mask][order]
+
+    return table
 
 
 class StructDesignerXYZ(AbstractStructureDesigner):
     """The class builds an atomic structure from either
-    the filename of a xyz-file or
-    xyz data itself represented as a Python string.
+    the filename of a xyz-file,
+    xyz data itself represented as a Python string,
+    the filename of a binary file (.npz or .npy) created by the function aux_functions.save_structure(),
+    an object exposing the methods get_chemical_symbols() and get_positions() (e.g. ase.Atoms) or
+    the list of atomic labels `labels` and the array of coordinates `coords` of the shape (num_of_atoms, 3).
     The class arrange atomic coordinates in kd-tree and
     sorts them if needed according to a specified sorting procedure.
 
@@ -34,6 +236,12 @@ class StructDesignerXYZ(AbstractStructureDesigner):
         number of chemical elements corresponding to the number of distinct basis sets.
     atom_list : OrderedDict
         list of atomic species and their coordinates
+    atom_coords : numpy.ndarray
+        atomic coordinates, array of the shape (num_of_nodes, 3)
+    species : list
+        labels of chemical elements
+    species_ids : numpy.ndarray
+        index of the chemical element in the list `species` for each atom
     kd_tree : scipy.spatial.ckdtree.cKDTree
         kd-tree for fast nearest-neighbour search
     left_lead : list
@@ -49,17 +257,38 @@ class StructDesignerXYZ(AbstractStructureDesigner):
     def __init__(self, **kwargs):
         # ------------ parse xyz file or string --------------
         xyz = kwargs.get('xyz', None)
-
-        try:
-            with open(xyz, 'r') as read_file:
-                reader = read_file.read()
-        except IOError:
-            reader = xyz
-
-        labels, coords = xyz2np(reader)
-
-        num_lines = reader.count('\n')
-        if num_lines > 11:
+        labels = kwargs.get('labels', None)
+        coords = kwargs.get('coords', None)
+
+        if hasattr(xyz, 'get_chemical_symbols') and hasattr(xyz, 'get_positions'):
+            labels, coords = xyz.get_chemical_symbols(), xyz.get_positions()
+            xyz = None
+
+        if labels is not None:
+            labels = enumerate_labels(labels)
+            coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+            reader = None
+
+            if len(labels) != len(coords):
+                raise ValueError("The numbers of labels and coordinates differ")
+        elif xyz.endswith('.npz') or xyz.endswith('.npy'):
+            labels, coords = load_structure(xyz)
+            reader = None
+        else:
+            try:
+                with open(xyz, 'r') as read_file:
+                    reader = read_file.read()
+            except IOError:
+                reader = xyz
+
+            labels, coords = xyz2np(reader)
+
+        if xyz is None:
+            logging.info("The structure of {} atoms is given by arrays".format(len(labels)))
+        elif reader is None:
+            logging.info("The structure of {} atoms is loaded from the file {}".format(len(labels), xyz))
+        elif reader.count('\n') > 11:
+            num_lines = reader.count('\n')
             logging.info("The xyz-file:\n {}".format('\n'.join(reader.split('\n')[:11])))
             logging.info("                  .                    ")
             logging.info("                  .                    ")
@@ -75,8 +304,9 @@ class StructDesignerXYZ(AbstractStructureDesigner):
                                                                    # their number per unit cell
         self._num_of_nodes = sum(self.num_of_species.values())
         # ------- make list of coordinates and kd-tree -------
-        self._atom_list = OrderedDict(list(zip(labels, coords)))
-        self._kd_tree = scipy.spatial.cKDTree(np.array(list(self._atom_list.values())),
+        self._atom_list = OrderedDict(zip(labels, coords))
+        self._make_tables(coords)
+        self._kd_tree = scipy.spatial.cKDTree(self._atom_coords,
                                               leafsize=1,
                                               balanced_tree=True)
 
@@ -85,6 +315,7 @@ class StructDesignerXYZ(AbstractStructureDesigner):
         self.right_lead = kwargs.get('right_lead', [])
         self.sort_func = kwargs.get('sort_func', None)
         self.reorder = None
+        self._neighbour_table = None
 
         if self.sort_func is not None:
             self._sort(labels, coords)
@@ -105,14 +336,11 @@ class StructDesignerXYZ(AbstractStructureDesigner):
         """
 
         coords = np.array(coords)
-        h_matrix = np.zeros((coords.shape[0], coords.shape[0]))
+        h_matrix = np.eye(coords.shape[0])
 
-        self._nn_distance = 2 * self._nn_distance
-        for j in range(len(coords)):
-            ans = self.get_neighbours(j)
-            h_matrix[j, ans] = 1
-
-        self._nn_distance = self._nn_distance / 2
+        # connectivity within the doubled nearest-neighbour distance
+        table = build_neighbour_table(self._kd_tree, 2 * self._nn_distance)
+        h_matrix[table.i, table.j] = 1
 
         indices = self.sort_func(coords=coords,
                                  left_lead=self.left_lead,
@@ -127,8 +355,53 @@ class StructDesignerXYZ(AbstractStructureDesigner):
         coords = coords[indices]
         labels = [labels[i] for i in indices]
 
-        self._atom_list = OrderedDict(list(zip(labels, coords)))
-        self._kd_tree = scipy.spatial.cKDTree(np.array(list(self._atom_list.values())), leafsize=1, balanced_tree=True)
+        self._atom_list = OrderedDict(zip(labels, coords))
+        self._make_tables(coords)
+        self._kd_tree = scipy.spatial.cKDTree(self._atom_coords, leafsize=1, balanced_tree=True)
+        self._neighbour_table = None
+
+    def _make_tables(self, coords=None):
+        """Builds arrays of atomic coordinates and chemical elements from the list of atoms.
+
+        Parameters
+        ----------
+        coords : numpy.ndarray
+            atomic coordinates in the order of the list of atoms;
+            if None, they are taken from the list of atoms (Default value = None)
+        """
+
+        if coords is None:
+            coords = list(self._atom_list.values())
+
+        self._atom_coords = np.array(coords, dtype=float).reshape(-1, 3)
+        self._species = list(self._num_of_species.keys())
+
+        species, ids = np.unique(strip_digits(list(self._atom_list.keys())), return_inverse=True)
+        species_map = np.array([self._species.index(label) for label in species], dtype=int)
+        self._species_ids = species_map[ids.ravel()].reshape(-1)
+
+    def move_atoms(self, atoms, coords):
+        """Changes coordinates of a group of atoms and updates the kd-tree and the table of neighbours.
+
+        Parameters
+        ----------
+        atoms : numpy.ndarray
+            indices of atoms
+        coords : numpy.ndarray
+            new coordinates of atoms, array of the shape (len(atoms), 3)
+        """
+
+        atoms = np.atleast_1d(np.asarray(atoms, dtype=int))
+        coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+
+        labels = list(self._atom_list.keys())
+
+        for j, item in zip(atoms, coords):
+            self._atom_list[labels[j]] = item.copy()
+
+        self._atom_coords[atoms] = coords
+        self._kd_tree = scipy.spatial.cKDTree(self._atom_coords, leafsize=1, balanced_tree=True)
+        self._neighbour_table = None
 
     def add_leads(self, left_lead, right_lead):
         """
@@ -152,6 +425,21 @@ class StructDesignerXYZ(AbstractStructureDesigner):
         """ """
         return self._atom_list
 
+    @property
+    def atom_coords(self):
+        """ """
+        return self._atom_coords
+
+    @property
+    def species(self):
+        """ """
+        return self._species
+
+    @property
+    def species_ids(self):
+        """ """
+        return self._species_ids
+
     @property
     def num_of_nodes(self):
         """ """
@@ -175,6 +463,9 @@ class StructDesignerXYZ(AbstractStructureDesigner):
 
         """
 
+        if isinstance(query, (int, np.integer)):
+            query = self._atom_coords[query]
+
         ans = self._get_neighbours(query)
 
         if ans[0][0] == np.inf:
@@ -188,6 +479,21 @@ class StructDesignerXYZ(AbstractStructureDesigner):
 
         return ans1
 
+    def get_neighbour_table(self):
+        """Returns the table of all bonds in the structure.
+        The table is computed once and reused afterwards.
+
+        Returns
+        -------
+        NeighbourTable
+            table of bonds
+        """
+
+        if self._neighbour_table is None:
+            self._neighbour_table = build_neighbour_table(self._kd_tree, self._nn_distance)
+
+        return self._neighbour_table
+
 
 class CyclicTopology(AbstractStructureDesigner):
     """The class provides functionality for determining
@@ -214,18 +520,27 @@ class CyclicTopology(AbstractStructureDesigner):
             self.sizes.append(np.linalg.norm(item))
 
         self.interfacial_atoms_ind = []
-        self.virtual_and_interfacial_atoms = OrderedDict()
+
+        # interfacial atoms and their periodic images, the rows are indexed as the points of the kd-tree
+        self.image_parents = None  # indices of atoms in the unit cell
+        self.image_translations = None  # translations in units of the primitive cell vectors
+        self.image_orders = None  # 0 for interfacial atoms, 1 and 2 for first- and second-order images
+        self.image_flags = None  # True for images and False for interfacial atoms
+        self.image_coords = None  # coordinates
+
+        self._labels = labels
+        self._virtual_and_interfacial_atoms = None
 
         self.shift = np.zeros(3)
 
         self._generate_atom_list(labels, coords)
 
-        self._kd_tree = scipy.spatial.cKDTree(list(self.virtual_and_interfacial_atoms.values()),
-                                              leafsize=100, balanced_tree=True)
+        self._kd_tree = scipy.spatial.cKDTree(self.image_coords, leafsize=100, balanced_tree=True)
 
         logging.info("Primitive_cell_vectors: \n {} \n".format(primitive_cell_vectors))
-        logging.debug("Virtual and interfacial atoms: \n "
-                      "{} ".format(print_dict(self.virtual_and_interfacial_atoms)))
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("Virtual and interfacial atoms: \n "
+                          "{} ".format(print_dict(self.virtual_and_interfacial_atoms)))
         logging.info("---------------------------------\n")
 
     @property
@@ -233,137 +548,128 @@ class CyclicTopology(AbstractStructureDesigner):
         """ """
         return self.virtual_and_interfacial_atoms
 
-    def _generate_atom_list(self, labels, coords):
+    @property
+    def virtual_and_interfacial_atoms(self):
+        """Dictionary of coordinates of interfacial atoms and their images with labels as keys,
+        e.g. '12_Si' for the interfacial atom 12 and '*_3_12_Si' for the fourth image;
+        first-order images start with '*', and second-order ones start with '**'.
+        The dictionary is built on demand from the arrays `image_parents` and `image_orders`.
         """
 
+        if self._virtual_and_interfacial_atoms is None:
+            prefixes = np.array(['', '*_', '**_'])[self.image_orders]
+            counts = np.cumsum(self.image_flags) - 1
+            keys = [prefix + (str(count) + '_' if prefix else '') + str(parent) + '_' + self._labels[parent]
+                    for prefix, count, parent in zip(prefixes, counts, self.image_parents)]
+
+            self._virtual_and_interfacial_atoms = OrderedDict(zip(keys, self.image_coords))
+
+        return self._virtual_and_interfacial_atoms
+
+    def _generate_atom_list(self, labels, coords):
+        """Finds interfacial atoms, i.e. atoms near the faces of the primitive cell, and generates
+        their periodic images in the adjacent cells. The images are translated by a primitive cell vector
+        normal to the face (first-order images) or by a sum or difference of such a vector and any
+        primitive cell vector (second-order images). The images coinciding with atoms of the primitive cell or
+        with other images are discarded.
+
+        The results are stored in the arrays `image_parents`, `image_translations`, `image_orders` and
+        `image_coords` containing the interfacial atoms themselves (with zero translations and the order 0)
+        followed by their images.
+
         Parameters
         ----------
         labels :
             labels of atoms
         coords :
             coordinates of atoms
-
-        Returns
-        -------
-
         """
 
-        # matrices of distances between atoms and interfaces
-        distances1 = np.empty((len(coords), len(self.pcv)), dtype=float)
-        distances2 = np.empty((len(coords), len(self.pcv)), dtype=float)
-
-        for j1, coord in enumerate(coords):    # for each atom in the unit cell
-            for j2, basis_vec in enumerate(self.pcv):    # for lattice basis vector
-
-                # compute distance to the primary plane of the unit cell
-                distances1[j1, j2] = np.inner(coord - self.shift, basis_vec) / self.sizes[j2]
-                # compute distance to the adjacent plane of the  unit cell
-                distances2[j1, j2] = np.inner(coord - self.shift - basis_vec, basis_vec) / self.sizes[j2]
+        coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+        pcv = np.array(self.pcv, dtype=float).reshape(-1, 3)
+        sizes = np.array(self.sizes)
+        num_vectors = len(pcv)
 
-        for item in distances1.T:
-            self.shift += coords[np.argmin(item)]
+        # distances between atoms and the primary planes of the unit cell
+        distances1 = np.dot(coords - self.shift, pcv.T) / sizes
+        self.shift = self.shift + np.sum(coords[np.argmin(distances1, axis=0)], axis=0)
 
-        for j1, coord in enumerate(coords):    # for each atom in the unit cell
-            for j2, basis_vec in enumerate(self.pcv):    # for lattice basis vector
-
-                # compute distance to the primary plane of the unit cell
-                distances1[j1, j2] = np.inner(coord - self.shift, basis_vec) / self.sizes[j2]
-                # compute distance to the adjacent plane of the  unit cell
-                distances2[j1, j2] = np.inner(coord - self.shift - basis_vec, basis_vec) / self.sizes[j2]
+        distances1 = np.dot(coords - self.shift, pcv.T) / sizes
+        # distances between atoms and the adjacent planes of the unit cell
+        distances2 = distances1 - sizes
 
         # transform distance to the boolean variable defining whether atom belongs to the interface or not
-        distances1 = np.abs(distances1 - np.min(distances1)) < self._nn_distance * 0.25
-        distances2 = np.abs(np.abs(distances2) - np.min(np.abs(distances2))) < self._nn_distance * 0.25
-
-        # distances1 = np.ones(distances1.shape)
-        # distances2 = np.ones(distances1.shape)
-
-        # form new lists of atoms
-        count = 0
-        for j, item in enumerate(coords):
-
-            if any(distances1[j]):
-                self.virtual_and_interfacial_atoms.update({str(j) + "_" + labels[j]: item})
-                self.interfacial_atoms_ind.append(j)
-
-                for surf in np.where(distances1[j])[0]:
-
-                    count = self._translate_atom_1st_order(item,
-                                                           np.array(self.pcv[surf]),
-                                                           "_" + str(j) + "_" + labels[j],
-                                                           coords,
-                                                           count)
-
-                    count = self._translate_atom_2d_order(item,
-                                                          np.array(self.pcv[surf]),
-                                                          "_" + str(j) + "_" + labels[j],
-                                                          coords,
-                                                          count)
-
-            if any(distances2[j]):
-                self.virtual_and_interfacial_atoms.update({str(j) + "_" + labels[j]: item})
-                self.interfacial_atoms_ind.append(j)
-                for surf in np.where(distances2[j])[0]:
-
-                    count = self._translate_atom_1st_order(item,
-                                                           -1 * np.array(self.pcv[surf]),
-                                                           "_" + str(j) + "_" + labels[j],
-                                                           coords,
-                                                           count)
-
-                    count = self._translate_atom_2d_order(item,
-                                                          -1 * np.array(self.pcv[surf]),
-                                                          "_" + str(j) + "_" + labels[j],
-                                                          coords,
-                                                          count)
-
-        # remove non-unique elements
-        self.interfacial_atoms_ind = list(set(self.interfacial_atoms_ind))
-
-    def _translate_atom_1st_order(self, atom_coords, cell_vector, label, penalty_coords, count):
-        """
-
-        Parameters
-        ----------
-        atom_coords :
-            
-        cell_vector :
-            
-        label :
-            
-        penalty_coords :
-            
-        count :
-            
-
-        Returns
-        -------
-
-        """
-
-        try_coords = atom_coords + cell_vector
-
-        if not is_in_coords(try_coords, penalty_coords) and \
-                not is_in_coords(try_coords, np.array(list(self.virtual_and_interfacial_atoms.values()))):
-            self.virtual_and_interfacial_atoms.update({"*_" + str(count) + label: try_coords})
-            count += 1
-
-        return count
+        interface1 = np.abs(distances1 - np.min(distances1)) < self._nn_distance * 0.25
+        interface2 = np.abs(np.abs(distances2) - np.min(np.abs(distances2))) < self._nn_distance * 0.25
+
+        # translations through each face: f, f + e_v and f - e_v for all primitive cell vectors e_v,
+        # where f is e_s for the primary faces and -e_s for the adjacent ones
+        unit = np.eye(num_vectors, dtype=int)
+
+        def make_templates(faces):
+            return np.concatenate((faces[:, np.newaxis, :],
+                                   np.stack((faces[:, np.newaxis, :] + unit[np.newaxis, :, :],
+                                             faces[:, np.newaxis, :] - unit[np.newaxis, :, :]),
+                                            axis=2).reshape(num_vectors, 2 * num_vectors, num_vectors)),
+                                  axis=1)
+
+        templates1 = make_templates(unit)
+        templates2 = make_templates(-unit)
+        num_templates = templates1.shape[1]
+        template_orders = np.array([1] + [2] * (num_templates - 1))
+
+        interfacial = np.flatnonzero(np.any(interface1, axis=1) | np.any(interface2, axis=1))
+        atoms1, faces1 = np.nonzero(interface1)
+        atoms2, faces2 = np.nonzero(interface2)
+
+        # interfacial atoms followed by the images through the primary and adjacent faces
+        parents = np.concatenate((interfacial,
+                                  np.repeat(atoms1, num_templates),
+                                  np.repeat(atoms2, num_templates)))
+        blocks = np.concatenate((np.zeros(len(interfacial), dtype=int),
+                                 np.full(len(atoms1) * num_templates, 1),
+                                 np.full(len(atoms2) * num_templates, 2)))
+        faces = np.concatenate((np.zeros(len(interfacial), dtype=int),
+                                np.repeat(faces1, num_templates),
+                                np.repeat(faces2, num_templates)))
+        orders = np.concatenate((np.zeros(len(interfacial), dtype=int),
+                                 np.tile(template_orders, len(atoms1) + len(atoms2))))
+        translations = np.concatenate((np.zeros((len(interfacial), num_vectors), dtype=int),
+                                       templates1[faces1].reshape(-1, num_vectors),
+                                       templates2[faces2].reshape(-1, num_vectors)))
+        steps = np.concatenate((np.zeros(len(interfacial), dtype=int),
+                                np.tile(np.arange(num_templates), len(atoms1) + len(atoms2))))
+
+        # the same order of atoms and images as in the sequential algorithm
+        order = np.lexsort((steps, faces, blocks, parents))
+        parents, orders, translations = parents[order], orders[order], translations[order]
+        image_coords = coords[parents] + np.dot(translations, pcv)
+
+        # discard images coinciding with atoms of the unit cell
+        keep = orders == 0
+        images = np.flatnonzero(orders > 0)
+        distances, _ = scipy.spatial.cKDTree(coords).query(image_coords[images], distance_upper_bound=0.01)
+        keep[images[np.isinf(distances)]] = True
+
+        # discard duplicates, the first image of each group of coinciding images is kept
+        images = np.flatnonzero(keep & (orders > 0))
+        pairs = scipy.spatial.cKDTree(image_coords[images]).query_pairs(0.01, output_type='ndarray')
+        keep[images[pairs[:, 1]]] = False
+
+        self.image_parents = parents[keep]
+        self.image_translations = translations[keep]
+        self.image_orders = orders[keep]
+        self.image_flags = self.image_orders > 0
+        self.image_coords = image_coords[keep]
+
+        self.interfacial_atoms_ind = interfacial.tolist()
 
-    def _translate_atom_2d_order(self, atom_coords, cell_vector, label, penalty_coords, count):
+    def get_neighbours(self, query):
         """
 
         Parameters
         ----------
-        atom_coords :
-            
-        cell_vector :
-            
-        label :
-            
-        penalty_coords :
-            
-        count :
+        query :
             
 
         Returns
@@ -371,74 +677,56 @@ class CyclicTopology(AbstractStructureDesigner):
 
         """
 
-        for vec in self.pcv:
-
-            try_coords = atom_coords + cell_vector + vec
-
-            if not is_in_coords(try_coords, penalty_coords) and \
-                    not is_in_coords(try_coords, np.array(list(self.virtual_and_interfacial_atoms.values()))):
-
-                self.virtual_and_interfacial_atoms.update({"**_" + str(count) + label: try_coords})
-                count += 1
-
-            try_coords = atom_coords + cell_vector - vec
+        distances, indices = self._get_neighbours(query)
 
-            if not is_in_coords(try_coords, penalty_coords) and \
-                    not is_in_coords(try_coords, np.array(list(self.virtual_and_interfacial_atoms.values()))):
+        mask = (self._nn_distance * 0.1 < distances) & (distances < self._nn_distance)
+        mask[mask] = self.image_flags[indices[mask]]
 
-                self.virtual_and_interfacial_atoms.update({"**_" + str(count) + label: try_coords})
-                count += 1
+        return indices[mask].tolist()
 
-        return count
-
-    def get_neighbours(self, query):
-        """
-
-        Parameters
-        ----------
-        query :
-            
+    def get_image_bonds(self):
+        """Finds bonds between all interfacial atoms and the images of atoms in the neighbouring cells
+        with a single query of the kd-tree.
 
         Returns
         -------
-
+        atoms : numpy.ndarray
+            indices of interfacial atoms
+        images : numpy.ndarray
+            indices of images, i.e. rows of the arrays `image_parents`, `image_translations` and `image_coords`
         """
 
-        ans = self._get_neighbours(query)
-
-        ans1 = []
+        interfacial = np.flatnonzero(~self.image_flags)
+        table = query_neighbours(self._kd_tree, self.image_coords[interfacial], self._nn_distance)
+        mask = self.image_flags[table.j]
 
-        for item in zip(ans[0], ans[1]):
-            if self._nn_distance * 0.1 < item[0] < self._nn_distance and \
-                    list(self.virtual_and_interfacial_atoms.keys())[item[1]].startswith("*"):
-                ans1.append(item[1])
-
-        return ans1
+        return self.image_parents[interfacial[table.i[mask]]], table.j[mask]
 
     def atom_classifier(self, coords, leads):
-        """
+        """Determines whether atoms belong to the left or right neighbouring cell along the vector `leads`.
 
         Parameters
         ----------
-        coords :
-            
-        leads :
-            
+        coords : numpy.ndarray
+            coordinates of an atom or an array of coordinates of the shape (num_of_atoms, 3)
+        leads : numpy.ndarray
+            primitive cell vector
 
         Returns
         -------
-
+        str or numpy.ndarray
+            'L', 'R' or None for each atom
         """
 
         distance_to_surface1 = np.inner(coords - self.shift, leads) / np.linalg.norm(leads)
         distance_to_surface2 = np.inner(coords - self.shift - leads, leads) / np.linalg.norm(leads)
 
-        flag = None
+        flag = np.full(np.shape(distance_to_surface1), None, dtype=object)
+        flag[distance_to_surface1 < 0] = 'L'
+        flag[distance_to_surface2 >= 0] = 'R'
 
-        if distance_to_surface1 < 0:
-            flag = 'L'
-        if distance_to_surface2 >= 0:
-            flag = 'R'
+        if flag.ndim == 0:
+            return flag.item()
 
         return flag
 
@@ -48,6 +48,43 @@ def preprocess_data(param_file, k_points_file, xyz, code_name):
     return params, wave_vector, code_name
 
 
+def eigensolver_options(params, eigvals_only=None, subset_by_index=None, subset_by_value=None):
+    """Collects the options of the eigensolver from the parameters read from the yaml-file.
+    The options specified in the command line override those from the yaml-file.
+
+    Parameters
+    ----------
+    params : dict
+        parameters read from the yaml-file; the eigensolver options are removed from this dictionary
+    eigvals_only : int
+        if nonzero, eigenvectors are not computed (Default value = None)
+    subset_by_index : list
+        indices of the first and last eigenvalues to compute (Default value = None)
+    subset_by_value : list
+        energy window (lo, hi] of the eigenvalues to compute (Default value = None)
+
+    Returns
+    -------
+    dict
+        keyword arguments of Hamiltonian.diagonalize_periodic_bc_batch()
+    """
+
+    options = {'eigvals_only': params.pop('eigvals_only', False),
+               'subset_by_index': params.pop('subset_by_index', None),
+               'subset_by_value': params.pop('subset_by_value', None)}
+
+    if eigvals_only is not None:
+        options['eigvals_only'] = eigvals_only
+    if subset_by_index is not None:
+        options['subset_by_index'] = subset_by_index
+    if subset_by_value is not None:
+        options['subset_by_value'] = subset_by_value
+
+    options['eigvals_only'] = bool(options['eigvals_only'])
+
+    return options
+
+
 def postprocess_data(kk, band_structure, show, save, code_name):
     """
 
@@ -74,7 +111,11 @@ def postprocess_data(kk, band_structure, show, save, code_name):
     if not isinstance(band_structure, np.ndarray):
         ids = [band_structure[item]['id'] for item in range(len(band_structure))]
         band_structure = [x['eigenvalues'] for _, x in sorted(zip(ids, band_structure))]
-        band_structure = np.array(band_structure)
+
+        # the number of eigenvalues in an energy window may depend on the wave vector
+        num_of_bands = max([len(item) for item in band_structure] + [0])
+        band_structure = np.array([np.pad(np.real(item), (0, num_of_bands - len(item)), constant_values=np.nan)
+                                   for item in band_structure])
 
     if len(kk.shape) > 1:
         kkk = np.sum(kk, axis=0)
@@ -139,7 +180,8 @@ def postprocess_data(kk, band_structure, show, save, code_name):
             pickle.dump(band_structure, f, pickle.HIGHEST_PROTOCOL)
 
 
-def main1(param_file, k_points_file, xyz, show, save, code_name):
+def main1(param_file, k_points_file, xyz, show, save, code_name, workers=1,
+          eigvals_only=None, subset_by_index=None, subset_by_value=None):
     """
 
     Parameters
@@ -156,6 +198,14 @@ def main1(param_file, k_points_file, xyz, show, save, code_name):
         
     code_name :
         
+    workers : int
+        number of local worker processes diagonalizing the Hamiltonian for different wave vectors (Default value = 1)
+    eigvals_only : int
+        if nonzero, eigenvectors are not computed; overrides the yaml-file parameter (Default value = None)
+    subset_by_index : list
+        indices of the first and last eigenvalues to compute; overrides the yaml-file parameter (Default value = None)
+    subset_by_value : list
+        energy window (lo, hi] of the eigenvalues to compute; overrides the yaml-file parameter (Default value = None)
 
     Returns
     -------
@@ -163,15 +213,19 @@ def main1(param_file, k_points_file, xyz, show, save, code_name):
     """
 
     params, wave_vector, code_name = preprocess_data(param_file, k_points_file, xyz, code_name)
+    options = eigensolver_options(params, eigvals_only, subset_by_index, subset_by_value)
 
     # initialize Hamiltonian
     hamiltonian = tb.initializer(**params)
 
     # compute band structure
     band_structure = [{} for _ in range(len(wave_vector))]
+    eigenvalues, eigenvectors = hamiltonian.diagonalize_periodic_bc_batch(wave_vector, workers=workers, **options)
+
+    if eigenvectors is None:
+        eigenvectors = [None] * len(eigenvalues)
 
-    for j, jj in enumerate(wave_vector):
-        vals, vects = hamiltonian.diagonalize_periodic_bc(jj)
+    for j, (jj, vals, vects) in enumerate(zip(wave_vector, eigenvalues, eigenvectors)):
         band_structure[j] = {'id': j, 'wave_vector': jj, 'eigenvalues': vals, 'eigenvectors': vects}
         print('#{} '.format(j), " ".join(['{:.3f} '.format(element) for element in vals]))
 
@@ -211,6 +265,22 @@ def create_parser():
     parser.add_argument('--code_name', type=str, default=None,
                         help='Code name is added to the names of all saved data files.')
 
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of local processes diagonalizing the Hamiltonian \
+                             for different wave vectors in parallel.')
+
+    parser.add_argument('--eigvals_only', type=int, default=None,
+                        help='Compute eigenvalues only, 0/1. \
+                             If specified, it overrides the value specified in the param_file.')
+
+    parser.add_argument('--subset_by_index', type=int, nargs=2, default=None, metavar=('LO', 'HI'),
+                        help='Indices of the first and last eigenvalues to compute, both inclusive. \
+                             If specified, it overrides the value specified in the param_file.')
+
+    parser.add_argument('--subset_by_value', type=float, nargs=2, default=None, metavar=('LO', 'HI'),
+                        help='Energy window (LO, HI] of the eigenvalues to compute. \
+                             If specified, it overrides the value specified in the param_file.')
+
     return parser
 
 
@@ -219,7 +289,8 @@ def main():
 
     parser = create_parser()
     args = parser.parse_args()
-    main1(args.param_file, args.k_points_file, args.xyz, args.show, args.save, args.code_name)
+    main1(args.param_file, args.k_points_file, args.xyz, args.show, args.save, args.code_name, args.workers,
+          args.eigvals_only, args.subset_by_index, args.subset_by_value)
 
     return 0
 
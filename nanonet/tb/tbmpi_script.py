@@ -11,10 +11,11 @@ except ImportError:
     rank = 0
     size = 1
 import nanonet.tb as tb
-from nanonet.tb.tb_script import create_parser, preprocess_data, postprocess_data
+from nanonet.tb.tb_script import create_parser, preprocess_data, postprocess_data, eigensolver_options
 
 
-def main1(param_file, k_points_file, xyz, show, save, code_name):
+def main1(param_file, k_points_file, xyz, show, save, code_name, workers=1,
+          eigvals_only=None, subset_by_index=None, subset_by_value=None):
     """
 
     Parameters
@@ -31,6 +32,14 @@ def main1(param_file, k_points_file, xyz, show, save, code_name):
         
     code_name :
         
+    workers : int
+        number of local worker processes used by each MPI process (Default value = 1)
+    eigvals_only : int
+        if nonzero, eigenvectors are not computed; overrides the yaml-file parameter (Default value = None)
+    subset_by_index : list
+        indices of the first and last eigenvalues to compute; overrides the yaml-file parameter (Default value = None)
+    subset_by_value : list
+        energy window (lo, hi] of the eigenvalues to compute; overrides the yaml-file parameter (Default value = None)
 
     Returns
     -------
@@ -38,19 +47,22 @@ def main1(param_file, k_points_file, xyz, show, save, code_name):
     """
 
     params, wave_vector, code_name = preprocess_data(param_file, k_points_file, xyz, code_name)
+    options = eigensolver_options(params, eigvals_only, subset_by_index, subset_by_value)
 
     # initialize Hamiltonian
     hamiltonian = tb.initializer(**params)
 
     # compute band structure
     band_structure = []
+    ids = [j for j in range(len(wave_vector)) if j % size == rank]
+    eigenvalues, eigenvectors = hamiltonian.diagonalize_periodic_bc_batch([wave_vector[j] for j in ids],
+                                                                         workers=workers, **options)
 
-    for j, jj in enumerate(wave_vector):
-        if j % size != rank:
-            continue
+    if eigenvectors is None:
+        eigenvectors = [None] * len(eigenvalues)
 
-        vals, vects = hamiltonian.diagonalize_periodic_bc(jj)
-        band_structure.append({'id': j, 'wave_vector': jj, 'eigenvalues': vals, 'eigenvectors': vects})
+    for j, vals, vects in zip(ids, eigenvalues, eigenvectors):
+        band_structure.append({'id': j, 'wave_vector': wave_vector[j], 'eigenvalues': vals, 'eigenvectors': vects})
         print('#{} '.format(j), " ".join(['{:.3f} '.format(element) for element in vals]))
 
     if size > 1:
@@ -67,7 +79,8 @@ def main():
 
     parser = create_parser()
     args = parser.parse_args()
-    main1(args.param_file, args.k_points_file, args.xyz, args.show, args.save, args.code_name)
+    main1(args.param_file, args.k_points_file, args.xyz, args.show, args.save, args.code_name, args.workers,
+          args.eigvals_only, args.subset_by_index, args.subset_by_value)
 
     return 0
 
@@ -0,0 +1,111 @@
+import numpy as np
+from nanonet.tb.orbitals import SiliconSP3D5S, HydrogenS
+from nanonet.tb.diatomic_matrix_element import me, me_block, rotation_tensors, s_me, t_me, L_MAX
+
+
+def test_me_block():
+    """ """
+
+    si = SiliconSP3D5S()
+    h = HydrogenS()
+
+    coords = np.array([[1.0, 1.0, 1.0],
+                       [-1.0, 1.0, -1.0],
+                       [0.3, -0.2, 0.7],
+                       [1.0, 0.0, 0.0]])
+    coords /= np.linalg.norm(coords, axis=1)[:, np.newaxis]
+
+    for atom1, atom2 in [(si, si), (si, h), (h, si)]:
+        blocks = me_block(atom1, atom2, coords)
+
+        expected = np.zeros(blocks.shape)
+        for j, item in enumerate(coords):
+            for l1 in range(atom1.num_of_orbitals):
+                for l2 in range(atom2.num_of_orbitals):
+                    expected[j, l1, l2] = me(atom1, l1, atom2, l2, item)
+
+        np.testing.assert_allclose(blocks, expected, atol=1e-12)
+
+
+def test_me_block_with_overlap():
+    """ """
+
+    from nanonet.tb import Orbitals, set_tb_params
+
+    orb = Orbitals('X')
+    orb.add_orbital("s", energy=-0.5, orbital=0, magnetic=0, spin=0)
+    orb.add_orbital("pz", energy=-0.28, orbital=1, magnetic=0, spin=0)
+    orb.add_orbital("px", energy=-0.28, orbital=1, magnetic=-1, spin=0)
+    set_tb_params(PARAMS_X_X={'ss_sigma': -1.0, 'sp_sigma': 0.7, 'pp_sigma': 1.2, 'pp_pi': -2.97},
+                  OV_X_X={'ss_sigma': 0.01, 'pp_pi': 0.073})
+
+    coords = np.array([[1.0, 1.0, 0.5],
+                       [0.3, -0.2, 0.7]])
+    coords /= np.linalg.norm(coords, axis=1)[:, np.newaxis]
+
+    h_block, ov_block = me_block(orb, orb, coords, with_overlap=True)
+
+    np.testing.assert_allclose(h_block, me_block(orb, orb, coords), atol=1e-12)
+    np.testing.assert_allclose(ov_block, me_block(orb, orb, coords, overlap=True), atol=1e-12)
+    assert np.any(ov_block != 0)
+
+
+def test_compiled_tb_params():
+    """ """
+
+    from nanonet.tb import set_tb_params, tb_params
+    from nanonet.tb.diatomic_matrix_element import me_diatomic, tb_params_block
+
+    codes = {'ss_sigma': ('', ''), '1s1s_sigma': ('1', '1'), 's1s_sigma': ('', '1'), '1sp_sigma': ('1', ''),
+             'pd_pi': ('', ''), 'dd_delta': ('', '')}
+    qn = {'ss_sigma': (0, 0, 0), '1s1s_sigma': (0, 0, 0), 's1s_sigma': (0, 0, 0), '1sp_sigma': (0, 1, 0),
+          'pd_pi': (1, 2, 1), 'dd_delta': (2, 2, 2)}
+
+    for label, code in codes.items():
+        assert me_diatomic('SI_SI', code, *qn[label], which_neighbour=0) == tb_params.PARAMS_SI_SI[label]
+
+    assert me_diatomic('SI_SI', ('2', ''), 0, 0, 0, which_neighbour=0) == 0
+    assert me_diatomic('SI_SI', ('', ''), 0, 0, 0, which_neighbour=100) == 0
+
+    # the table without the order suffix is also referred to by an empty string and None
+    for which_neighbour in ['', None]:
+        assert me_diatomic('SI_SI', ('', ''), 0, 0, 0, which_neighbour=which_neighbour) == \
+            tb_params.PARAMS_SI_SI['ss_sigma']
+
+    set_tb_params(PARAMS_Y_Y1={'ss_sigma': 1.0}, PARAMS_Y_Y2={'sp_sigma': 2.0})
+    np.testing.assert_array_equal(tb_params_block('Y_Y', 0, 0, 0, 1, [1, 2, 100]), [[0.0, 2.0, 0.0]])
+    np.testing.assert_array_equal(tb_params_block('Y_Y', 0, 0, 0, 0, [1, 2, 100]), [[1.0, 0.0, 0.0]])
+
+    try:
+        tb_params_block('Y_Y', 0, 0, 0, 0, [3])
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("The missing table PARAMS_Y_Y3 is not detected")
+
+    # no table is needed for the atoms beyond the last nearest neighbour
+    assert me_diatomic('Z_Z', ('', ''), 0, 0, 0, which_neighbour=100) == 0
+    np.testing.assert_array_equal(tb_params_block('Z_Z', 0, 0, 1, 1, [100, 100]), np.zeros((2, 2)))
+
+
+def test_rotation_tensors():
+    """ """
+
+    coords = np.random.RandomState(0).randn(20, 3)
+    coords /= np.linalg.norm(coords, axis=1)[:, np.newaxis]
+    gamma = np.arctan2(coords[:, 0], coords[:, 1])
+
+    s, t = rotation_tensors(coords)
+
+    for l in range(L_MAX + 1):
+        for m1 in range(-l, l + 1):
+            for m in range(1, l + 1):
+                np.testing.assert_allclose(s[l, m1 + L_MAX, m], s_me(coords[:, 2], l, m1, m, gamma), atol=1e-12)
+                np.testing.assert_allclose(t[l, m1 + L_MAX, m], t_me(coords[:, 2], l, m1, m, gamma), atol=1e-12)
+
+    # bonds parallel to the z-axis
+    si = SiliconSP3D5S()
+    for sign in [1.0, -1.0]:
+        near = np.array([[1e-7, 0.0, sign]])
+        near /= np.linalg.norm(near)
+        np.testing.assert_allclose(me_block(si, si, [[0.0, 0.0, sign]]), me_block(si, si, near), atol=1e-6)
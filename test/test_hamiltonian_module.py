@@ -1,4 +1,6 @@
+import itertools
 import numpy as np
+import pytest
 import nanonet.tb as tb
 
 
@@ -363,6 +365,511 @@ def expected_bulk_silicon_band_structure():
                       2.31682950e+01, 2.31682966e+01]])
 
 
+def test_half_assembly():
+    """ """
+    tb.Orbitals.orbital_sets = {'Si': 'SiliconSP3D5S', 'H': 'HydrogenS'}
+
+    h_half = tb.Hamiltonian(xyz='./examples/input_samples/SiNW2.xyz', nn_distance=2.4,
+                            check_half_assembly=True).initialize()
+    h_full = tb.Hamiltonian(xyz='./examples/input_samples/SiNW2.xyz', nn_distance=2.4,
+                            half_assembly=False).initialize()
+
+    np.testing.assert_allclose(h_half.h_matrix, h_full.h_matrix, atol=1e-12)
+
+    h_half.set_periodic_bc([[0, 0, 5.5]])
+    h_full.set_periodic_bc([[0, 0, 5.5]])
+
+    for mat_half, mat_full in zip(h_half.get_hamiltonians(), h_full.get_hamiltonians()):
+        np.testing.assert_allclose(mat_half, mat_full, atol=1e-12)
+
+    vals_half, _ = h_half.diagonalize_periodic_bc([0.0, 0.0, 0.3])
+    vals_full, _ = h_full.diagonalize_periodic_bc([0.0, 0.0, 0.3])
+    np.testing.assert_allclose(vals_half, vals_full, atol=1e-10)
+
+
+def test_scalar_matrix_elements():
+    """ """
+    tb.Orbitals.orbital_sets = {'Si': 'SiliconSP3D5S', 'H': 'HydrogenS'}
+    h = tb.Hamiltonian(xyz='./examples/input_samples/SiNW2.xyz', nn_distance=2.4).initialize()
+
+    offsets = np.cumsum([0] + [h._ind2atom(j).num_of_orbitals for j in range(h.num_of_nodes)])
+    atom1 = 0
+    atom2 = h.get_neighbours(atom1)[1]
+    size1 = h._ind2atom(atom1).num_of_orbitals
+    size2 = h._ind2atom(atom2).num_of_orbitals
+
+    block = np.array([[h._get_me(atom1, atom2, l1, l2) for l2 in range(size2)] for l1 in range(size1)])
+    np.testing.assert_allclose(block, h.h_matrix[offsets[atom1]:offsets[atom1] + size1,
+                                                 offsets[atom2]:offsets[atom2] + size2], atol=1e-12)
+
+
+def test_hamiltonian_cache(tmp_path):
+    """ """
+    tb.Orbitals.orbital_sets = {'Si': 'SiliconSP3D5S', 'H': 'HydrogenS'}
+
+    def make_hamiltonian():
+        h = tb.Hamiltonian(xyz='./examples/input_samples/SiNW2.xyz', nn_distance=2.4,
+                           cache_dir=str(tmp_path)).initialize()
+        h.set_periodic_bc([[0, 0, 5.5]])
+        return h
+
+    h1 = make_hamiltonian()
+    hl1, h01, hr1, subblocks1 = h1.get_hamiltonians_block_tridiagonal()
+
+    h2 = make_hamiltonian()
+    hl2, h02, hr2, subblocks2 = h2.get_hamiltonians_block_tridiagonal()
+
+    # the second object loads matrices from the cache and does not need the cyclic topology
+    assert h2._ct is None
+    assert subblocks1 == subblocks2
+    np.testing.assert_allclose(h1.h_matrix, h2.h_matrix)
+    for item1, item2 in zip(hl1 + h01 + hr1, hl2 + h02 + hr2):
+        np.testing.assert_allclose(item1, item2)
+
+    # changing tight-binding parameters invalidates the cache
+    original = tb.tb_params.PARAMS_H_H
+    tb.set_tb_params(PARAMS_H_H=dict(original, ss_sigma=0.5))
+    try:
+        h3 = make_hamiltonian()
+        expected = tb.Hamiltonian(xyz='./examples/input_samples/SiNW2.xyz', nn_distance=2.4).initialize()
+        expected.set_periodic_bc([[0, 0, 5.5]])
+
+        assert np.any(h3.h_matrix != h1.h_matrix)
+        for item1, item2 in zip(h3.get_hamiltonians(), expected.get_hamiltonians()):
+            np.testing.assert_allclose(item1, item2)
+    finally:
+        tb.set_tb_params(PARAMS_H_H=original)
+
+
+def test_hamiltonian_update():
+    """ """
+    tb.Orbitals.orbital_sets = {'Si': 'SiliconSP3D5S', 'H': 'HydrogenS'}
+
+    h = tb.Hamiltonian(xyz='./examples/input_samples/SiNW2.xyz', nn_distance=2.4).initialize()
+
+    atoms = np.array([3, 10, 40])
+    coords = h.atom_coords[atoms] + np.array([[0.05, -0.1, 0.2], [0.3, 0.0, 0.0], [-0.15, 0.1, 0.05]])
+    energy_shift = np.array([0.1, 0.2, -0.3])
+
+    subblocks = h.update(atoms, coords=coords, energy_shift=energy_shift, subblocks=[100, 346])
+    np.testing.assert_array_equal(subblocks, [0, 1])
+
+    xyz = "{}\n\n".format(h.num_of_nodes) + \
+          "\n".join(["{} {} {} {}".format(label, *item) for label, item in zip(h.atom_list.keys(), h.atom_coords)])
+    expected = tb.Hamiltonian(xyz=xyz, nn_distance=2.4).initialize().h_matrix
+
+    for atom, shift in zip(atoms, energy_shift):
+        ind = h.offsets[atom] + np.arange(h.num_of_orbitals[atom])
+        expected[ind, ind] += shift
+
+    np.testing.assert_allclose(h.h_matrix, expected, atol=1e-12)
+
+    # an isolated atom is moved into the bonding range of the end of a chain
+    a = tb.Orbitals('A')
+    a.add_orbital(title='s', energy=-1, )
+    tb.set_tb_params(PARAMS_A_A={'ss_sigma': -1.0})
+    labels = ['A1', 'A2', 'A3', 'A4', 'A5']
+    coords = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [2.0, 0.0, 0.0], [3.0, 0.0, 0.0], [10.0, 0.0, 0.0]])
+
+    h = tb.Hamiltonian(labels=labels, coords=coords, nn_distance=1.1).initialize()
+    coords[4] = [4.0, 0.0, 0.0]
+
+    subblocks = h.update(4, coords=coords[[4]], subblocks=[1, 1, 1, 1, 1])
+    np.testing.assert_array_equal(subblocks, [3, 4])
+
+    expected = tb.Hamiltonian(labels=labels, coords=coords, nn_distance=1.1).initialize().h_matrix
+    np.testing.assert_allclose(h.h_matrix, expected, atol=1e-12)
+
+
+def test_hamiltonian_frames():
+    """ """
+    tb.Orbitals.orbital_sets = {'Si': 'SiliconSP3D5S', 'H': 'HydrogenS'}
+
+    h = tb.Hamiltonian(xyz='./examples/input_samples/SiNW2.xyz', nn_distance=2.4).initialize()
+
+    frames = h.atom_coords[np.newaxis] + 0.005 * np.random.RandomState(0).randn(3, h.num_of_nodes, 3)
+
+    for frame, h_matrix in zip(frames, h.iter_frames(frames, batch_size=2)):
+        xyz = "{}\n\n".format(h.num_of_nodes) + \
+              "\n".join(["{} {} {} {}".format(label, *item) for label, item in zip(h.atom_list.keys(), frame)])
+        expected = tb.Hamiltonian(xyz=xyz, nn_distance=2.4).initialize().h_matrix
+        np.testing.assert_allclose(h_matrix, expected, atol=1e-10)
+
+    # overlap matrices are computed for each frame if requested
+    a = tb.Orbitals('A')
+    a.add_orbital(title='s', energy=-1, )
+    tb.set_tb_params(PARAMS_A_A={'ss_sigma': -1.0}, OV_A_A={'ss_sigma': 0.1})
+    labels = ['A1', 'A2', 'A3', 'A4']
+    coords = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [2.0, 0.0, 0.0], [3.0, 0.0, 0.0]])
+
+    h = tb.Hamiltonian(labels=labels, coords=coords, nn_distance=1.1, comp_overlap=True).initialize()
+    frames = coords[np.newaxis] + 0.02 * np.random.RandomState(1).randn(2, 4, 3)
+
+    for frame, (h_matrix, ov_matrix) in zip(frames, h.iter_frames(frames)):
+        expected = tb.Hamiltonian(labels=labels, coords=frame, nn_distance=1.1, comp_overlap=True).initialize()
+        np.testing.assert_allclose(h_matrix, expected.h_matrix, atol=1e-12)
+        np.testing.assert_allclose(ov_matrix, expected.ov_matrix, atol=1e-12)
+        assert np.count_nonzero(ov_matrix) == 10
+
+
+def test_vectorized_neighbour_orders():
+    """ """
+    tb.Orbitals('A').add_orbital(title='s', energy=-1, )
+
+    xyz_file = """1
+    H cell
+    A       0.0000000000    0.0000000000    0.0000000000
+    """
+
+    h = tb.Hamiltonian(xyz=xyz_file, nn_distance=[2.5, 1.5, 3.1])
+    distances = np.array([1.0, 1.5, 2.0, 2.5, 3.0, 3.1, 3.5])
+
+    np.testing.assert_array_equal(h._which_neighbour(distances), [1, 1, 2, 2, 3, 3, 100])
+    assert [h.int_radial_dependence(item) for item in distances] == [1, 1, 2, 2, 3, 3, 100]
+
+
+def test_dtype_policy():
+    """ """
+    a_si = 5.50
+    PRIMITIVE_CELL = [[0, 0.5 * a_si, 0.5 * a_si],
+                      [0.5 * a_si, 0, 0.5 * a_si],
+                      [0.5 * a_si, 0.5 * a_si, 0]]
+
+    tb.Orbitals.orbital_sets = {'Si': 'SiliconSP3D5S'}
+
+    xyz_file = """2
+    Si2 cell
+    Si1       0.0000000000    0.0000000000    0.0000000000
+    Si2       1.3750000000    1.3750000000    1.3750000000
+    """
+
+    h = tb.Hamiltonian(xyz=xyz_file, nn_distance=2.5).initialize()
+    h.set_periodic_bc(PRIMITIVE_CELL)
+    h_single = tb.Hamiltonian(xyz=xyz_file, nn_distance=2.5, dtype=np.complex64).initialize()
+    h_single.set_periodic_bc(PRIMITIVE_CELL)
+
+    assert h.h_matrix.dtype == np.float64
+    assert h_single.h_matrix.dtype == np.complex64
+
+    vals, _ = h.diagonalize_periodic_bc([0.0, 0.0, 0.0])
+    assert h.get_bloch_matrices([0.0, 0.0, 0.0])[0].dtype == np.float64
+
+    vals, _ = h.diagonalize_periodic_bc([0.1, 0.2, 0.3])
+    vals_single, _ = h_single.diagonalize_periodic_bc([0.1, 0.2, 0.3])
+    assert h.get_bloch_matrices([0.1, 0.2, 0.3])[0].dtype == np.complex128
+    assert h_single.get_bloch_matrices([0.1, 0.2, 0.3])[0].dtype == np.complex64
+    np.testing.assert_allclose(vals, vals_single, atol=1e-4)
+
+    with pytest.raises(ValueError):
+        tb.Hamiltonian(xyz=xyz_file, nn_distance=2.5, so_coupling=0.1, dtype=np.float64)
+
+    with pytest.raises(ValueError):
+        tb.Hamiltonian(xyz=xyz_file, nn_distance=2.5, dtype=np.float32)
+
+
+def test_construction_from_arrays():
+    """ """
+    tb.Orbitals.orbital_sets = {'Si': 'SiliconSP3D5S', 'H': 'HydrogenS'}
+
+    h = tb.Hamiltonian(xyz='./examples/input_samples/SiNW2.xyz', nn_distance=2.4).initialize()
+    labels = list(h.atom_list.keys())
+    coords = h.atom_coords.copy()
+
+    class Atoms(object):
+        """Mimics the interface of ase.Atoms"""
+
+        def get_chemical_symbols(self):
+            return [''.join([i for i in label if not i.isdigit()]) for label in labels]
+
+        def get_positions(self):
+            return coords
+
+    for kwargs in [dict(labels=labels, coords=coords), dict(xyz=Atoms())]:
+        h1 = tb.Hamiltonian(nn_distance=2.4, **kwargs).initialize()
+        assert list(h1.atom_list.keys()) == labels
+        np.testing.assert_allclose(h1.h_matrix, h.h_matrix, atol=1e-12)
+
+
+def test_quantum_numbers_to_indices():
+    """ """
+    tb.Orbitals.orbital_sets = {'Si': 'SiliconSP3D5S', 'H': 'HydrogenS'}
+
+    h = tb.Hamiltonian(xyz='./examples/input_samples/SiNW2.xyz', nn_distance=2.4)
+
+    ind = np.arange(h.basis_size)
+    qn = h.ind2qn(ind)
+    np.testing.assert_array_equal(h.qn2ind(qn), ind)
+
+    for j in [0, 1, h.basis_size - 1]:
+        qn = h.ind2qn(j)
+        assert h.qn2ind(qn) == j
+        assert qn['l'] < h.orbitals_dict[list(h.atom_list.keys())[qn['atoms']]].num_of_orbitals
+
+    assert h.basis_size == sum(h.orbitals_dict[label].num_of_orbitals for label in h.atom_list.keys())
+
+
+def test_graphene_third_neighbours():
+    """ """
+    lat_const = 1.42
+    a1 = 0.5 * lat_const * 3
+    a2 = 0.5 * lat_const * np.sqrt(3)
+    period = np.array([[a1, a2, 0.0], [a1, -a2, 0.0]])
+
+    orb = tb.Orbitals('C')
+    orb.add_orbital("pz", energy=-0.28, orbital=1, magnetic=0, spin=0)
+    tb.set_tb_params(PARAMS_C_C1={'pp_pi': -2.97}, PARAMS_C_C2={'pp_pi': -0.073}, PARAMS_C_C3={'pp_pi': -0.33})
+
+    h = tb.Hamiltonian(xyz="2\nGraphene\nC1 0.0 0.0 0.0\nC2 1.42 0.0 0.0\n",
+                       nn_distance=[1.5, 2.5, 3.1]).initialize()
+    h.set_periodic_bc(period)
+
+    # bonds to the first, second and third nearest neighbours
+    nn1 = np.array([[lat_const, 0, 0], [-0.5 * lat_const, a2, 0], [-0.5 * lat_const, -a2, 0]])
+    nn2 = np.array([period[0], period[1], period[0] - period[1]])
+    nn3 = -2 * nn1
+
+    for k in [[0.3, 0.2, 0.0], [0.0, 0.57, 0.0]]:
+        vals, _ = h.diagonalize_periodic_bc(k)
+        f1 = np.sum(np.exp(1j * np.dot(nn1, k)))
+        f2 = 2 * np.sum(np.cos(np.dot(nn2, k)))
+        f3 = np.sum(np.exp(1j * np.dot(nn3, k)))
+        expected = -0.28 - 0.073 * f2 + np.array([-1, 1]) * np.abs(-2.97 * f1 - 0.33 * f3)
+        np.testing.assert_allclose(vals, expected, atol=1e-10)
+
+    table = h.get_periodic_neighbour_table()
+    assert table.translations.shape == (len(table), 2)
+    np.testing.assert_allclose(table.vectors, h.atom_coords[table.i] - h.atom_coords[table.j] -
+                               np.dot(table.translations, period))
+
+
+def test_lattice_blocks():
+    """ """
+    a_si = 5.50
+    PRIMITIVE_CELL = [[0, 0.5 * a_si, 0.5 * a_si],
+                      [0.5 * a_si, 0, 0.5 * a_si],
+                      [0.5 * a_si, 0.5 * a_si, 0]]
+
+    tb.Orbitals.orbital_sets = {'Si': 'SiliconSP3D5S'}
+
+    xyz_file = """2
+    Si2 cell
+    Si1       0.0000000000    0.0000000000    0.0000000000
+    Si2       1.3750000000    1.3750000000    1.3750000000
+    """
+
+    h = tb.Hamiltonian(xyz=xyz_file, nn_distance=2.5).initialize()
+    h.set_periodic_bc(PRIMITIVE_CELL)
+
+    translations, h_blocks, ov_blocks = h.get_lattice_blocks()
+    assert ov_blocks is None
+    np.testing.assert_array_equal(translations[0], 0)
+    assert len(translations) == len(h_blocks) == 7
+
+    coords = np.repeat(h.atom_coords, h.num_of_orbitals, axis=0)
+
+    for k in [[0.1, 0.2, 0.3], [0.0, 0.0, 0.57]]:
+        phases = np.exp(1j * np.dot(coords, k))
+        expected = np.zeros(h.h_matrix.shape, dtype=complex)
+
+        for translation, block in zip(translations, h_blocks):
+            block = block.toarray() if hasattr(block, 'toarray') else block
+            expected += np.exp(-1j * np.dot(np.dot(translation, PRIMITIVE_CELL), k)) * block
+
+        expected = phases[:, np.newaxis] * expected * np.conj(phases)[np.newaxis, :]
+
+        h_matrix, _ = h.get_bloch_matrices(k)
+        np.testing.assert_allclose(h_matrix, expected, atol=1e-12)
+
+        # the matrix summed directly over the bonds with all atoms in the neighbouring cells
+        expected = np.zeros(h.h_matrix.shape, dtype=complex)
+        offsets = np.cumsum([0] + [h._ind2atom(j).num_of_orbitals for j in range(h.num_of_nodes)])
+
+        for translation in itertools.product(range(-2, 3), repeat=3):
+            shift = np.dot(translation, PRIMITIVE_CELL)
+            for j1, j2 in itertools.product(range(h.num_of_nodes), repeat=2):
+                rows = slice(offsets[j1], offsets[j1 + 1])
+                cols = slice(offsets[j2], offsets[j2 + 1])
+                vector = h.atom_coords[j1] - h.atom_coords[j2] - shift
+                if j1 == j2 and not any(translation):
+                    expected[rows, cols] += h.h_matrix[rows, cols]
+                elif np.linalg.norm(vector) < 2.5:
+                    block = [[h._get_me(j1, j2, l1, l2, coords=vector) for l2 in range(cols.stop - cols.start)]
+                             for l1 in range(rows.stop - rows.start)]
+                    expected[rows, cols] += np.exp(1j * np.dot(vector, k)) * np.array(block)
+
+        np.testing.assert_allclose(h_matrix, expected, atol=1e-12)
+
+
+def test_bloch_matrices_after_changes():
+    """ """
+    a = tb.Orbitals('A')
+    a.add_orbital(title='s', energy=-1, )
+
+    xyz_file = """1
+    H cell
+    A       0.0000000000    0.0000000000    0.0000000000
+    """
+    k = [0.0, 0.0, 0.3]
+
+    tb.set_tb_params(PARAMS_A_A={'ss_sigma': -1.0})
+    h = tb.Hamiltonian(xyz=xyz_file, nn_distance=1.1).initialize()
+    h.set_periodic_bc([[0, 0, 1.0]])
+    vals, _ = h.diagonalize_periodic_bc(k)
+    np.testing.assert_allclose(vals, [-1 - 2 * np.cos(0.3)], atol=1e-12)
+
+    # the lattice blocks are recomputed with the new parameters
+    tb.set_tb_params(PARAMS_A_A={'ss_sigma': 2.0})
+    h.initialize()
+    vals, _ = h.diagonalize_periodic_bc(k)
+    np.testing.assert_allclose(vals, [-1 + 4 * np.cos(0.3)], atol=1e-12)
+
+    # the matrix of the unit cell is taken as it is for each wave vector
+    h.h_matrix = h.h_matrix + 1.0
+    vals, _ = h.diagonalize_periodic_bc(k)
+    np.testing.assert_allclose(vals, [4 * np.cos(0.3)], atol=1e-12)
+    h.h_matrix[0, 0] = 1.0
+    vals, _ = h.diagonalize_periodic_bc(k)
+    np.testing.assert_allclose(vals, [1 + 4 * np.cos(0.3)], atol=1e-12)
+
+    tb.set_tb_params(PARAMS_A_A={'ss_sigma': -1.0})
+
+
+def test_batched_diagonalization():
+    """ """
+    a_si = 5.50
+    PRIMITIVE_CELL = [[0, 0.5 * a_si, 0.5 * a_si],
+                      [0.5 * a_si, 0, 0.5 * a_si],
+                      [0.5 * a_si, 0.5 * a_si, 0]]
+
+    tb.Orbitals.orbital_sets = {'Si': 'SiliconSP3D5S'}
+
+    xyz_file = """2
+    Si2 cell
+    Si1       0.0000000000    0.0000000000    0.0000000000
+    Si2       1.3750000000    1.3750000000    1.3750000000
+    """
+
+    h = tb.Hamiltonian(xyz=xyz_file, nn_distance=2.5).initialize()
+    h.set_periodic_bc(PRIMITIVE_CELL)
+
+    k_points = tb.get_k_coords(['GAMMA', 'X'], [5], 'Si')
+    expected = np.array([h.diagonalize_periodic_bc(k)[0] for k in k_points])
+
+    # the matrices are small enough to be diagonalized as a stack
+    vals, vects = h.diagonalize_periodic_bc_batch(k_points)
+    assert vects.shape == (len(k_points), h.basis_size, h.basis_size)
+    np.testing.assert_allclose(vals, expected, atol=1e-10)
+
+    vals, _ = h.diagonalize_periodic_bc_batch(k_points, workers=2)
+    np.testing.assert_allclose(vals, expected, atol=1e-10)
+
+
+def test_eigensolver_subsets():
+    """ """
+    a_si = 5.50
+    PRIMITIVE_CELL = [[0, 0.5 * a_si, 0.5 * a_si],
+                      [0.5 * a_si, 0, 0.5 * a_si],
+                      [0.5 * a_si, 0.5 * a_si, 0]]
+
+    tb.Orbitals.orbital_sets = {'Si': 'SiliconSP3D5S'}
+
+    xyz_file = """2
+    Si2 cell
+    Si1       0.0000000000    0.0000000000    0.0000000000
+    Si2       1.3750000000    1.3750000000    1.3750000000
+    """
+
+    h = tb.Hamiltonian(xyz=xyz_file, nn_distance=2.5).initialize()
+    h.set_periodic_bc(PRIMITIVE_CELL)
+
+    k_vector = [0.1, 0.2, 0.3]
+    expected, vects = h.diagonalize_periodic_bc(k_vector)
+
+    vals, vects1 = h.diagonalize_periodic_bc(k_vector, eigvals_only=True)
+    assert vects1 is None
+    np.testing.assert_allclose(vals, expected, atol=1e-10)
+
+    vals, vects1 = h.diagonalize_periodic_bc(k_vector, subset_by_index=[2, 5])
+    np.testing.assert_allclose(vals, expected[2:6], atol=1e-10)
+    np.testing.assert_allclose(np.abs(np.sum(np.conj(vects1) * vects[:, 2:6], axis=0)), 1.0, atol=1e-8)
+
+    vals, _ = h.diagonalize_periodic_bc(k_vector, subset_by_value=[-5.0, 5.0])
+    np.testing.assert_allclose(vals, expected[(expected > -5.0) & (expected <= 5.0)], atol=1e-10)
+
+    # the number of eigenvalues in the window depends on the wave vector
+    k_points = tb.get_k_coords(['GAMMA', 'X'], [5], 'Si')
+    vals, vects = h.diagonalize_periodic_bc_batch(k_points, eigvals_only=True, subset_by_value=[-2.0, 2.0])
+    assert vects is None
+    assert isinstance(vals, list) and len(vals) == len(k_points)
+    for k_vector, item in zip(k_points, vals):
+        expected = h.diagonalize_periodic_bc(k_vector)[0]
+        np.testing.assert_allclose(item, expected[(expected > -2.0) & (expected <= 2.0)], atol=1e-10)
+
+    # the output type does not depend on whether the numbers of eigenvalues coincide
+    vals, vects = h.diagonalize_periodic_bc_batch(k_points, subset_by_value=[-100.0, 100.0])
+    assert isinstance(vals, list) and isinstance(vects, list)
+    assert all(item.shape == (h.basis_size, h.basis_size) for item in vects)
+
+    vals, vects = h.diagonalize_periodic_bc_batch(k_points, workers=2, subset_by_index=[0, 3])
+    assert vals.shape == (len(k_points), 4)
+    assert vects.shape == (len(k_points), h.basis_size, 4)
+
+    vals, _ = h.diagonalize(subset_by_index=[0, 3])
+    np.testing.assert_allclose(vals, h.diagonalize()[0][:4], atol=1e-10)
+
+
+def test_band_tracking(caplog):
+    """ """
+    a = tb.Orbitals('A')
+    a.add_orbital(title='s', energy=0.0, )
+    b = tb.Orbitals('B')
+    b.add_orbital(title='s', energy=0.0, )
+
+    # two decoupled chains with the bands -2cos(k) and 2cos(k) crossing at k = pi / 2
+    xyz_file = """2
+    H cell
+    A       0.0000000000    0.0000000000    0.0000000000
+    B       0.0000000000    5.0000000000    0.0000000000
+    """
+    tb.set_tb_params(PARAMS_A_A={'ss_sigma': -1.0}, PARAMS_B_B={'ss_sigma': 1.0})
+    h = tb.Hamiltonian(xyz=xyz_file, nn_distance=1.1).initialize()
+    h.set_periodic_bc([[0, 0, 1.0]])
+
+    kk = np.linspace(0, np.pi, 21)
+    k_points = [[0, 0, k] for k in kk]
+
+    vals, _ = h.diagonalize_k_path(k_points, track_bands=False)
+    np.testing.assert_allclose(vals, np.sort(np.array([-2 * np.cos(kk), 2 * np.cos(kk)]).T, axis=1), atol=1e-10)
+
+    vals, vects = h.diagonalize_k_path(k_points)
+    np.testing.assert_allclose(vals, np.array([-2 * np.cos(kk), 2 * np.cos(kk)]).T, atol=1e-10)
+    np.testing.assert_allclose(np.abs(vects[:, 0, 0]), 1.0, atol=1e-10)
+
+    # the sparse eigensolver falls back to the dense one for matrices smaller than num_eigs + 2
+    h = tb.HamiltonianSp(xyz=xyz_file, nn_distance=1.1, num_eigs=2).initialize()
+    h.set_periodic_bc([[0, 0, 1.0]])
+    vals, _ = h.diagonalize_k_path(k_points)
+    np.testing.assert_allclose(vals, np.array([-2 * np.cos(kk), 2 * np.cos(kk)]).T, atol=1e-10)
+
+    tb.Orbitals.orbital_sets = {'Si': 'SiliconSP3D5S', 'H': 'HydrogenS'}
+    # the third and fourth closest eigenvalues to sigma are well separated for all wave vectors,
+    # so that the set of computed states does not depend on the start vector
+    h = tb.HamiltonianSp(xyz='./examples/input_samples/SiNW2.xyz', nn_distance=2.4, sigma=0.65, num_eigs=3)
+    h.initialize()
+    h.set_periodic_bc([[0, 0, 5.5]])
+
+    k_points = [[0, 0, k] for k in np.linspace(0, 0.57, 5)]
+    expected = np.array([h.diagonalize_periodic_bc(k)[0] for k in k_points])
+
+    # the eigensolver started from the eigenvectors of the previous wave vector and from scratch
+    for warm_start in [True, False]:
+        vals, _ = h.diagonalize_k_path(k_points, workers=2, warm_start=warm_start)
+        np.testing.assert_allclose(np.sort(vals, axis=1), expected, atol=1e-10)
+
+    # the warm-started eigensolver does not use worker processes
+    assert sum('workers=2 is ignored' in record.getMessage() for record in caplog.records) == 1
+
+
 if __name__ == '__main__':
     # test_simple_atomic_chain()
     test_atomic_chain_two_kinds_of_atoms()
@@ -115,6 +115,24 @@ def test_bulk_silicon():
     np.testing.assert_allclose(band_structure, expected_bulk_silicon_band_structure()[:,:h.num_eigs], atol=1e-4)
 
 
+def test_sparse_and_dense_assembly():
+    """ """
+
+    tb.Orbitals.orbital_sets = {'Si': 'SiliconSP3D5S', 'H': 'HydrogenS'}
+
+    h = tb.Hamiltonian(xyz='./examples/input_samples/SiNW2.xyz', nn_distance=2.4).initialize()
+    h_sp = tb.HamiltonianSp(xyz='./examples/input_samples/SiNW2.xyz', nn_distance=2.4).initialize()
+
+    np.testing.assert_allclose(h_sp.h_matrix.toarray(), h.h_matrix, atol=1e-12)
+    assert h_sp.h_matrix.nnz == np.count_nonzero(h.h_matrix)
+
+    h.set_periodic_bc([[0, 0, 5.50]])
+    h_sp.set_periodic_bc([[0, 0, 5.50]])
+
+    for item1, item2 in zip(h.get_hamiltonians(), h_sp.get_hamiltonians()):
+        np.testing.assert_allclose(item2.toarray(), item1, atol=1e-12)
+
+
 if __name__ == '__main__':
     # test_simple_atomic_chain()
     # test_atomic_chain_two_kinds_of_atoms()
@@ -0,0 +1,56 @@
+import numpy as np
+import nanonet.tb as tb
+from nanonet.tb.k_mesh import reciprocal_lattice
+from examples.data_bi_bulk import primitive_cell as bi_primitive_cell
+
+
+def test_point_group():
+    """ """
+
+    a = 5.43
+    cell = 0.5 * a * (1 - np.eye(3))
+    coords = np.array([[0, 0, 0], [0.25 * a, 0.25 * a, 0.25 * a]])
+
+    # diamond structure has the full cubic point group, zincblende structure lacks the inversion
+    for labels, expected in [(['Si1', 'Si2'], 48), (['Ga1', 'As1'], 24)]:
+        rotations = tb.find_point_group(cell, coords, labels)
+        assert len(rotations) == expected
+        np.testing.assert_allclose(np.einsum('nji,njk->nik', rotations, rotations), 
+                                   np.broadcast_to(np.eye(3), rotations.shape), atol=1e-10)
+        assert len(np.unique(np.round(rotations, 6), axis=0)) == expected
+
+    # rhombohedral structure of bismuth
+    assert len(tb.find_point_group(bi_primitive_cell, np.array([[0, 0, 0], [0, 0, 5.52321494]]))) == 12
+
+
+def test_irreducible_k_mesh():
+    """ """
+
+    tb.Orbitals.orbital_sets = {'Si': 'SiliconSP3D5S'}
+    a = 5.50
+    cell = 0.5 * a * (1 - np.eye(3))
+    xyz = """2
+    Si2 cell
+    Si1       0.0000000000    0.0000000000    0.0000000000
+    Si2       1.3750000000    1.3750000000    1.3750000000
+    """
+    h = tb.Hamiltonian(xyz=xyz, nn_distance=2.5).initialize()
+    h.set_periodic_bc(cell)
+    labels = list(h.atom_list.keys())
+    coords = np.array(list(h.atom_list.values()))
+
+    for size, gamma_centered, expected in [([4, 4, 4], True, 8), ([4, 4, 4], False, 10), ([8, 8, 8], True, 29)]:
+        k_points, weights, mapping = tb.irreducible_k_mesh(cell, size, coords, labels,
+                                                           gamma_centered=gamma_centered)
+        assert len(k_points) == expected
+        assert len(mapping) == np.prod(size)
+        np.testing.assert_allclose(np.sum(weights), 1.0)
+        np.testing.assert_allclose(np.bincount(mapping) / float(len(mapping)), weights)
+
+    # eigenvalues unfolded from the irreducible wave vectors coincide with those computed on the full mesh
+    k_points, weights, mapping = tb.irreducible_k_mesh(cell, [4, 4, 4], coords, gamma_centered=False)
+    full_mesh = np.dot(tb.monkhorst_pack([4, 4, 4]), reciprocal_lattice(cell))
+
+    vals, _ = h.diagonalize_periodic_bc_batch(k_points, eigvals_only=True)
+    expected, _ = h.diagonalize_periodic_bc_batch(full_mesh, eigvals_only=True)
+    np.testing.assert_allclose(tb.unfold_k_mesh(vals, mapping), expected, atol=1e-9)
@@ -23,6 +23,24 @@ class Test(unittest.TestCase):
         ans = tbmpi_script.main1(args.param_file, args.k_points_file, args.xyz, args.show, args.save, args.code_name)
         self.assertEqual(ans, 0)
 
+    def test_tb_workers(self):
+        """ """
+        args = self.parser.parse_args(['./examples/input_samples/input.yaml', '-S=0', '--workers=2'])
+        ans = tb_script.main1(args.param_file, args.k_points_file, args.xyz, args.show, args.save, args.code_name,
+                              args.workers)
+        self.assertEqual(ans, 0)
+
+    def test_tb_eigensolver_options(self):
+        """ """
+        args = self.parser.parse_args(['./examples/input_samples/input.yaml', '-S=0', '--eigvals_only=1',
+                                       '--subset_by_value', '-3.5', '-2.5'])
+        for script in [tb_script, tbmpi_script]:
+            with self.subTest(script=script.__name__):
+                ans = script.main1(args.param_file, args.k_points_file, args.xyz, args.show, args.save,
+                                   args.code_name, args.workers, args.eigvals_only, args.subset_by_index,
+                                   args.subset_by_value)
+                self.assertEqual(ans, 0)
+
 
 if __name__ == '__main__':
 
@@ -0,0 +1,122 @@
+import itertools
+import numpy as np
+from nanonet.tb.structure_designer import StructDesignerXYZ, CyclicTopology, build_periodic_neighbour_table, \
+    query_neighbours
+from nanonet.tb.aux_functions import save_structure
+
+
+def test_neighbour_table():
+    """ """
+
+    sd = StructDesignerXYZ(xyz='./examples/input_samples/SiNW2.xyz', nn_distance=2.4)
+    table = sd.get_neighbour_table()
+
+    for j1 in range(sd.num_of_nodes):
+        expected = sorted(sd.get_neighbours(j1)[1:])
+        np.testing.assert_array_equal(table.j[table.i == j1], expected)
+
+    coords = np.array(list(sd.atom_list.values()))
+    np.testing.assert_allclose(table.vectors, coords[table.i] - coords[table.j])
+    np.testing.assert_allclose(table.distances, np.linalg.norm(table.vectors, axis=1))
+
+
+def test_binary_structure(tmp_path):
+    """ """
+
+    sd = StructDesignerXYZ(xyz='./examples/input_samples/SiNW2.xyz', nn_distance=2.4)
+
+    for name in ['SiNW2.npz', 'SiNW2.npy']:
+        filename = str(tmp_path / name)
+        save_structure(filename, list(sd.atom_list.keys()), sd.atom_coords)
+        sd1 = StructDesignerXYZ(xyz=filename, nn_distance=2.4)
+
+        assert list(sd1.atom_list.keys()) == list(sd.atom_list.keys())
+        assert sd1.num_of_species == sd.num_of_species
+        np.testing.assert_array_equal(sd1.atom_coords, sd.atom_coords)
+        np.testing.assert_array_equal(sd1.species_ids, sd.species_ids)
+
+
+def test_periodic_images():
+    """ """
+
+    sd = StructDesignerXYZ(xyz='./examples/input_samples/SiNW2.xyz', nn_distance=2.4)
+    pcv = [[0, 0, 5.5]]
+    ct = CyclicTopology(pcv, list(sd.atom_list.keys()), sd.atom_coords, 2.4)
+
+    np.testing.assert_allclose(ct.image_coords,
+                               sd.atom_coords[ct.image_parents] + np.dot(ct.image_translations, pcv))
+    np.testing.assert_array_equal(ct.image_translations[ct.image_orders == 0], 0)
+    np.testing.assert_array_equal(np.unique(ct.image_parents), ct.interfacial_atoms_ind)
+
+    # images are distinct and do not coincide with atoms of the unit cell
+    images = ct.image_coords[ct.image_orders > 0]
+    assert len(np.unique(np.round(images, 4), axis=0)) == len(images)
+    assert np.min(np.linalg.norm(images[:, np.newaxis, :] - sd.atom_coords[np.newaxis, :, :], axis=2)) > 0.01
+
+    # bonds found with a single query are the same as those found for each interfacial atom separately
+    atoms, images = ct.get_image_bonds()
+    expected = [(j1, j2) for j1 in ct.interfacial_atoms_ind for j2 in ct.get_neighbours(sd.atom_coords[j1])]
+    assert sorted(zip(atoms.tolist(), images.tolist())) == sorted(expected)
+    assert len(expected) > 0
+    assert list(ct.virtual_and_interfacial_atoms.keys())[images[0]].startswith('*')
+
+
+def test_periodic_neighbour_table():
+    """ """
+
+    nn_distance = 2.5
+    a = 5.43
+    coords = np.array([[0, 0, 0], [0, 0.5, 0.5], [0.5, 0, 0.5], [0.5, 0.5, 0],
+                       [0.25, 0.25, 0.25], [0.25, 0.75, 0.75], [0.75, 0.25, 0.75], [0.75, 0.75, 0.25]]) * a
+    # atoms outside of the unit cell are allowed
+    coords[1] += [0, a, -a]
+
+    # orthorhombic cell, primitive cell of the fcc lattice and a wire with the period along the z axis
+    cases = [(np.eye(3) * a, coords),
+             (0.5 * a * (1 - np.eye(3)), coords[[0, 4]] + [[0, 0, 0], [a, -a, 0.5 * a]]),
+             (np.array([[0, 0, a]]), coords)]
+
+    for cell, atoms in cases:
+        table = build_periodic_neighbour_table(atoms, cell, nn_distance)
+
+        expected = []
+        for translation in itertools.product(range(-3, 4), repeat=len(cell)):
+            for i, j in itertools.product(range(len(atoms)), repeat=2):
+                vector = atoms[i] - atoms[j] - np.dot(translation, cell)
+                if 0.1 * nn_distance < np.linalg.norm(vector) < nn_distance:
+                    expected.append((i, j) + translation)
+
+        assert sorted(expected) == list(zip(table.i, table.j, *table.translations.T))
+        np.testing.assert_allclose(table.vectors,
+                                   atoms[table.i] - atoms[table.j] - np.dot(table.translations, cell))
+
+
+def test_dense_neighbourhood(caplog):
+    """ """
+
+    # simple cubic lattice with the cutoff distance including 26 neighbours of the central atom
+    coords = np.array(list(itertools.product(range(-2, 3), repeat=3)), dtype=float)
+    labels = ['Si' + str(j + 1) for j in range(len(coords))]
+    sd = StructDesignerXYZ(labels=labels, coords=coords, nn_distance=1.8)
+
+    central = np.flatnonzero(np.all(coords == 0, axis=1))[0]
+    neighbours = sd.get_neighbours(central)
+    assert neighbours[0] == central
+    assert len(neighbours) == 27
+
+    table = query_neighbours(sd._kd_tree, coords[[central]], 1.8)
+    assert sorted(table.j) == sorted(neighbours[1:])
+    assert np.all(np.diff(table.distances) >= 0)
+
+    # several points are queried at once, missing neighbours of the corner atom are padded
+    distances, indices = sd._get_neighbours(coords[[central, 0]])
+    assert distances.shape == indices.shape == (2, 27)
+    np.testing.assert_array_equal(indices[0], neighbours)
+    assert np.sum(np.isfinite(distances[1])) == 8
+    assert np.all(indices[1][np.isinf(distances[1])] == len(coords))
+
+    # the warning about the neighbours beyond the legacy limit is issued once for the structure
+    for j in range(len(coords)):
+        sd.get_neighbours(j)
+
+    assert sum('earlier versions' in record.getMessage() for record in caplog.records) == 1